@@ -0,0 +1,132 @@
+"""
+Benchmark chapter generation throughput and peak memory of the float32 and int8 CPU backends
+
+Each backend runs in its own child process, so its peak RSS is measured
+without the other model in memory. The CTranslate2 model is converted into
+MODEL_CACHE_DIR (or read from LLM_CT2_MODEL_PATH) before it is measured.
+The interpreter with torch loaded takes about 0.7 GB of the peak, so small
+models show the throughput gain but not the memory one.
+
+Usage (from the backend directory):
+    python -m benchmarks.cpu_llm_backend --model meta-llama/Llama-3.2-1B-Instruct --runs 3
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import subprocess
+from typing import Dict, Any
+
+BACKENDS = ('transformers', 'ctranslate2')
+
+WORDS = (
+    "budget tokens speech model video chapter audio server latency memory worker queue prompt "
+    "transcript boundary title summary camera lighting editing export codec render timeline"
+).split()
+
+def synthetic_transcript(minutes: int, seed: int = 0) -> str:
+    """Formatted transcript with one line per 20 seconds that changes topic every few minutes"""
+    
+    rng = random.Random(seed)
+    lines = []
+    topic = rng.sample(WORDS, 4)
+    for index in range(minutes * 3):
+        if index % 12 == 0:
+            topic = rng.sample(WORDS, 4)
+        seconds = index * 20
+        text = ' '.join(rng.choice(topic if rng.random() < 0.5 else WORDS) for _ in range(40))
+        lines.append(f"[{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}] {text}")
+    return "\n".join(lines)
+
+def measure(backend: str, model: str, minutes: int, runs: int) -> Dict[str, Any]:
+    """Load one backend and chapter the synthetic transcript runs times (child process)"""
+    
+    os.environ['LLM_BACKEND'] = backend
+    
+    from src.ai.llm_processor import LLMProcessor
+    
+    processor = LLMProcessor(model)
+    
+    started = time.perf_counter()
+    processor._get_backend().load()
+    load_seconds = time.perf_counter() - started
+    
+    transcript = synthetic_transcript(minutes)
+    seconds = 0.0
+    tokens = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        processor.generate_chapters(transcript, minutes * 60.0, minutes * 3, max_chapters=8)
+        seconds += time.perf_counter() - started
+        tokens += processor.run_metadata['llm_tokens_generated']
+    
+    return {
+        'load_seconds': load_seconds,
+        'seconds_per_job': seconds / runs if runs else 0.0,
+        'tokens_per_second': tokens / seconds if seconds else 0.0,
+        'prompt_tokens': processor.run_metadata.get('llm_prompt_tokens', 0),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_gb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024**2
+    }
+
+def run_child(backend: str, args: argparse.Namespace, runs: int) -> Dict[str, Any]:
+    """Measure a backend in a fresh interpreter and return its report"""
+    
+    completed = subprocess.run(
+        [
+            sys.executable, '-m', 'benchmarks.cpu_llm_backend',
+            '--child', backend,
+            '--model', args.model,
+            '--minutes', str(args.minutes),
+            '--runs', str(runs)
+        ],
+        check=True,
+        stdout=subprocess.PIPE
+    )
+    return json.loads(completed.stdout.decode().strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default='meta-llama/Llama-3.2-1B-Instruct', help='Hugging Face model to compare')
+    parser.add_argument('--minutes', type=int, default=10, help='Length of the synthetic video')
+    parser.add_argument('--runs', type=int, default=3, help='Chaptering jobs per backend')
+    parser.add_argument('--child', choices=BACKENDS, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(measure(args.child, args.model, args.minutes, args.runs)))
+        return
+    
+    # Both backends decode freely, so they generate comparable token counts
+    os.environ['LLM_CONSTRAINED_DECODING'] = 'false'
+    os.environ.setdefault('LLM_CT2_COMPUTE_TYPE', 'int8')
+    
+    # Converting the model loads its float weights, which must not count towards the int8 peak
+    run_child('ctranslate2', args, 0)
+    
+    results = {backend: run_child(backend, args, args.runs) for backend in BACKENDS}
+    
+    print(
+        f"{args.model}, {args.minutes} min transcript ({results['transformers']['prompt_tokens']} prompt tokens), "
+        f"{args.runs} jobs per backend"
+    )
+    print(f"{'backend':<14}{'load s':>8}{'s/job':>9}{'tok/s':>9}{'peak RSS GB':>13}")
+    for backend, stats in results.items():
+        print(
+            f"{backend:<14}{stats['load_seconds']:>8.1f}{stats['seconds_per_job']:>9.2f}"
+            f"{stats['tokens_per_second']:>9.1f}{stats['peak_rss_gb']:>13.2f}"
+        )
+    
+    baseline, quantized = results['transformers'], results['ctranslate2']
+    if baseline['tokens_per_second'] and quantized['tokens_per_second']:
+        print(
+            f"int8 vs float32: {quantized['tokens_per_second'] / baseline['tokens_per_second']:.2f}x tokens/s, "
+            f"{quantized['peak_rss_gb'] / baseline['peak_rss_gb']:.2f}x peak RSS"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark chapter generation throughput of concurrent jobs with and without the shared LLM batch queue
+
+Usage (from the backend directory):
+    python -m benchmarks.llm_batch_queue --jobs 8 --prompts 4
+"""
+
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import List, Dict, Any, Callable
+
+from src.ai.llm_processor import LLMProcessor
+from src.ai.llm_backends import LLMBackend
+from src.ai.llm_batch_scheduler import LLMBatchScheduler
+
+class StubBackend(LLMBackend):
+    """
+    Stand-in for a batched generate() call on a GPU
+    
+    A call costs a fixed decode time plus a small amount per prompt, so a
+    batch of n prompts is much cheaper than n single-prompt calls. Calls are
+    serialized like they are on one device. The decode time is spread over
+    the response, which is streamed in pieces when asked to.
+    """
+    
+    batch_key = ('stub',)
+    
+    response = json.dumps({'chapters': [
+        {'start_time': 0, 'title': 'Introduction', 'confidence': 0.9},
+        {'start_time': 95, 'title': 'Main Topic', 'confidence': 0.85},
+        {'start_time': 240, 'title': 'Summary', 'confidence': 0.8}
+    ]})
+    
+    def __init__(self, call_seconds: float, row_seconds: float):
+        self.call_seconds = call_seconds
+        self.row_seconds = row_seconds
+        self.calls = 0
+        
+        # One device: direct calls from different jobs cannot overlap either
+        self._device_lock = Lock()
+    
+    def generate(
+        self,
+        user_prompts: List[str],
+        system_prompt: str,
+        max_new_tokens: int,
+        json_max_chapters: int = None,
+        num_samples: int = 1,
+        stream_callback: Callable[[int, str], None] = None
+    ) -> List[Dict[str, Any]]:
+        pieces = [self.response[start:start + 16] for start in range(0, len(self.response), 16)]
+        with self._device_lock:
+            seconds = self.call_seconds + self.row_seconds * len(user_prompts)
+            for piece in pieces:
+                time.sleep(seconds / len(pieces))
+                if stream_callback:
+                    for index in range(len(user_prompts)):
+                        stream_callback(index, piece)
+            self.calls += 1
+        return [
+            {
+                'text': self.response,
+                'llm_tokens_generated': 64,
+                'llm_prefill_tokens_saved': 0,
+                'batch_size': len(user_prompts)
+            }
+            for _ in user_prompts
+        ]
+
+def run_jobs(queue_enabled: bool, jobs: int, prompts: int, backend: StubBackend) -> Dict[str, Any]:
+    """Run concurrent jobs that each generate a number of prompts"""
+    
+    def job(index: int) -> Dict[str, Any]:
+        processor = LLMProcessor()
+        processor.batch_queue_enabled = queue_enabled
+        processor._backend = backend
+        processor.run_metadata = {}
+        
+        for prompt in range(prompts):
+            processor._generate_batch([f"job {index} prompt {prompt}"], max_chapters=15)
+        return processor.run_metadata
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        metadata = list(executor.map(job, range(jobs)))
+    elapsed = time.perf_counter() - started
+    
+    return {
+        'seconds': elapsed,
+        'max_batch_size': max(item['llm_max_batch_size'] for item in metadata)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=8, help='Concurrent jobs')
+    parser.add_argument('--prompts', type=int, default=4, help='Prompts per job (windows or retries)')
+    parser.add_argument('--call-ms', type=float, default=200.0, help='Stub cost of one generate() call')
+    parser.add_argument('--row-ms', type=float, default=20.0, help='Stub cost per prompt in a batch')
+    parser.add_argument('--batch-size', type=int, default=8, help='LLM_BATCH_SIZE')
+    parser.add_argument('--max-wait-ms', type=float, default=50.0, help='LLM_BATCH_MAX_WAIT_MS')
+    args = parser.parse_args()
+    
+    LLMBatchScheduler().configure(batch_size=args.batch_size, max_wait_ms=args.max_wait_ms)
+    
+    results = {}
+    for label, queue_enabled in (('direct', False), ('batch queue', True)):
+        backend = StubBackend(args.call_ms / 1000, args.row_ms / 1000)
+        results[label] = run_jobs(queue_enabled, args.jobs, args.prompts, backend)
+        results[label]['calls'] = backend.calls
+    
+    total = args.jobs * args.prompts
+    print(f"{args.jobs} jobs x {args.prompts} prompts, stub call {args.call_ms:g} ms + {args.row_ms:g} ms/prompt")
+    print(f"{'mode':<14}{'wall s':>10}{'prompts/s':>12}{'calls':>8}{'max batch':>11}")
+    for label, stats in results.items():
+        print(
+            f"{label:<14}{stats['seconds']:>10.2f}{total / stats['seconds']:>12.1f}"
+            f"{stats['calls']:>8}{stats['max_batch_size']:>11}"
+        )
+    print(f"Speedup: {results['direct']['seconds'] / results['batch queue']['seconds']:.2f}x")
+
+if __name__ == '__main__':
+    main()
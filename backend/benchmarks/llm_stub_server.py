@@ -0,0 +1,221 @@
+"""
+Minimal OpenAI-compatible completion server for testing the 'openai' LLM backend
+
+Every worker pointed at it (LLM_BACKEND=openai, LLM_SERVER_URL) shares one
+model: either a real Hugging Face model loaded once in this process, or a stub
+that returns canned chapters after a simulated decode time. Concurrent
+requests are batched through the LLM batch queue. Streaming requests receive
+the response as server-sent events while it is generated.
+
+Usage (from the backend directory):
+    python -m benchmarks.llm_stub_server --port 8080
+    python -m benchmarks.llm_stub_server --port 8080 --model meta-llama/Llama-3.2-1B-Instruct
+"""
+
+import json
+import time
+import uuid
+import argparse
+import logging
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from typing import List, Dict, Any, Callable
+
+from src.ai.llm_backends import LLMBackend, TransformersBackend
+from src.ai.llm_batch_scheduler import LLMBatchScheduler
+from benchmarks.llm_batch_queue import StubBackend
+
+class WordTokenizer:
+    """Whitespace tokenizer with a growing vocabulary, standing in for a real one in stub mode"""
+    
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.words: List[str] = []
+        self._lock = Lock()
+    
+    def encode(self, text: str, add_special_tokens: bool = False) -> List[int]:
+        with self._lock:
+            for word in text.split():
+                if word not in self.ids:
+                    self.ids[word] = len(self.words)
+                    self.words.append(word)
+            return [self.ids[word] for word in text.split()]
+    
+    def decode(self, tokens: List[int]) -> str:
+        return ' '.join(self.words[token] for token in tokens)
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    """Serves /v1/chat/completions, /tokenize, /detokenize, /v1/models and /health"""
+    
+    protocol_version = 'HTTP/1.1'  # keep-alive, like a real server
+    
+    backend: LLMBackend = None
+    model_name: str = None
+    tokenizer = None
+    
+    def do_GET(self):
+        if self.path == '/health':
+            self._send({'status': 'ok'})
+        elif self.path == '/v1/models':
+            self._send({'object': 'list', 'data': [{'id': self.model_name, 'object': 'model'}]})
+        else:
+            self._send({'error': 'not found'}, status=404)
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._send({'error': 'invalid JSON'}, status=400)
+            return
+        
+        if self.path == '/v1/chat/completions' and payload.get('stream'):
+            self._stream_completion(payload)
+        elif self.path == '/v1/chat/completions':
+            try:
+                self._send(self._complete(payload))
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Completion failed: {str(e)}")
+                self._send({'error': str(e)}, status=500)
+        elif self.path == '/tokenize':
+            text = payload.get('content') or payload.get('prompt') or ''
+            tokens = self.tokenizer.encode(text, add_special_tokens=False)
+            self._send({'tokens': tokens, 'count': len(tokens)})
+        elif self.path == '/detokenize':
+            self._send({'content': self.tokenizer.decode(payload.get('tokens', []))})
+        else:
+            self._send({'error': 'not found'}, status=404)
+    
+    def _complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one chat completion and build its response"""
+        
+        result = self._generate(payload)
+        num_samples = int(payload.get('n', 1))
+        samples = result.get('samples') or [result['text']] * num_samples
+        return {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': self.model_name,
+            'choices': [
+                {'index': index, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}
+                for index, text in enumerate(samples)
+            ],
+            'usage': self._usage(result)
+        }
+    
+    def _stream_completion(self, payload: Dict[str, Any]):
+        """Run one chat completion, sending its text as server-sent events in a chunked response"""
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        
+        def send_event(data: str):
+            body = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(body):x}\r\n".encode() + body + b"\r\n")
+            self.wfile.flush()
+        
+        def send_text(text: str):
+            send_event(json.dumps({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'model': self.model_name,
+                'choices': [{'index': 0, 'delta': {'content': text}, 'finish_reason': None}]
+            }))
+        
+        try:
+            result = self._generate(payload, stream=send_text)
+            send_event(json.dumps({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'model': self.model_name,
+                'choices': [],
+                'usage': self._usage(result)
+            }))
+            send_event('[DONE]')
+        except Exception as e:
+            # The status line is already sent, so the client sees a stream that ends early
+            logging.getLogger(__name__).error(f"Streaming completion failed: {str(e)}")
+        
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def _generate(self, payload: Dict[str, Any], stream: Callable[[str], None] = None) -> Dict[str, Any]:
+        """Run one chat completion through the shared batch queue"""
+        
+        messages = {message['role']: message['content'] for message in payload['messages']}
+        max_tokens = int(payload.get('max_tokens', 256))
+        num_samples = int(payload.get('n', 1))
+        
+        # A JSON schema with a chapter limit turns on the in-process chapter grammar
+        schema = ((payload.get('response_format') or {}).get('json_schema') or {}).get('schema') or {}
+        json_max_chapters = ((schema.get('properties') or {}).get('chapters') or {}).get('maxItems')
+        
+        system_prompt = messages.get('system', '')
+        generate = partial(
+            self.backend.generate,
+            system_prompt=system_prompt,
+            max_new_tokens=max_tokens,
+            json_max_chapters=json_max_chapters,
+            num_samples=num_samples
+        )
+        batch_key = (system_prompt, max_tokens, json_max_chapters, num_samples)
+        return LLMBatchScheduler().generate([messages.get('user', '')], batch_key, generate, streams=[stream])[0]
+    
+    def _usage(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """OpenAI usage block of a generation result"""
+        
+        return {
+            'completion_tokens': result['llm_tokens_generated'],
+            'prompt_tokens_details': {'cached_tokens': result['llm_prefill_tokens_saved']}
+        }
+    
+    def _send(self, data: Dict[str, Any], status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).debug(format % args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('--model', default=None, help='Hugging Face model to serve (default: canned stub)')
+    parser.add_argument('--max-input-tokens', type=int, default=4096, help='Prompt token limit of the model')
+    parser.add_argument('--call-ms', type=float, default=200.0, help='Stub cost of one generate() call')
+    parser.add_argument('--row-ms', type=float, default=20.0, help='Stub cost per prompt in a batch')
+    parser.add_argument('--batch-size', type=int, default=8, help='LLM_BATCH_SIZE')
+    parser.add_argument('--max-wait-ms', type=float, default=50.0, help='LLM_BATCH_MAX_WAIT_MS')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    LLMBatchScheduler().configure(batch_size=args.batch_size, max_wait_ms=args.max_wait_ms)
+    
+    if args.model:
+        backend = TransformersBackend(args.model, args.max_input_tokens)
+        CompletionHandler.tokenizer = backend.load()['tokenizer']
+        CompletionHandler.model_name = args.model
+    else:
+        backend = StubBackend(args.call_ms / 1000, args.row_ms / 1000)
+        CompletionHandler.tokenizer = WordTokenizer()
+        CompletionHandler.model_name = 'stub'
+    CompletionHandler.backend = backend
+    
+    server = ThreadingHTTPServer((args.host, args.port), CompletionHandler)
+    logging.getLogger(__name__).info(f"Serving {CompletionHandler.model_name} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
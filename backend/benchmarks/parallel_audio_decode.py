@@ -0,0 +1,83 @@
+"""
+Benchmark single-process against sliced parallel FFmpeg audio decoding
+
+Usage (from the backend directory, requires ffmpeg on PATH):
+    python -m benchmarks.parallel_audio_decode --minutes 120 --slices 4
+    python -m benchmarks.parallel_audio_decode --input /path/to/video.mp4 --slices 8
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+# Keep the transcript cache and checkpoints of the benchmark out of the real model directory
+os.environ.setdefault('MODEL_CACHE_DIR', tempfile.mkdtemp(prefix='decode-benchmark-'))
+
+from src.ai.asr_processor import ASRProcessor, SAMPLE_RATE
+
+# Samples on each side of a slice boundary compared separately
+SEAM_WINDOW = 1000
+
+def synthetic_media(minutes: float, directory: str) -> str:
+    """Encode a 48kHz stereo AAC file of the requested length (a typical video soundtrack)"""
+    
+    path = os.path.join(directory, 'synthetic.m4a')
+    subprocess.run(
+        [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={minutes * 60}',
+            '-f', 'lavfi', '-i', f'anoisesrc=color=pink:sample_rate=48000:amplitude=0.1:duration={minutes * 60}',
+            '-filter_complex', '[0:a][1:a]amerge=inputs=2[a]', '-map', '[a]',
+            '-c:a', 'aac', '-b:a', '128k',
+            path
+        ],
+        check=True
+    )
+    return path
+
+def measure(processor: ASRProcessor, path: str, slices: int):
+    """Decode once and return (samples, seconds)"""
+    
+    started = time.perf_counter()
+    audio = processor.decode_audio_to_array(path, num_slices=slices)
+    return audio, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--input', help='Media file to decode (a synthetic file is generated if omitted)')
+    parser.add_argument('--minutes', type=float, default=120.0, help='Synthetic media length')
+    parser.add_argument('--slices', type=int, default=os.cpu_count() or 4, help='Parallel FFmpeg processes')
+    args = parser.parse_args()
+    
+    processor = ASRProcessor()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.input or synthetic_media(args.minutes, directory)
+        
+        single, single_seconds = measure(processor, path, 1)
+        sliced, sliced_seconds = measure(processor, path, args.slices)
+    
+    print(f"Decoded {len(single) / SAMPLE_RATE / 60:.1f} min of audio")
+    print(f"{'mode':<20}{'seconds':>10}{'samples':>14}")
+    print(f"{'single process':<20}{single_seconds:>10.2f}{len(single):>14}")
+    print(f"{f'{args.slices} slices':<20}{sliced_seconds:>10.2f}{len(sliced):>14}")
+    print(f"Speedup: {single_seconds / sliced_seconds:.2f}x")
+    
+    if len(single) == len(sliced):
+        difference = np.abs(single - sliced)
+        slice_samples = -(-len(single) // args.slices)
+        seams = [
+            difference[max(0, k * slice_samples - SEAM_WINDOW):k * slice_samples + SEAM_WINDOW]
+            for k in range(1, args.slices)
+        ]
+        print(f"Max sample difference: {difference.max():.2e} overall, "
+              f"{max((seam.max() for seam in seams if len(seam)), default=0):.2e} at seams")
+    else:
+        print("Sample counts differ between modes")
+
+if __name__ == '__main__':
+    main()
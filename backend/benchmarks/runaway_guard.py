@@ -0,0 +1,134 @@
+"""
+Benchmark transcription wall-clock time on audio where the decoder loops, with and without the runaway guard
+
+Usage (from the backend directory):
+    python -m benchmarks.runaway_guard --minutes 30 --loop-minutes 10
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+
+# Keep the transcript cache and checkpoints of the benchmark out of the real model directory
+os.environ.setdefault('MODEL_CACHE_DIR', tempfile.mkdtemp(prefix='runaway-benchmark-'))
+
+from src.ai.asr_processor import ASRProcessor, SAMPLE_RATE
+from src.ai.speech_index import SpeechIndex
+
+SEGMENT_SECONDS = 4.0
+
+# Sample values marking what the stub model "hears"
+SPEECH_MARKER = 0.1
+MUSIC_MARKER = 0.9
+
+LOOP_PHRASE = " Thank you for watching."
+VOCABULARY = [f"word{i}" for i in range(2000)]
+
+class LoopingStubModel:
+    """
+    Stand-in for WhisperModel that decodes at a fixed real-time factor
+    
+    Speech yields distinct sentences, while music makes it emit the same phrase
+    segment after segment, like Whisper does on music beds.
+    """
+    
+    def __init__(self, real_time_factor: float, seed: int = 0):
+        self.real_time_factor = real_time_factor
+        self.rng = random.Random(seed)
+    
+    def transcribe(self, audio: np.ndarray, **kwargs):
+        duration = len(audio) / SAMPLE_RATE
+        info = SimpleNamespace(language='en', duration=duration)
+        return self._segments(audio, duration), info
+    
+    def _segments(self, audio: np.ndarray, duration: float):
+        start = 0.0
+        segment_id = 1
+        
+        while start < duration:
+            end = min(start + SEGMENT_SECONDS, duration)
+            time.sleep((end - start) * self.real_time_factor)
+            
+            if audio[int(start * SAMPLE_RATE)] >= MUSIC_MARKER:
+                text = LOOP_PHRASE
+            else:
+                text = " " + " ".join(self.rng.choice(VOCABULARY) for _ in range(10))
+            
+            yield SimpleNamespace(id=segment_id, start=start, end=end, text=text, words=[])
+            
+            start = end
+            segment_id += 1
+
+def synthetic_audio(minutes: float, loop_minutes: float):
+    """Build marker audio with a music bed in the middle and its speech index"""
+    
+    total_seconds = minutes * 60
+    music_start = (total_seconds - loop_minutes * 60) / 2
+    music_end = music_start + loop_minutes * 60
+    
+    audio = np.full(int(total_seconds * SAMPLE_RATE), SPEECH_MARKER, dtype=np.float32)
+    audio[int(music_start * SAMPLE_RATE):int(music_end * SAMPLE_RATE)] = MUSIC_MARKER
+    
+    # VAD usually reports a music bed as one long speech region
+    speech_index = SpeechIndex(
+        [0.0, music_start, music_end],
+        [music_start - 1.0, music_end - 1.0, total_seconds],
+        total_seconds
+    )
+    
+    return audio, speech_index
+
+def measure(label: str, guard_enabled: bool, audio: np.ndarray, speech_index: SpeechIndex, rtf: float) -> dict:
+    """Transcribe the synthetic audio once and report time and output"""
+    
+    processor = ASRProcessor(model_size='stub')
+    processor._model_info = {'model': LoopingStubModel(rtf)}
+    processor.runaway_guard_enabled = guard_enabled
+    processor.run_metadata = {}
+    
+    started = time.perf_counter()
+    transcript = processor.transcribe_audio(audio, speech_index=speech_index)
+    elapsed = time.perf_counter() - started
+    
+    looped = sum(1 for i in range(len(transcript)) if transcript.segment_text(i) == LOOP_PHRASE.strip())
+    
+    return {
+        'label': label,
+        'seconds': elapsed,
+        'segments': len(transcript),
+        'looped_segments': looped,
+        'skipped_seconds': processor.run_metadata.get('asr_skipped_seconds', 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutes', type=float, default=30.0, help='Synthetic audio length')
+    parser.add_argument('--loop-minutes', type=float, default=10.0, help='Length of the music bed the decoder loops on')
+    parser.add_argument('--rtf', type=float, default=0.002, help='Real-time factor of the stub decoder')
+    args = parser.parse_args()
+    
+    audio, speech_index = synthetic_audio(args.minutes, args.loop_minutes)
+    
+    results = [
+        measure('no guard', False, audio, speech_index, args.rtf),
+        measure('runaway guard', True, audio, speech_index, args.rtf)
+    ]
+    
+    print(f"Synthetic audio: {args.minutes:g} min with a {args.loop_minutes:g} min music bed, RTF {args.rtf:g}")
+    print(f"{'mode':<16}{'wall s':>10}{'segments':>10}{'looped':>10}{'skipped s':>12}")
+    for stats in results:
+        print(
+            f"{stats['label']:<16}{stats['seconds']:>10.2f}{stats['segments']:>10}"
+            f"{stats['looped_segments']:>10}{stats['skipped_seconds']:>12.1f}"
+        )
+    
+    saved = results[0]['seconds'] - results[1]['seconds']
+    print(f"Wall-clock saved: {saved:.2f}s ({saved / results[0]['seconds'] * 100:.0f}%)")
+
+if __name__ == '__main__':
+    main()
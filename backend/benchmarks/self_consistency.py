@@ -0,0 +1,202 @@
+"""
+Benchmark self-consistency voting against sequential retries for chapter generation
+
+Usage (from the backend directory):
+    python -m benchmarks.self_consistency --videos 8 --runs 4 --samples 5
+"""
+
+import json
+import time
+import random
+import argparse
+import itertools
+import statistics
+from typing import List, Dict, Any, Callable
+
+from src.ai.llm_processor import LLMProcessor
+from src.ai.llm_backends import LLMBackend
+
+class NoisyChapterer(LLMBackend):
+    """
+    Stand-in for a sampled generate() call on a GPU
+    
+    Every sample proposes the reference chapters of its video with jittered
+    start times, sometimes drops one or adds a spurious boundary, and
+    sometimes returns text that does not parse. A call costs a prefill (paid
+    once per prompt row, or once in total when the samples share it), a fixed
+    decode time and a small amount per extra row.
+    """
+    
+    batch_key = ('stub',)
+    
+    def __init__(
+        self,
+        references: List[List[float]],
+        prefill_seconds: float,
+        decode_seconds: float,
+        row_seconds: float,
+        seed: int
+    ):
+        self.references = references
+        self.prefill_seconds = prefill_seconds
+        self.decode_seconds = decode_seconds
+        self.row_seconds = row_seconds
+        self.random = random.Random(seed)
+        self.calls = 0
+    
+    def generate(
+        self,
+        user_prompts: List[str],
+        system_prompt: str,
+        max_new_tokens: int,
+        json_max_chapters: int = None,
+        num_samples: int = 1,
+        stream_callback: Callable[[int, str], None] = None
+    ) -> List[Dict[str, Any]]:
+        rows = len(user_prompts) * num_samples
+        prefill_rows = len(user_prompts) if num_samples > 1 else rows
+        time.sleep(
+            self.prefill_seconds * prefill_rows + self.decode_seconds + self.row_seconds * (rows - 1)
+        )
+        self.calls += 1
+        
+        results = []
+        for user_prompt in user_prompts:
+            reference = self.references[int(user_prompt.split()[-1])]
+            samples = [self._sample(reference) for _ in range(num_samples)]
+            results.append({
+                'text': samples[0],
+                'samples': samples,
+                'llm_tokens_generated': 0,
+                'llm_prefill_tokens_saved': 0,
+                'batch_size': len(user_prompts)
+            })
+        return results
+    
+    def _sample(self, reference: List[float]) -> str:
+        """One noisy response for a video"""
+        
+        if self.random.random() < 0.15:
+            return 'Here are the chapters: {"chapters": [{"start_time": 0, "title": '
+        
+        starts = [0.0] + [
+            max(1.0, start + self.random.gauss(0, 6))
+            for start in reference[1:] if self.random.random() > 0.15
+        ]
+        if self.random.random() < 0.3:
+            starts.append(self.random.uniform(0, reference[-1] + 120))
+        
+        chapters = [
+            {'start_time': round(start), 'title': f"Topic {index + 1}", 'confidence': round(self.random.uniform(0.6, 0.95), 2)}
+            for index, start in enumerate(sorted(starts))
+        ]
+        return json.dumps({'chapters': chapters})
+
+def boundary_f1(predicted: List[float], reference: List[float], tolerance: float) -> float:
+    """F1 of boundaries matched one-to-one within a tolerance"""
+    
+    unmatched = list(reference)
+    hits = 0
+    for start in predicted:
+        match = min(unmatched, key=lambda other: abs(other - start), default=None)
+        if match is not None and abs(match - start) <= tolerance:
+            unmatched.remove(match)
+            hits += 1
+    
+    if not predicted or not reference:
+        return float(predicted == reference)
+    precision = hits / len(predicted)
+    recall = hits / len(reference)
+    return 2 * precision * recall / (precision + recall) if hits else 0.0
+
+def run_mode(
+    mode: str,
+    references: List[List[float]],
+    runs: int,
+    samples: int,
+    generator: NoisyChapterer,
+    tolerance: float
+) -> Dict[str, Any]:
+    """Chapter every video several times and score accuracy and run-to-run stability"""
+    
+    processor = LLMProcessor()
+    processor._backend = generator
+    processor.vote_tolerance_seconds = tolerance
+    
+    outputs: List[List[List[float]]] = []
+    seconds = []
+    for index in range(len(references)):
+        video_outputs = []
+        for _ in range(runs):
+            processor.run_metadata = {
+                'llm_generation_attempts': 0,
+                'llm_generation_retries': 0,
+                'llm_parse_failures': 0
+            }
+            started = time.perf_counter()
+            if mode == 'vote':
+                chapters = processor._generate_with_voting(f"video {index}", 15, 30.0, samples)
+            else:
+                chapters = processor._generate_with_retry(f"video {index}", 15, 30.0)
+            seconds.append(time.perf_counter() - started)
+            video_outputs.append([chapter['start_time'] for chapter in chapters])
+        outputs.append(video_outputs)
+    
+    accuracy = [
+        boundary_f1(starts, reference, tolerance)
+        for reference, video_outputs in zip(references, outputs)
+        for starts in video_outputs
+    ]
+    stability = [
+        boundary_f1(first, second, tolerance)
+        for video_outputs in outputs
+        for first, second in itertools.combinations(video_outputs, 2)
+    ]
+    
+    return {
+        'seconds': statistics.mean(seconds),
+        'f1': statistics.mean(accuracy),
+        'stability': statistics.mean(stability) if stability else 1.0,
+        'calls': generator.calls
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--videos', type=int, default=8, help='Synthetic videos in the benchmark set')
+    parser.add_argument('--runs', type=int, default=4, help='Runs per video, for run-to-run stability')
+    parser.add_argument('--samples', type=int, default=5, help='LLM_VOTE_SAMPLES for the voting mode')
+    parser.add_argument('--tolerance', type=float, default=15.0, help='LLM_VOTE_TOLERANCE_SECONDS and scoring tolerance')
+    parser.add_argument('--prefill-ms', type=float, default=100.0, help='Stub prefill cost per prompt row')
+    parser.add_argument('--decode-ms', type=float, default=200.0, help='Stub decode cost of one call')
+    parser.add_argument('--row-ms', type=float, default=20.0, help='Stub decode cost per extra row')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    references = []
+    for _ in range(args.videos):
+        starts = [0.0]
+        for _ in range(rng.randint(4, 10)):
+            starts.append(starts[-1] + rng.uniform(60, 300))
+        references.append(starts)
+    
+    results = {}
+    for mode in ('retry', 'vote'):
+        generator = NoisyChapterer(
+            references, args.prefill_ms / 1000, args.decode_ms / 1000, args.row_ms / 1000, args.seed
+        )
+        results[mode] = run_mode(mode, references, args.runs, args.samples, generator, args.tolerance)
+    
+    print(
+        f"{args.videos} videos x {args.runs} runs, {args.samples} samples per vote, "
+        f"tolerance {args.tolerance:g}s"
+    )
+    print(f"{'mode':<8}{'s/video':>10}{'calls':>8}{'F1':>8}{'stability':>11}")
+    for mode, stats in results.items():
+        print(
+            f"{mode:<8}{stats['seconds']:>10.3f}{stats['calls']:>8}"
+            f"{stats['f1']:>8.3f}{stats['stability']:>11.3f}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark chapter generation with and without a draft model (speculative decoding)
+
+Both modes chapter the same synthetic transcript with the same seeds, so
+the measured speedup can be compared with the acceptance rate and the
+estimated speedup recorded in the run metadata. Drafting pays off when the
+draft is much smaller than the main model and the main model's passes are
+bound by reading its weights (GPU); on CPU a verification pass costs more
+the more tokens it checks.
+
+Usage (from the backend directory):
+    python -m benchmarks.speculative_decoding --model meta-llama/Llama-3.1-8B-Instruct \
+        --draft meta-llama/Llama-3.2-1B-Instruct --runs 3
+"""
+
+import time
+import argparse
+from typing import Dict, Any
+
+import torch
+
+from src.ai.llm_processor import LLMProcessor
+from benchmarks.cpu_llm_backend import synthetic_transcript
+
+def measure(model: str, draft: str, minutes: int, runs: int) -> Dict[str, Any]:
+    """Chapter the synthetic transcript runs times, assisted by draft if given"""
+    
+    processor = LLMProcessor(model)
+    processor.backend_name = 'transformers'
+    processor.draft_model_name = draft
+    processor._get_backend().load()
+    
+    transcript = synthetic_transcript(minutes)
+    seconds = 0.0
+    tokens = 0
+    totals: Dict[str, float] = {}
+    for run in range(runs):
+        torch.manual_seed(run)
+        started = time.perf_counter()
+        processor.generate_chapters(transcript, minutes * 60.0, minutes * 3, max_chapters=8)
+        seconds += time.perf_counter() - started
+        tokens += processor.run_metadata['llm_tokens_generated']
+        for key in ('llm_draft_tokens_proposed', 'llm_draft_tokens_accepted',
+                    'llm_speculative_seconds', 'llm_speculative_baseline_seconds'):
+            totals[key] = totals.get(key, 0) + processor.run_metadata.get(key, 0)
+    
+    return {
+        'seconds_per_job': seconds / runs,
+        'tokens_per_second': tokens / seconds if seconds else 0.0,
+        'acceptance_rate': (
+            totals['llm_draft_tokens_accepted'] / totals['llm_draft_tokens_proposed']
+            if totals['llm_draft_tokens_proposed'] else None
+        ),
+        'estimated_speedup': (
+            totals['llm_speculative_baseline_seconds'] / totals['llm_speculative_seconds']
+            if totals['llm_speculative_seconds'] else None
+        )
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default='meta-llama/Llama-3.1-8B-Instruct', help='Main Hugging Face model')
+    parser.add_argument('--draft', default='meta-llama/Llama-3.2-1B-Instruct', help='Draft model with the same tokenizer')
+    parser.add_argument('--minutes', type=int, default=10, help='Length of the synthetic video')
+    parser.add_argument('--runs', type=int, default=3, help='Chaptering jobs per mode')
+    args = parser.parse_args()
+    
+    # The first job loads the main model and caches its system prompt, both shared by the modes
+    measure(args.model, None, args.minutes, 1)
+    
+    results = {
+        'plain': measure(args.model, None, args.minutes, args.runs),
+        'draft': measure(args.model, args.draft, args.minutes, args.runs)
+    }
+    
+    print(f"{args.model} with draft {args.draft}, {args.minutes} min transcript, {args.runs} jobs per mode")
+    print(f"{'mode':<8}{'s/job':>9}{'tok/s':>9}{'accepted':>10}{'est. speedup':>14}")
+    for mode, stats in results.items():
+        acceptance = f"{stats['acceptance_rate']:.1%}" if stats['acceptance_rate'] is not None else '-'
+        estimated = f"{stats['estimated_speedup']:.2f}x" if stats['estimated_speedup'] is not None else '-'
+        print(f"{mode:<8}{stats['seconds_per_job']:>9.2f}{stats['tokens_per_second']:>9.1f}{acceptance:>10}{estimated:>14}")
+    
+    print(f"Measured speedup: {results['plain']['seconds_per_job'] / results['draft']['seconds_per_job']:.2f}x")
+
+if __name__ == '__main__':
+    main()
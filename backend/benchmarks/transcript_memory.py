@@ -0,0 +1,133 @@
+"""
+Benchmark peak memory of the list-of-dicts transcript against the struct-of-arrays Transcript
+
+Usage (from the backend directory):
+    python -m benchmarks.transcript_memory --hours 10
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from src.ai.transcript import TranscriptBuilder
+
+# Roughly conversational speech: ~150 words per minute in ~4 second segments
+WORDS_PER_SECOND = 2.5
+SEGMENT_SECONDS = 4.0
+
+VOCABULARY = [f"word{i}" for i in range(5000)]
+
+def synthetic_segments(hours: float, seed: int = 0):
+    """Yield faster-whisper-like segments covering the requested duration"""
+    
+    rng = random.Random(seed)
+    total_seconds = hours * 3600
+    words_per_segment = int(WORDS_PER_SECOND * SEGMENT_SECONDS)
+    word_seconds = SEGMENT_SECONDS / words_per_segment
+    start = 0.0
+    segment_id = 1
+    
+    while start < total_seconds:
+        words = []
+        for i in range(words_per_segment):
+            # Build fresh strings like a decoder would instead of reusing literals
+            text = " " + rng.choice(VOCABULARY)
+            word_start = start + i * word_seconds
+            words.append(SimpleNamespace(
+                word=text,
+                start=word_start,
+                end=word_start + word_seconds * 0.9,
+                probability=rng.random()
+            ))
+        
+        yield SimpleNamespace(
+            id=segment_id,
+            start=start,
+            end=start + SEGMENT_SECONDS,
+            text="".join(word.word for word in words),
+            words=words
+        )
+        
+        start += SEGMENT_SECONDS
+        segment_id += 1
+
+def build_dicts(hours: float):
+    """Build the transcript the way transcribe_audio did before Transcript existed"""
+    
+    segments = []
+    for segment in synthetic_segments(hours):
+        segments.append({
+            'id': segment.id,
+            'start': segment.start,
+            'end': segment.end,
+            'text': segment.text.strip(),
+            'words': [
+                {
+                    'word': word.word,
+                    'start': word.start,
+                    'end': word.end,
+                    'probability': word.probability
+                }
+                for word in segment.words
+            ]
+        })
+    return segments
+
+def build_transcript(hours: float):
+    """Build the struct-of-arrays transcript"""
+    
+    builder = TranscriptBuilder()
+    for segment in synthetic_segments(hours):
+        builder.append_segment(segment)
+    return builder.build()
+
+def measure(label: str, build, hours: float) -> dict:
+    """Run one builder under tracemalloc and report peak and retained memory"""
+    
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    
+    result = build(hours)
+    
+    elapsed = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    stats = {
+        'label': label,
+        'segments': len(result),
+        'peak_mb': peak / 1024 ** 2,
+        'retained_mb': retained / 1024 ** 2,
+        'build_seconds': elapsed
+    }
+    
+    del result
+    gc.collect()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hours', type=float, default=10.0, help='Synthetic transcript length')
+    args = parser.parse_args()
+    
+    results = [
+        measure('list-of-dicts', build_dicts, args.hours),
+        measure('Transcript', build_transcript, args.hours)
+    ]
+    
+    print(f"Synthetic transcript: {args.hours:g} hours, {results[0]['segments']} segments")
+    print(f"{'representation':<16}{'peak MB':>12}{'retained MB':>14}{'build s':>10}")
+    for stats in results:
+        print(
+            f"{stats['label']:<16}{stats['peak_mb']:>12.1f}"
+            f"{stats['retained_mb']:>14.1f}{stats['build_seconds']:>10.2f}"
+        )
+    
+    print(f"Peak memory reduction: {results[0]['peak_mb'] / results[1]['peak_mb']:.1f}x")
+
+if __name__ == '__main__':
+    main()
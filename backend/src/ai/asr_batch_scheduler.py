@@ -0,0 +1,405 @@
+"""
+Cross-job batched Whisper inference scheduler
+"""
+
+import os
+import time
+import queue
+import logging
+from concurrent.futures import Future, as_completed
+from dataclasses import dataclass, field
+from threading import Lock, Thread
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .model_manager import ModelManager
+from .asr_processor import SAMPLE_RATE
+from .speech_index import SpeechIndex
+
+logger = logging.getLogger(__name__)
+
+# Whisper decodes fixed 30-second windows
+WINDOW_SECONDS = 30
+WINDOW_SAMPLES = WINDOW_SECONDS * SAMPLE_RATE
+
+# Silence kept around the speech of a window (faster-whisper's default VAD speech padding)
+SPEECH_PAD_SECONDS = 0.4
+
+# Seconds per timestamp token
+TIME_PRECISION = 0.02
+
+# Maximum decoder sequence length of Whisper models
+MAX_DECODE_LENGTH = 448
+
+@dataclass
+class WindowRequest:
+    """One window of at most 30 seconds waiting to be decoded"""
+    
+    audio: np.ndarray
+    offset: float
+    model_size: str
+    language: Optional[str]
+    initial_prompt: Optional[str]
+    future: Future = field(default_factory=Future)
+
+class ASRBatchScheduler:
+    """
+    Singleton scheduler that batches Whisper windows across concurrent jobs
+    
+    Jobs split their audio into windows of at most 30 seconds and submit them;
+    a background thread collects up to ASR_BATCH_SIZE windows (waiting at most
+    ASR_BATCH_MAX_WAIT_MS for the batch to fill) and decodes them in one
+    encoder/decoder call. Batching across jobs requires tasks to share a
+    process, e.g. a Celery worker started with the threads pool.
+    """
+    
+    _instance = None
+    _lock = Lock()
+    
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ASRBatchScheduler, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        
+        self.model_manager = ModelManager()
+        self.batch_size = int(os.getenv('ASR_BATCH_SIZE', '8'))
+        self.max_wait_ms = float(os.getenv('ASR_BATCH_MAX_WAIT_MS', '50'))
+        self._queue: "queue.Queue[WindowRequest]" = queue.Queue()
+        self._thread = None
+        self._thread_lock = Lock()
+        self._initialized = True
+        
+        logger.info(
+            f"ASRBatchScheduler initialized (batch_size={self.batch_size}, "
+            f"max_wait_ms={self.max_wait_ms})"
+        )
+    
+    def configure(self, batch_size: int = None, max_wait_ms: float = None):
+        """Adjust the latency/throughput trade-off at runtime"""
+        
+        if batch_size is not None:
+            if batch_size <= 0:
+                raise ValueError("batch_size must be a positive integer")
+            self.batch_size = batch_size
+        
+        if max_wait_ms is not None:
+            if max_wait_ms < 0:
+                raise ValueError("max_wait_ms must not be negative")
+            self.max_wait_ms = max_wait_ms
+    
+    def submit(self, request: WindowRequest) -> Future:
+        """Queue a window for decoding and return a future for its segments"""
+        
+        self._ensure_running()
+        self._queue.put(request)
+        return request.future
+    
+    def transcribe(
+        self,
+        audio: np.ndarray,
+        model_size: str,
+        language: str = None,
+        initial_prompt: str = None,
+        progress_callback: callable = None,
+        speech_index: SpeechIndex = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Transcribe one job's audio through the shared batch queue
+        
+        Args:
+            audio: 16kHz mono float32 samples
+            model_size: faster-whisper model size
+            language: Language code (detected from the first window if None)
+            initial_prompt: Initial prompt to guide transcription
+            progress_callback: Function to call with progress updates
+            speech_index: Speech index of the audio, used to cut windows in silences
+                (computed if None)
+        
+        Returns:
+            List of transcription segments with timestamps and text
+        """
+        
+        if speech_index is None:
+            try:
+                speech_index = SpeechIndex.from_audio(audio, sample_rate=SAMPLE_RATE)
+            except Exception as e:
+                logger.warning(f"Speech index failed, cutting fixed windows: {str(e)}")
+        
+        if speech_index is not None:
+            windows = self.plan_windows(speech_index, len(audio))
+        else:
+            windows = [
+                (start, min(start + WINDOW_SAMPLES, len(audio)))
+                for start in range(0, len(audio), WINDOW_SAMPLES)
+            ]
+        
+        if not windows:
+            return []
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(windows)
+        
+        def make_request(index: int, window_language: Optional[str]) -> WindowRequest:
+            start, end = windows[index]
+            return WindowRequest(
+                audio=audio[start:end],
+                offset=start / SAMPLE_RATE,
+                model_size=model_size,
+                language=window_language,
+                initial_prompt=initial_prompt
+            )
+        
+        # Decode the first window on its own so the whole job shares one language
+        results[0], language = self.submit(make_request(0, language)).result()
+        
+        futures = {
+            self.submit(make_request(index, language)): index
+            for index in range(1, len(windows))
+        }
+        
+        completed = 1
+        if progress_callback:
+            progress_callback((completed / len(windows)) * 100, f"Transcribed window 1/{len(windows)}")
+        
+        # Collect in the caller's thread so callbacks keep the job's DB session
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index], _ = future.result()
+            completed += 1
+            
+            if progress_callback:
+                progress_callback(
+                    (completed / len(windows)) * 100,
+                    f"Transcribed window {completed}/{len(windows)}"
+                )
+        
+        segments = []
+        for window_segments in results:
+            for segment in window_segments:
+                segment['id'] = len(segments) + 1
+                segments.append(segment)
+        
+        return segments
+    
+    def plan_windows(self, speech_index: SpeechIndex, total_samples: int) -> List[Tuple[int, int]]:
+        """
+        Group speech regions into windows of at most 30 seconds that start and end in silence
+        
+        Windows are decoded independently, so a cut inside a word would cut or
+        repeat it; only a single region longer than a window is cut without a
+        pause. Audio without speech is not decoded.
+        
+        Args:
+            speech_index: Speech index of the audio
+            total_samples: Length of the audio in samples
+        
+        Returns:
+            (start, end) sample ranges in time order
+        """
+        
+        # Room for the padding on both sides of the speech
+        limit = WINDOW_SECONDS - 2 * SPEECH_PAD_SECONDS
+        
+        groups: List[List[float]] = []
+        for region_start, region_end in zip(speech_index.speech_starts, speech_index.speech_ends):
+            # Overlong regions are split into window-sized pieces
+            pieces = []
+            while region_end - region_start > limit:
+                pieces.append((region_start, region_start + limit))
+                region_start += limit
+            pieces.append((region_start, region_end))
+            
+            for piece_start, piece_end in pieces:
+                if groups and piece_end - groups[-1][0] <= limit:
+                    groups[-1][1] = piece_end
+                else:
+                    groups.append([piece_start, piece_end])
+        
+        duration = total_samples / SAMPLE_RATE
+        windows = []
+        for index, (start, end) in enumerate(groups):
+            # Pad into the surrounding silence without reaching a neighbouring window
+            previous_end = groups[index - 1][1] if index > 0 else 0.0
+            next_start = groups[index + 1][0] if index + 1 < len(groups) else duration
+            start = max(start - SPEECH_PAD_SECONDS, (previous_end + start) / 2, 0.0)
+            end = min(end + SPEECH_PAD_SECONDS, (end + next_start) / 2, duration)
+            
+            start_sample = int(start * SAMPLE_RATE)
+            end_sample = min(int(end * SAMPLE_RATE), start_sample + WINDOW_SAMPLES, total_samples)
+            if end_sample > start_sample:
+                windows.append((start_sample, end_sample))
+        
+        return windows
+    
+    def _ensure_running(self):
+        """Start the batching thread on first use"""
+        
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name='asr-batch-scheduler', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        """Collect windows into batches and decode them until the process exits"""
+        
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Windows can only share a batch when they use the same model
+            groups: Dict[str, List[WindowRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.model_size, []).append(request)
+            
+            for model_size, requests in groups.items():
+                try:
+                    outputs = self._decode_batch(model_size, requests)
+                    for request, output in zip(requests, outputs):
+                        request.future.set_result(output)
+                except Exception as e:
+                    logger.error(f"Batched ASR decoding failed: {str(e)}")
+                    for request in requests:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+    
+    def _decode_batch(self, model_size: str, requests: List[WindowRequest]) -> List[tuple]:
+        """Run one encoder pass and one batched decoder pass over the windows"""
+        
+        import ctranslate2
+        from faster_whisper.tokenizer import Tokenizer
+        
+        model = self.model_manager.get_asr_model(model_size)['model']
+        
+        features = np.stack([self._window_features(model, request.audio) for request in requests])
+        to_cpu = model.model.device == "cuda" and len(model.model.device_index) > 1
+        encoder_output = model.model.encode(
+            ctranslate2.StorageView.from_array(np.ascontiguousarray(features)),
+            to_cpu=to_cpu
+        )
+        
+        languages = [request.language for request in requests]
+        if any(language is None for language in languages):
+            if model.model.is_multilingual:
+                detected = model.model.detect_language(encoder_output)
+                languages = [
+                    language or detected[i][0][0][2:-2]
+                    for i, language in enumerate(languages)
+                ]
+            else:
+                languages = [language or 'en' for language in languages]
+        
+        tokenizers = []
+        prompts = []
+        for request, language in zip(requests, languages):
+            tokenizer = Tokenizer(
+                model.hf_tokenizer,
+                model.model.is_multilingual,
+                task='transcribe',
+                language=language
+            )
+            previous_tokens = (
+                tokenizer.encode(" " + request.initial_prompt.strip())
+                if request.initial_prompt else []
+            )
+            tokenizers.append(tokenizer)
+            prompts.append(model.get_prompt(tokenizer, previous_tokens, without_timestamps=False))
+        
+        results = model.model.generate(
+            encoder_output,
+            prompts,
+            beam_size=5,
+            patience=1,
+            length_penalty=1,
+            max_length=MAX_DECODE_LENGTH,
+            return_scores=True,
+            return_no_speech_prob=True,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+            max_initial_timestamp_index=50
+        )
+        
+        outputs = []
+        for request, tokenizer, language, result in zip(requests, tokenizers, languages, results):
+            # Same silence rule as faster-whisper: high no-speech probability and low confidence
+            if result.no_speech_prob > 0.6 and result.scores[0] < -1.0:
+                outputs.append(([], language))
+                continue
+            
+            window_duration = len(request.audio) / SAMPLE_RATE
+            segments = self._split_segments(
+                tokenizer, result.sequences_ids[0], request.offset, window_duration
+            )
+            outputs.append((segments, language))
+        
+        return outputs
+    
+    def _window_features(self, model, audio: np.ndarray) -> np.ndarray:
+        """Compute log-mel features padded or trimmed to one 30-second window"""
+        
+        if len(audio) < WINDOW_SAMPLES:
+            audio = np.pad(audio, (0, WINDOW_SAMPLES - len(audio)))
+        
+        features = model.feature_extractor(audio)
+        num_frames = model.feature_extractor.nb_max_frames
+        
+        if features.shape[-1] < num_frames:
+            features = np.pad(features, ((0, 0), (0, num_frames - features.shape[-1])))
+        
+        return features[:, :num_frames]
+    
+    def _split_segments(
+        self,
+        tokenizer,
+        tokens: List[int],
+        offset: float,
+        window_duration: float
+    ) -> List[Dict[str, Any]]:
+        """Split a decoded token sequence into segments at its timestamp tokens"""
+        
+        segments = []
+        text_tokens: List[int] = []
+        segment_start = 0.0
+        
+        def emit(start: float, end: float):
+            text = tokenizer.decode(text_tokens).strip()
+            if text:
+                segments.append({
+                    'id': None,
+                    'start': offset + min(start, window_duration),
+                    'end': offset + min(max(end, start), window_duration),
+                    'text': text,
+                    'words': []
+                })
+        
+        for token in tokens:
+            if token >= tokenizer.timestamp_begin:
+                time_value = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+                if text_tokens:
+                    emit(segment_start, time_value)
+                    text_tokens = []
+                segment_start = time_value
+            elif token < tokenizer.eot:
+                text_tokens.append(token)
+        
+        if text_tokens:
+            emit(segment_start, window_duration)
+        
+        return segments
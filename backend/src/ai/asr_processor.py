@@ -3,23 +3,144 @@ ASR (Automatic Speech Recognition) processor using faster-whisper
 """
 
 import os
+import time
 import logging
 import tempfile
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union, Sequence, Mapping, Iterator
 from pathlib import Path
 import subprocess
 
+import numpy as np
+
 from .model_manager import ModelManager
+from .transcript import Transcript, TranscriptBuilder, TranscriptStatistics
+from .transcript_cache import TranscriptCache
+from .transcription_checkpoint import TranscriptionCheckpointStore
+from .speech_index import SpeechIndex
+from .runaway_guard import RunawayGuard
+from .asr_router import ASRModelRouter
 
 logger = logging.getLogger(__name__)
 
+# Whisper expects 16kHz mono audio
+SAMPLE_RATE = 16000
+
+# Size of the RIFF header written in front of PCM data by FFmpeg's WAV muxer
+WAV_HEADER_BYTES = 44
+
+# Audio decoded before each parallel decode slice so the resampler has settled at the seam
+DECODE_SLICE_PREROLL_SECONDS = 1.0
+
+# Shortest slice worth a separate FFmpeg process
+MIN_DECODE_SLICE_SECONDS = 60
+
+# Seconds of speech the language is detected from (one Whisper window)
+LANGUAGE_DETECTION_SECONDS = 30
+
+# Seconds of surrounding silence included when a low-confidence span is re-decoded
+REDECODE_PADDING_SECONDS = 0.2
+
+# Silence decoded around each speech region (matches the VAD filter's speech_pad_ms)
+SPEECH_PAD_SECONDS = 0.4
+
+def build_transcribe_kwargs(
+    language: str = None,
+    initial_prompt: str = None,
+    speech_clips: List[Tuple[float, float]] = None
+) -> Dict[str, Any]:
+    """
+    Build the faster-whisper transcribe() arguments shared by all transcription modes
+    
+    Args:
+        language: Language code (auto-detect if None)
+        initial_prompt: Initial prompt to guide transcription
+        speech_clips: (start, end) seconds of the speech to decode, relative to the
+            audio passed to transcribe(); the VAD filter finds the speech if None
+    
+    Returns:
+        Keyword arguments for WhisperModel.transcribe()
+    """
+    
+    transcribe_kwargs = {
+        'language': language,
+        'initial_prompt': initial_prompt,
+        'word_timestamps': True,  # Enable word-level timestamps
+    }
+    
+    if speech_clips is not None:
+        # The speech index already located the speech, so VAD does not run again
+        transcribe_kwargs['vad_filter'] = False
+        transcribe_kwargs['clip_timestamps'] = [
+            round(t, 3) for clip in speech_clips for t in clip
+        ]
+    else:
+        transcribe_kwargs['vad_filter'] = True  # Enable voice activity detection
+        transcribe_kwargs['vad_parameters'] = {
+            'min_silence_duration_ms': 500,
+            'speech_pad_ms': int(SPEECH_PAD_SECONDS * 1000)
+        }
+    
+    # Remove None values
+    return {k: v for k, v in transcribe_kwargs.items() if v is not None}
+
 class ASRProcessor:
     """Handles audio transcription using faster-whisper"""
     
-    def __init__(self, model_size: str = "large-v3"):
+    def __init__(
+        self,
+        model_size: str = "large-v3",
+        audio_decode_mode: str = None,
+        transcription_mode: str = None
+    ):
         self.model_manager = ModelManager()
         self.model_size = model_size
         self._model_info = None
+        
+        # 'pipe' decodes audio straight into memory, 'file' goes through a temporary WAV
+        self.audio_decode_mode = audio_decode_mode or os.getenv('ASR_AUDIO_DECODE_MODE', 'pipe')
+        
+        # Number of concurrent FFmpeg processes decoding time slices of long videos in 'pipe' mode
+        self.audio_decode_slices = int(os.getenv('ASR_AUDIO_DECODE_SLICES', '1'))
+        
+        # 'sequential' runs one transcribe() call, 'chunked' splits the audio across a process pool
+        # (needs a worker that may start processes: Celery --pool threads or solo, not prefork),
+        # 'batched' shares 30-second windows with other jobs through ASRBatchScheduler,
+        # 'two_pass' drafts with a small model and re-decodes low-confidence spans with model_size
+        self.transcription_mode = transcription_mode or os.getenv('ASR_TRANSCRIPTION_MODE', 'sequential')
+        
+        # Two-pass settings: draft model size and the mean word probability below which a span is re-decoded
+        self.draft_model_size = os.getenv('ASR_DRAFT_MODEL', 'small')
+        self.redecode_threshold = float(os.getenv('ASR_REDECODE_THRESHOLD', '0.6'))
+        
+        # Language reported by the model for the last decoded audio
+        self.detected_language: Optional[str] = None
+        
+        # Send jobs to a faster checkpoint for their language (routing table in ASR_MODEL_ROUTES)
+        self.model_routing_enabled = os.getenv('ASR_MODEL_ROUTING_ENABLED', 'true').lower() == 'true'
+        self.model_router = ASRModelRouter()
+        
+        # Model, language and real-time factor of the last transcribe_video() run
+        self.model_used: Dict[str, Any] = {}
+        
+        # Metrics describing the last transcribe_video() run (merged into job metadata)
+        self.run_metadata: Dict[str, Any] = {}
+        
+        # Running statistics of the transcript currently being streamed by iter_segments()
+        self.run_statistics = TranscriptStatistics()
+        
+        self.transcript_cache = TranscriptCache()
+        
+        # Seconds of decoding between durable checkpoints of a job's transcript (0 disables)
+        self.checkpoint_interval = float(os.getenv('ASR_CHECKPOINT_INTERVAL_SECONDS', '60'))
+        self.checkpoint_store = TranscriptionCheckpointStore()
+        
+        # Abort segments where the decoder loops on music or silence and skip ahead
+        self.runaway_guard_enabled = os.getenv('ASR_RUNAWAY_GUARD_ENABLED', 'true').lower() == 'true'
+        self.runaway_skip_seconds = float(os.getenv('ASR_RUNAWAY_SKIP_SECONDS', '30'))
+        
+        # Speech/silence index of the last transcribe_video() audio, shared with later stages
+        self.speech_index_enabled = os.getenv('ASR_SPEECH_INDEX_ENABLED', 'true').lower() == 'true'
+        self.speech_index: Optional[SpeechIndex] = None
     
     def _get_model(self) -> Dict[str, Any]:
         """Get or load the ASR model"""
@@ -70,98 +191,767 @@ class ASRProcessor:
             logger.error(f"Audio extraction failed: {str(e)}")
             raise
     
-    def transcribe_audio(
-        self, 
-        audio_path: str,
+    def decode_audio_to_array(self, video_path: str, num_slices: int = None) -> np.ndarray:
+        """
+        Decode the audio track of a video into memory through an FFmpeg pipe
+        
+        FFmpeg writes raw float32 PCM to stdout and the bytes are read directly
+        into a preallocated NumPy buffer sized from the probed duration, so no
+        scratch file is written and no intermediate copies are made. Long
+        videos can be split into time slices decoded by concurrent FFmpeg
+        processes, each writing its own region of the same buffer.
+        
+        Args:
+            video_path: Path to video file
+            num_slices: Number of concurrent FFmpeg processes (defaults to ASR_AUDIO_DECODE_SLICES)
+            
+        Returns:
+            Mono 16kHz float32 samples, ready to pass to faster-whisper
+        """
+        
+        num_slices = num_slices or self.audio_decode_slices
+        duration = self._probe_duration(video_path)
+        
+        if num_slices > 1 and duration and duration >= num_slices * MIN_DECODE_SLICE_SECONDS:
+            try:
+                return self._decode_audio_slices(video_path, duration, num_slices)
+            except Exception as e:
+                logger.warning(f"Sliced audio decoding failed, decoding in one process: {str(e)}")
+        
+        cmd = self._decode_command(video_path)
+        
+        if duration:
+            # One second of headroom for containers that under-report their duration
+            capacity = int(duration * SAMPLE_RATE) + SAMPLE_RATE
+        else:
+            capacity = SAMPLE_RATE * 600
+        
+        buffer = np.empty(capacity, dtype=np.float32)
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        
+        logger.info(f"Decoding audio from {video_path} into memory ({capacity} samples preallocated)")
+        
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        
+        try:
+            while True:
+                if filled == len(view):
+                    # Probe under-reported the duration: grow once and keep reading
+                    logger.warning("Audio buffer exhausted, growing preallocated buffer")
+                    grown = np.empty(len(buffer) * 2, dtype=np.float32)
+                    grown[:len(buffer)] = buffer
+                    buffer = grown
+                    view = memoryview(buffer).cast('B')
+                
+                read = process.stdout.readinto(view[filled:])
+                if not read:
+                    break
+                filled += read
+            
+            stderr = process.stderr.read()
+            returncode = process.wait()
+            
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            process.stdout.close()
+            process.stderr.close()
+        
+        if returncode != 0:
+            raise RuntimeError(f"FFmpeg failed: {stderr.decode(errors='replace')}")
+        
+        num_samples = filled // buffer.itemsize
+        logger.info(f"Decoded {num_samples / SAMPLE_RATE:.2f}s of audio into memory")
+        
+        return buffer[:num_samples]
+    
+    def _decode_command(
+        self,
+        video_path: str,
+        seek_seconds: float = None,
+        read_seconds: float = None,
+        audio_filter: str = None
+    ) -> List[str]:
+        """Build the FFmpeg command that writes mono 16kHz float32 PCM to stdout"""
+        
+        cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+        
+        # Input options: seek and limit what is demuxed and decoded
+        if seek_seconds:
+            cmd += ['-ss', f'{seek_seconds:.6f}']
+        if read_seconds:
+            cmd += ['-t', f'{read_seconds:.6f}']
+        
+        cmd += [
+            '-i', video_path,
+            '-vn',  # No video
+            '-f', 'f32le',  # Raw float32 little-endian, the layout faster-whisper consumes
+            '-acodec', 'pcm_f32le',
+            '-ar', str(SAMPLE_RATE),
+            '-ac', '1'  # Mono
+        ]
+        
+        if audio_filter:
+            cmd += ['-af', audio_filter]
+        
+        return cmd + ['pipe:1']
+    
+    def _decode_audio_slices(self, video_path: str, duration: float, num_slices: int) -> np.ndarray:
+        """
+        Decode time slices of the audio concurrently into disjoint regions of one buffer
+        
+        Slice boundaries are fixed in samples. Each process seeks a little before
+        its slice, resamples to 16kHz inside the filter graph and only then trims
+        the pre-roll with atrim, so the trim counts output samples, every slice
+        starts on its exact sample and the resampler has settled by then.
+        """
+        
+        from concurrent.futures import ThreadPoolExecutor
+        
+        total_samples = int(duration * SAMPLE_RATE)
+        slice_samples = -(-total_samples // num_slices)
+        preroll_samples = int(DECODE_SLICE_PREROLL_SECONDS * SAMPLE_RATE)
+        
+        # One second of headroom on the last slice for containers that under-report their duration
+        buffer = np.empty(total_samples + SAMPLE_RATE, dtype=np.float32)
+        view = memoryview(buffer).cast('B')
+        itemsize = buffer.itemsize
+        
+        def decode_slice(index: int) -> int:
+            start = index * slice_samples
+            is_last = index == num_slices - 1
+            preroll = min(preroll_samples, start)
+            seek = (start - preroll) / SAMPLE_RATE
+            
+            # -ar applies after -af, so resample first or atrim would count source-rate samples
+            if is_last:
+                # Read to the end of the stream
+                audio_filter = f'aresample={SAMPLE_RATE},atrim=start_sample={preroll}'
+                read_seconds = None
+                region = view[start * itemsize:]
+            else:
+                audio_filter = (
+                    f'aresample={SAMPLE_RATE},'
+                    f'atrim=start_sample={preroll}:end_sample={preroll + slice_samples}'
+                )
+                read_seconds = (preroll + slice_samples) / SAMPLE_RATE + 1.0
+                region = view[start * itemsize:(start + slice_samples) * itemsize]
+            
+            cmd = self._decode_command(video_path, seek, read_seconds, audio_filter)
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            filled = 0
+            
+            try:
+                while filled < len(region):
+                    read = process.stdout.readinto(region[filled:])
+                    if not read:
+                        break
+                    filled += read
+                
+                overflow = bool(process.stdout.read(1))
+                stderr = process.stderr.read()
+                returncode = process.wait()
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+            finally:
+                process.stdout.close()
+                process.stderr.close()
+            
+            if returncode != 0:
+                raise RuntimeError(f"FFmpeg failed on slice {index}: {stderr.decode(errors='replace')}")
+            if overflow:
+                raise RuntimeError(f"Slice {index} produced more audio than the probed duration")
+            if not is_last and filled != len(region):
+                raise RuntimeError(f"Slice {index} produced {filled // itemsize} of {slice_samples} samples")
+            
+            return filled // itemsize
+        
+        logger.info(f"Decoding audio from {video_path} in {num_slices} parallel slices")
+        
+        with ThreadPoolExecutor(max_workers=num_slices) as executor:
+            slice_lengths = list(executor.map(decode_slice, range(num_slices)))
+        
+        num_samples = (num_slices - 1) * slice_samples + slice_lengths[-1]
+        logger.info(f"Decoded {num_samples / SAMPLE_RATE:.2f}s of audio into memory")
+        
+        return buffer[:num_samples]
+    
+    def _probe_duration(self, media_path: str) -> Optional[float]:
+        """Probe media duration in seconds using ffprobe"""
+        
+        try:
+            import ffmpeg
+            
+            probe = ffmpeg.probe(media_path)
+            duration = probe.get('format', {}).get('duration')
+            return float(duration) if duration else None
+            
+        except Exception as e:
+            logger.warning(f"Failed to probe duration of {media_path}: {str(e)}")
+            return None
+    
+    def _wav_io_bytes(self, num_samples: int) -> int:
+        """Bytes a temporary 16-bit WAV would cost to write and read back"""
+        return 2 * (WAV_HEADER_BYTES + num_samples * 2)
+    
+    def iter_segments(
+        self,
+        audio_path: Union[str, np.ndarray],
         language: str = None,
         initial_prompt: str = None,
-        progress_callback: callable = None
-    ) -> List[Dict[str, Any]]:
+        progress_callback: callable = None,
+        statistics: TranscriptStatistics = None,
+        offset: float = 0.0,
+        speech_index: SpeechIndex = None,
+        model_size: str = None
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Transcribe audio file and return segments with timestamps
+        Transcribe audio and yield segments as soon as they are decoded
+        
+        Running statistics are updated in O(1) per segment, so consumers can
+        report progress or stream the transcript onward without holding or
+        rescanning it. They are available as ``self.run_statistics`` while the
+        generator is being consumed.
         
         Args:
-            audio_path: Path to audio file
+            audio_path: Path to audio file, or 16kHz mono float32 samples
             language: Language code (auto-detect if None)
             initial_prompt: Initial prompt to guide transcription
             progress_callback: Function to call with progress updates
+            statistics: Accumulator to update (a new one is created if None)
+            offset: Seconds added to every timestamp (for audio that was sliced)
+            speech_index: Speech index of the full audio; only its speech is decoded, and
+                progress is weighted by speech time
+            model_size: Model size to decode with (defaults to the processor's model)
             
-        Returns:
-            List of transcription segments with timestamps and text
+        Yields:
+            Transcript segment dicts with timestamps, text and words
         """
         
         try:
-            model_info = self._get_model()
+            model_info = self.model_manager.get_asr_model(model_size) if model_size else self._get_model()
             model = model_info['model']
             
-            logger.info(f"Starting transcription of {audio_path}")
+            if isinstance(audio_path, np.ndarray):
+                logger.info(f"Starting transcription of {len(audio_path) / SAMPLE_RATE:.2f}s in-memory audio")
+            else:
+                logger.info(f"Starting transcription of {audio_path}")
             
-            # Configure transcription parameters
-            transcribe_kwargs = {
-                'language': language,
-                'initial_prompt': initial_prompt,
-                'word_timestamps': True,  # Enable word-level timestamps
-                'vad_filter': True,      # Enable voice activity detection
-                'vad_parameters': {
-                    'min_silence_duration_ms': 500,
-                    'speech_pad_ms': 400
-                }
-            }
+            # Decode the indexed speech instead of running VAD a second time
+            speech_clips = None
+            if speech_index is not None:
+                if not isinstance(audio_path, np.ndarray):
+                    from faster_whisper import decode_audio
+                    audio_path = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+                
+                audio_duration = len(audio_path) / SAMPLE_RATE
+                speech_clips = [
+                    (start - offset, end - offset)
+                    for start, end in speech_index.speech_clips(offset, offset + audio_duration, SPEECH_PAD_SECONDS)
+                ]
+                
+                if not speech_clips:
+                    logger.info("No speech left to transcribe")
+                    self.detected_language = language
+                    self.run_statistics = statistics if statistics is not None else TranscriptStatistics()
+                    return
+                
+                # Clips are decoded from their start, so detect the language on speech rather than on the intro
+                if language is None and speech_clips[0][0] > 0:
+                    first_speech = audio_path[int(speech_clips[0][0] * SAMPLE_RATE):]
+                    language = model.transcribe(
+                        first_speech[:LANGUAGE_DETECTION_SECONDS * SAMPLE_RATE],
+                        language=None
+                    )[1].language
             
-            # Remove None values
-            transcribe_kwargs = {k: v for k, v in transcribe_kwargs.items() if v is not None}
+            # Configure transcription parameters
+            transcribe_kwargs = build_transcribe_kwargs(language, initial_prompt, speech_clips)
             
-            # Perform transcription
+            # Perform transcription (segments are decoded lazily as the generator is consumed)
             segments_generator, info = model.transcribe(audio_path, **transcribe_kwargs)
-            
-            # Convert generator to list and process segments
-            segments = []
             total_duration = info.duration
+            self.detected_language = info.language
+            
+            # Decoding time follows speech rather than wall-clock audio, since silences are skipped by VAD
+            total_speech = speech_index.speech_seconds(offset, offset + total_duration) if speech_index else 0
+            
+            self.run_statistics = statistics if statistics is not None else TranscriptStatistics()
             
             logger.info(f"Transcription info - Language: {info.language}, Duration: {total_duration:.2f}s")
             
-            for i, segment in enumerate(segments_generator):
-                segment_data = {
-                    'id': segment.id,
-                    'start': segment.start,
-                    'end': segment.end,
-                    'text': segment.text.strip(),
-                    'words': []
+            for segment in segments_generator:
+                segment_data = self._segment_to_dict(segment, offset)
+                self.run_statistics.update(segment_data)
+                
+                # Call progress callback if provided
+                if progress_callback:
+                    if total_speech > 0:
+                        progress = (speech_index.speech_seconds(offset, segment_data['end']) / total_speech) * 100
+                    else:
+                        progress = (segment.end / total_duration) * 100
+                    progress_callback(
+                        progress,
+                        f"Transcribed {self.run_statistics.total_segments} segments "
+                        f"({self.run_statistics.total_words} words)"
+                    )
+                
+                yield segment_data
+            
+        except Exception as e:
+            logger.error(f"Transcription failed: {str(e)}")
+            raise
+    
+    def transcribe_audio(
+        self, 
+        audio_path: Union[str, np.ndarray],
+        language: str = None,
+        initial_prompt: str = None,
+        progress_callback: callable = None,
+        checkpoint_key: str = None,
+        checkpoint_fingerprint: str = None,
+        checkpoint_interval: float = None,
+        speech_index: SpeechIndex = None
+    ) -> Transcript:
+        """
+        Transcribe audio file and return segments with timestamps
+        
+        Args:
+            audio_path: Path to audio file, or 16kHz mono float32 samples
+            language: Language code (auto-detect if None)
+            initial_prompt: Initial prompt to guide transcription
+            progress_callback: Function to call with progress updates
+            checkpoint_key: Key (job id) to checkpoint under and resume from (no checkpoints if None)
+            checkpoint_fingerprint: Identifies the audio and settings a checkpoint is valid for
+            checkpoint_interval: Seconds between checkpoints (defaults to ASR_CHECKPOINT_INTERVAL_SECONDS)
+            speech_index: Speech index of the audio, used to decode only its speech, for progress
+                reporting and for runaway skips
+            
+        Returns:
+            Transcript of segments with timestamps and text
+        """
+        
+        # Consume the stream straight into the compact transcript columns
+        builder = TranscriptBuilder()
+        statistics = TranscriptStatistics()
+        offset = 0.0
+        
+        if checkpoint_interval is None:
+            checkpoint_interval = self.checkpoint_interval
+        checkpointing = bool(checkpoint_key) and checkpoint_interval > 0
+        
+        if checkpointing:
+            checkpoint = self.checkpoint_store.load(checkpoint_key, checkpoint_fingerprint)
+            if checkpoint is not None:
+                resumed_segments, offset = checkpoint
+                for segment in resumed_segments:
+                    builder.append(segment)
+                    statistics.update(segment)
+                
+                self.run_metadata['resumed_from_seconds'] = round(offset, 2)
+                logger.info(f"Resuming transcription at {offset:.2f}s from checkpoint ({len(builder)} segments)")
+        
+        guard = RunawayGuard() if self.runaway_guard_enabled else None
+        skipped_spans = []
+        last_checkpoint = time.monotonic()
+        
+        # Each run decodes from offset to the end, until a runaway region makes us skip ahead
+        while offset is not None:
+            run_audio = audio_path
+            run_progress = progress_callback
+            
+            if offset > 0:
+                # Seek past the audio that was already decoded or skipped
+                if isinstance(audio_path, str):
+                    from faster_whisper import decode_audio
+                    audio_path = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+                run_audio = audio_path[int(offset * SAMPLE_RATE):]
+                if not len(run_audio):
+                    break
+                
+                if progress_callback:
+                    run_progress = self._offset_progress(progress_callback, offset, len(audio_path) / SAMPLE_RATE)
+            
+            segments = self.iter_segments(
+                run_audio,
+                language=language,
+                initial_prompt=initial_prompt,
+                progress_callback=run_progress,
+                statistics=statistics,
+                offset=offset,
+                speech_index=speech_index
+            )
+            offset = None
+            
+            for segment in segments:
+                runaway = guard.check(segment, len(builder)) if guard else None
+                
+                if runaway is not None:
+                    # Stop decoding this region and drop what the decoder produced while looping
+                    segments.close()
+                    reason, first_index, region_start = runaway
+                    builder.truncate(first_index)
+                    
+                    offset = self._skip_runaway_region(segment['end'], speech_index)
+                    region_end = offset if offset is not None else segment['end']
+                    skipped_spans.append({
+                        'start': round(region_start, 2),
+                        'end': round(region_end, 2),
+                        'reason': reason
+                    })
+                    logger.warning(
+                        f"Runaway decoding ({reason}) at {region_start:.2f}s, "
+                        f"skipping to {region_end:.2f}s"
+                    )
+                    
+                    statistics = TranscriptStatistics.from_transcript(builder.build(copy=True))
+                    guard.reset()
+                    break
+                
+                # Keep ids sequential across resumed runs
+                segment['id'] = len(builder) + 1
+                builder.append(segment)
+                
+                if checkpointing and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    self.checkpoint_store.save(
+                        checkpoint_key,
+                        checkpoint_fingerprint,
+                        builder.build(copy=True),
+                        segment['end']
+                    )
+                    last_checkpoint = time.monotonic()
+        
+        transcript = builder.build()
+        
+        if skipped_spans:
+            self.run_metadata.update({
+                'asr_skipped_spans': skipped_spans,
+                'asr_skipped_seconds': round(sum(span['end'] - span['start'] for span in skipped_spans), 2)
+            })
+        
+        if checkpointing:
+            self.checkpoint_store.delete(checkpoint_key)
+        
+        logger.info(f"Transcription completed: {len(transcript)} segments")
+        return transcript
+    
+    def _offset_progress(self, progress_callback: callable, offset: float, total_duration: float) -> callable:
+        """Wrap a progress callback so progress over audio[offset:] is reported over the whole audio"""
+        
+        remaining = max(total_duration - offset, 1e-6)
+        
+        def offset_progress(progress, message):
+            progress_callback(((offset + progress / 100 * remaining) / total_duration) * 100, message)
+        
+        return offset_progress
+    
+    def _skip_runaway_region(self, position: float, speech_index: SpeechIndex = None) -> Optional[float]:
+        """Get the offset to resume decoding at after a runaway region (None to stop)"""
+        
+        # Jump to the next speech region, or a fixed distance ahead when there is no speech index
+        if speech_index is not None:
+            return speech_index.next_speech_start(position)
+        return position + self.runaway_skip_seconds
+    
+    def _segment_to_dict(self, segment, offset: float = 0.0) -> Dict[str, Any]:
+        """Convert a faster-whisper segment to the transcript segment dict format"""
+        
+        return {
+            'id': segment.id,
+            'start': segment.start + offset,
+            'end': segment.end + offset,
+            'text': segment.text.strip(),
+            'words': [
+                {
+                    'word': word.word,
+                    'start': word.start + offset,
+                    'end': word.end + offset,
+                    'probability': word.probability
                 }
+                for word in (segment.words or [])
+            ]
+        }
+    
+    def transcribe_audio_parallel(
+        self,
+        audio: Union[str, np.ndarray],
+        language: str = None,
+        initial_prompt: str = None,
+        progress_callback: callable = None,
+        chunk_seconds: float = None,
+        num_workers: int = None,
+        speech_index: SpeechIndex = None
+    ) -> Transcript:
+        """
+        Transcribe audio split at VAD silences across a process pool of CPU model replicas
+        
+        Args:
+            audio: Path to audio file, or 16kHz mono float32 samples
+            language: Language code (auto-detect if None)
+            initial_prompt: Initial prompt to guide transcription
+            progress_callback: Function to call with progress updates
+            chunk_seconds: Target span length (defaults to ASR_CHUNK_SECONDS)
+            num_workers: Number of model replicas (defaults to ASR_PARALLEL_WORKERS)
+            speech_index: Precomputed speech index used to place span boundaries
+            
+        Returns:
+            Transcript of segments with timestamps and text
+        """
+        
+        try:
+            from .parallel_transcription import ParallelTranscriber
+            
+            if not isinstance(audio, np.ndarray):
+                from faster_whisper import decode_audio
+                audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+            
+            transcriber = ParallelTranscriber(
+                model_size=self.model_size,
+                download_root=str(self.model_manager.model_cache_dir),
+                chunk_seconds=chunk_seconds,
+                num_workers=num_workers
+            )
+            
+            segments = transcriber.transcribe(
+                audio,
+                language=language,
+                initial_prompt=initial_prompt,
+                progress_callback=progress_callback,
+                speech_index=speech_index
+            )
+            self.detected_language = transcriber.detected_language
+            
+            self.run_metadata.update({
+                'asr_chunk_seconds': transcriber.chunk_seconds,
+                'asr_workers': transcriber.num_workers
+            })
+            
+            logger.info(f"Parallel transcription completed: {len(segments)} segments")
+            return segments
+            
+        except Exception as e:
+            logger.error(f"Parallel transcription failed: {str(e)}")
+            raise
+    
+    def transcribe_audio_batched(
+        self,
+        audio: Union[str, np.ndarray],
+        language: str = None,
+        initial_prompt: str = None,
+        progress_callback: callable = None,
+        speech_index: SpeechIndex = None
+    ) -> Transcript:
+        """
+        Transcribe audio through the worker-wide cross-job batch scheduler
+        
+        Args:
+            audio: Path to audio file, or 16kHz mono float32 samples
+            language: Language code (auto-detect if None)
+            initial_prompt: Initial prompt to guide transcription
+            progress_callback: Function to call with progress updates
+            speech_index: Speech index used to cut windows in pauses (computed if None)
+            
+        Returns:
+            Transcript of segments with timestamps and text
+        """
+        
+        try:
+            from .asr_batch_scheduler import ASRBatchScheduler
+            
+            if not isinstance(audio, np.ndarray):
+                from faster_whisper import decode_audio
+                audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+            
+            scheduler = ASRBatchScheduler()
+            segments = Transcript.from_segments(scheduler.transcribe(
+                audio,
+                model_size=self.model_size,
+                language=language,
+                initial_prompt=initial_prompt,
+                progress_callback=progress_callback,
+                speech_index=speech_index
+            ))
+            
+            self.run_metadata.update({
+                'asr_batch_size': scheduler.batch_size,
+                'asr_batch_max_wait_ms': scheduler.max_wait_ms
+            })
+            
+            logger.info(f"Batched transcription completed: {len(segments)} segments")
+            return segments
+            
+        except Exception as e:
+            logger.error(f"Batched transcription failed: {str(e)}")
+            raise
+    
+    def transcribe_audio_two_pass(
+        self,
+        audio: Union[str, np.ndarray],
+        language: str = None,
+        initial_prompt: str = None,
+        progress_callback: callable = None,
+        draft_model_size: str = None,
+        redecode_threshold: float = None,
+        speech_index: SpeechIndex = None
+    ) -> Transcript:
+        """
+        Transcribe with a fast draft model, then re-decode only low-confidence spans with the full model
+        
+        Args:
+            audio: Path to audio file, or 16kHz mono float32 samples
+            language: Language code (taken from the draft pass if None)
+            initial_prompt: Initial prompt to guide transcription
+            progress_callback: Function to call with progress updates
+            draft_model_size: Draft model size (defaults to ASR_DRAFT_MODEL)
+            redecode_threshold: Mean word probability below which a segment is re-decoded
+                (defaults to ASR_REDECODE_THRESHOLD)
+            speech_index: Speech index of the audio, so neither pass runs VAD again
+            
+        Returns:
+            Transcript of segments with timestamps and text
+        """
+        
+        try:
+            if not isinstance(audio, np.ndarray):
+                from faster_whisper import decode_audio
+                audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+            
+            draft_model_size = draft_model_size or self.draft_model_size
+            if redecode_threshold is None:
+                redecode_threshold = self.redecode_threshold
+            
+            # The draft pass covers the whole audio, so it gets most of the progress range
+            draft_share = 0.6
+            
+            def draft_progress(progress, message):
+                if progress_callback:
+                    progress_callback(progress * draft_share, f"Draft pass: {message}")
+            
+            builder = TranscriptBuilder()
+            for segment in self.iter_segments(
+                audio,
+                language=language,
+                initial_prompt=initial_prompt,
+                progress_callback=draft_progress,
+                speech_index=speech_index,
+                model_size=draft_model_size
+            ):
+                builder.append(segment)
+            draft = builder.build()
+            
+            # Decode every span in the draft's language instead of re-detecting on a few seconds of audio
+            language = language or self.detected_language
+            
+            spans = self._low_confidence_spans(draft, redecode_threshold, len(audio) / SAMPLE_RATE)
+            redecoded_seconds = sum(end - start for start, end, _, _ in spans)
+            
+            logger.info(
+                f"Draft pass with {draft_model_size} finished: {len(draft)} segments, "
+                f"re-decoding {len(spans)} spans ({redecoded_seconds:.1f}s) with {self.model_size}"
+            )
+            
+            # Splice the re-decoded spans into the draft, keeping ids sequential
+            builder = TranscriptBuilder()
+            next_draft = 0
+            completed_seconds = 0.0
+            
+            for span_number, (span_start, span_end, first, last) in enumerate(spans, 1):
+                for index in range(next_draft, first):
+                    builder.append({**draft[index], 'id': len(builder) + 1})
                 
-                # Add word-level timestamps if available
-                if hasattr(segment, 'words') and segment.words:
-                    for word in segment.words:
-                        word_data = {
-                            'word': word.word,
-                            'start': word.start,
-                            'end': word.end,
-                            'probability': word.probability
-                        }
-                        segment_data['words'].append(word_data)
+                span_audio = audio[int(span_start * SAMPLE_RATE):int(span_end * SAMPLE_RATE)]
+                for segment in self.iter_segments(
+                    span_audio,
+                    language=language,
+                    initial_prompt=initial_prompt,
+                    offset=span_start,
+                    speech_index=speech_index
+                ):
+                    segment['id'] = len(builder) + 1
+                    builder.append(segment)
                 
-                segments.append(segment_data)
+                next_draft = last + 1
+                completed_seconds += span_end - span_start
                 
-                # Call progress callback if provided
                 if progress_callback:
-                    progress = (segment.end / total_duration) * 100
-                    progress_callback(progress, f"Transcribed {i+1} segments")
+                    progress = draft_share * 100 + (1 - draft_share) * 100 * completed_seconds / redecoded_seconds
+                    progress_callback(progress, f"Re-decoded {span_number}/{len(spans)} low-confidence spans")
             
-            logger.info(f"Transcription completed: {len(segments)} segments")
+            for index in range(next_draft, len(draft)):
+                builder.append({**draft[index], 'id': len(builder) + 1})
+            
+            segments = builder.build()
+            
+            total_seconds = len(audio) / SAMPLE_RATE
+            self.run_metadata.update({
+                'asr_draft_model': draft_model_size,
+                'asr_redecode_threshold': redecode_threshold,
+                'asr_redecoded_spans': len(spans),
+                'asr_redecoded_seconds': round(redecoded_seconds, 2),
+                'asr_redecoded_ratio': round(redecoded_seconds / total_seconds, 4) if total_seconds else 0
+            })
+            
+            logger.info(f"Two-pass transcription completed: {len(segments)} segments")
             return segments
             
         except Exception as e:
-            logger.error(f"Transcription failed: {str(e)}")
+            logger.error(f"Two-pass transcription failed: {str(e)}")
             raise
     
+    def _low_confidence_spans(
+        self,
+        draft: Transcript,
+        threshold: float,
+        total_seconds: float
+    ) -> List[Tuple[float, float, int, int]]:
+        """Group consecutive low-confidence draft segments into (start, end, first, last) spans"""
+        
+        # Segments without words have NaN confidence and are kept as drafted
+        low_confidence = np.flatnonzero(draft.mean_word_probabilities() < threshold)
+        
+        groups: List[List[int]] = []
+        for index in low_confidence:
+            if groups and index == groups[-1][1] + 1:
+                groups[-1][1] = index
+            else:
+                groups.append([index, index])
+        
+        spans = []
+        for first, last in groups:
+            # Pad into the surrounding silence without overlapping the neighbouring segments
+            previous_end = draft.segment_ends[first - 1] if first > 0 else 0.0
+            next_start = draft.segment_starts[last + 1] if last + 1 < len(draft) else total_seconds
+            start = max(previous_end, draft.segment_starts[first] - REDECODE_PADDING_SECONDS)
+            end = min(next_start, draft.segment_ends[last] + REDECODE_PADDING_SECONDS)
+            
+            if end > start:
+                spans.append((float(start), float(end), int(first), int(last)))
+        
+        return spans
+    
     def transcribe_video(
         self,
         video_path: str,
         language: str = None,
         initial_prompt: str = None,
         progress_callback: callable = None,
-        keep_audio: bool = False
-    ) -> List[Dict[str, Any]]:
+        keep_audio: bool = False,
+        audio_decode_mode: str = None,
+        transcription_mode: str = None,
+        chunk_seconds: float = None,
+        num_workers: int = None,
+        checkpoint_key: str = None,
+        checkpoint_interval: float = None,
+        speech_index: SpeechIndex = None,
+        draft_model_size: str = None,
+        redecode_threshold: float = None,
+        model_routing: bool = None,
+        audio_decode_slices: int = None
+    ) -> Transcript:
         """
         Transcribe video file (extracts audio first)
         
@@ -170,20 +960,124 @@ class ASRProcessor:
             language: Language code (auto-detect if None)
             initial_prompt: Initial prompt to guide transcription
             progress_callback: Function to call with progress updates
-            keep_audio: Whether to keep extracted audio file
+            keep_audio: Whether to keep extracted audio file (forces 'file' decoding)
+            audio_decode_mode: 'pipe' or 'file' (defaults to the processor setting)
+            transcription_mode: 'sequential', 'chunked', 'batched' or 'two_pass' (defaults to the processor setting)
+            chunk_seconds: Target span length for chunked transcription
+            num_workers: Number of model replicas for chunked transcription
+            checkpoint_key: Key (job id) for resumable sequential transcription
+            checkpoint_interval: Seconds between checkpoints (defaults to the processor setting)
+            speech_index: Speech index stored with the job by an earlier run (computed if None)
+            draft_model_size: Draft model size for two-pass transcription
+            redecode_threshold: Mean word probability below which two-pass transcription re-decodes
+            model_routing: Whether to route to a language-specific model (defaults to the processor setting)
+            audio_decode_slices: Parallel FFmpeg slices for 'pipe' decoding (defaults to the processor setting)
             
         Returns:
-            List of transcription segments with timestamps and text
+            Transcript of segments with timestamps and text
         """
         
         audio_path = None
+        audio = None
+        decode_mode = audio_decode_mode or self.audio_decode_mode
+        mode = transcription_mode or self.transcription_mode
+        self.run_metadata = {}
+        
+        if mode == 'chunked':
+            from .parallel_transcription import can_start_processes
+            
+            if not can_start_processes():
+                logger.warning(
+                    "Chunked transcription needs a worker that can start processes "
+                    "(Celery --pool threads or solo), transcribing sequentially"
+                )
+                mode = 'sequential'
+        self.speech_index = speech_index
+        self.model_used = {}
+        default_model_size, default_model_info = self.model_size, self._model_info
         try:
             # Update progress
             if progress_callback:
                 progress_callback(10, "Extracting audio from video")
             
-            # Extract audio from video
-            audio_path = self.extract_audio_from_video(video_path)
+            # Decode audio straight into memory, falling back to a temporary WAV file
+            if decode_mode == 'pipe' and not keep_audio:
+                try:
+                    audio = self.decode_audio_to_array(video_path, num_slices=audio_decode_slices)
+                except Exception as e:
+                    logger.warning(f"In-memory audio decoding failed, falling back to temporary file: {str(e)}")
+            
+            if audio is not None:
+                self.run_metadata.update({
+                    'audio_decode_mode': 'pipe',
+                    'audio_decode_slices': audio_decode_slices or self.audio_decode_slices,
+                    'disk_io_bytes_avoided': self._wav_io_bytes(len(audio))
+                })
+            else:
+                audio_path = self.extract_audio_from_video(video_path)
+                self.run_metadata.update({
+                    'audio_decode_mode': 'file',
+                    'disk_io_bytes_avoided': 0
+                })
+            
+            # One VAD pass shared by chunking, progress reporting and chapter boundary snapping
+            if self.speech_index is None and self.speech_index_enabled:
+                self.speech_index = self.build_speech_index(audio if audio is not None else audio_path)
+            
+            if self.speech_index is not None:
+                self.run_metadata.update({
+                    'speech_index': self.speech_index.to_dict(),
+                    'speech_seconds': round(self.speech_index.total_speech_seconds, 2)
+                })
+            
+            # Route to a faster checkpoint for the job's language (detection needs decoded audio)
+            if model_routing is None:
+                model_routing = self.model_routing_enabled
+            
+            route = None
+            if model_routing and (language is not None or audio is not None):
+                route = self.model_router.route(self.model_size, language, audio, SAMPLE_RATE)
+                
+                # A detected language is passed on so the chosen model does not detect it again
+                language = route['language']
+                if route['routed']:
+                    self.model_size, self._model_info = route['model_size'], None
+            
+            # Two-pass output depends on the draft model and threshold, and batched output has no
+            # word timestamps, so both are cached separately from sequential and chunked output
+            cache_model = self.model_size
+            if mode == 'two_pass':
+                draft_model_size = draft_model_size or self.draft_model_size
+                if redecode_threshold is None:
+                    redecode_threshold = self.redecode_threshold
+                cache_model = f"{draft_model_size}>{self.model_size}@{redecode_threshold}"
+            elif mode == 'batched':
+                cache_model = f"{self.model_size}#batched"
+            
+            # Reuse a cached transcript of identical audio and settings
+            cache_key = self.transcript_cache.make_key(
+                audio if audio is not None else audio_path,
+                cache_model,
+                language,
+                initial_prompt
+            )
+            cached_segments = self.transcript_cache.get(cache_key)
+            self.run_metadata['transcript_cache'] = 'hit' if cached_segments is not None else 'miss'
+            
+            self.model_used = {
+                'model': self.model_size,
+                'default_model': default_model_size,
+                'routed': bool(route and route['routed']),
+                'language': language,
+                'language_source': route['language_source'] if route else ('config' if language else None),
+                'real_time_factor': None
+            }
+            
+            if cached_segments is not None:
+                logger.info(f"Transcript cache hit ({len(cached_segments)} segments), skipping ASR")
+                if progress_callback:
+                    progress_callback(100, "Transcript loaded from cache")
+                return cached_segments
             
             # Update progress
             if progress_callback:
@@ -197,12 +1091,67 @@ class ASRProcessor:
                     progress_callback(adjusted_progress, message)
             
             # Transcribe audio
-            segments = self.transcribe_audio(
-                audio_path,
-                language=language,
-                initial_prompt=initial_prompt,
-                progress_callback=transcribe_progress_callback
-            )
+            self.run_metadata['transcription_mode'] = mode
+            transcription_started = time.monotonic()
+            
+            if mode == 'chunked':
+                segments = self.transcribe_audio_parallel(
+                    audio if audio is not None else audio_path,
+                    language=language,
+                    initial_prompt=initial_prompt,
+                    progress_callback=transcribe_progress_callback,
+                    chunk_seconds=chunk_seconds,
+                    num_workers=num_workers,
+                    speech_index=self.speech_index
+                )
+            elif mode == 'batched':
+                segments = self.transcribe_audio_batched(
+                    audio if audio is not None else audio_path,
+                    language=language,
+                    initial_prompt=initial_prompt,
+                    progress_callback=transcribe_progress_callback,
+                    speech_index=self.speech_index
+                )
+            elif mode == 'two_pass':
+                segments = self.transcribe_audio_two_pass(
+                    audio if audio is not None else audio_path,
+                    language=language,
+                    initial_prompt=initial_prompt,
+                    progress_callback=transcribe_progress_callback,
+                    draft_model_size=draft_model_size,
+                    redecode_threshold=redecode_threshold,
+                    speech_index=self.speech_index
+                )
+            else:
+                segments = self.transcribe_audio(
+                    audio if audio is not None else audio_path,
+                    language=language,
+                    initial_prompt=initial_prompt,
+                    progress_callback=transcribe_progress_callback,
+                    checkpoint_key=checkpoint_key,
+                    checkpoint_fingerprint=cache_key,
+                    checkpoint_interval=checkpoint_interval,
+                    speech_index=self.speech_index
+                )
+            
+            self.transcript_cache.put(cache_key, segments)
+            
+            # Real-time factor: seconds spent decoding per second of audio
+            if audio is not None:
+                audio_seconds = len(audio) / SAMPLE_RATE
+            elif self.speech_index is not None:
+                audio_seconds = self.speech_index.duration
+            else:
+                audio_seconds = self._probe_duration(video_path)
+            
+            self.model_used.update({
+                'language': language or self.detected_language,
+                'language_source': self.model_used['language_source'] or 'model',
+                'real_time_factor': (
+                    round((time.monotonic() - transcription_started) / audio_seconds, 3)
+                    if audio_seconds else None
+                )
+            })
             
             # Final progress update
             if progress_callback:
@@ -214,6 +1163,9 @@ class ASRProcessor:
             logger.error(f"Video transcription failed: {str(e)}")
             raise
         finally:
+            # Routing only applies to this video
+            self.model_size, self._model_info = default_model_size, default_model_info
+            
             # Clean up temporary audio file if not keeping it
             if audio_path and not keep_audio and os.path.exists(audio_path):
                 try:
@@ -228,12 +1180,26 @@ class ASRProcessor:
                 except Exception as e:
                     logger.warning(f"Failed to clean up audio file {audio_path}: {str(e)}")
     
-    def format_transcript_for_chaptering(self, segments: List[Dict[str, Any]]) -> str:
+    def build_speech_index(self, audio: Union[str, np.ndarray]) -> Optional[SpeechIndex]:
+        """Run a standalone VAD pass over the audio (None if it fails, since the index is optional)"""
+        
+        try:
+            if not isinstance(audio, np.ndarray):
+                from faster_whisper import decode_audio
+                audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+            
+            return SpeechIndex.from_audio(audio, sample_rate=SAMPLE_RATE)
+        
+        except Exception as e:
+            logger.warning(f"Speech index computation failed: {str(e)}")
+            return None
+    
+    def format_transcript_for_chaptering(self, segments: Sequence[Mapping[str, Any]]) -> str:
         """
         Format transcript segments for LLM chaptering input
         
         Args:
-            segments: List of transcript segments
+            segments: Transcript or list of transcript segment dicts
             
         Returns:
             Formatted transcript text with timestamps
@@ -241,6 +1207,16 @@ class ASRProcessor:
         
         formatted_lines = []
         
+        if isinstance(segments, Transcript):
+            # Read the columns directly instead of materializing segment views
+            for index, start in enumerate(segments.segment_starts.tolist()):
+                text = segments.segment_text(index).strip()
+                
+                if text:  # Only include non-empty segments
+                    formatted_lines.append(f"[{self._format_timestamp(start)}] {text}")
+            
+            return "\n".join(formatted_lines)
+        
         for segment in segments:
             start_time = self._format_timestamp(segment['start'])
             text = segment['text'].strip()
@@ -259,24 +1235,15 @@ class ASRProcessor:
         
         return f"{hours:02d}:{minutes:02d}:{secs:02d}"
     
-    def get_transcript_statistics(self, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def get_transcript_statistics(self, segments: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
         """Get statistics about the transcript"""
         
-        if not segments:
-            return {}
-        
-        total_duration = max(segment['end'] for segment in segments)
-        total_words = sum(len(segment.get('words', [])) for segment in segments)
-        total_text_length = sum(len(segment['text']) for segment in segments)
+        if isinstance(segments, Transcript):
+            return TranscriptStatistics.from_transcript(segments).to_dict()
         
-        # Calculate speaking rate (words per minute)
-        speaking_rate = (total_words / total_duration) * 60 if total_duration > 0 else 0
+        # Single pass over the segments
+        statistics = TranscriptStatistics()
+        for segment in segments:
+            statistics.update(segment)
         
-        return {
-            'total_segments': len(segments),
-            'total_duration': total_duration,
-            'total_words': total_words,
-            'total_characters': total_text_length,
-            'speaking_rate_wpm': round(speaking_rate, 1),
-            'average_segment_length': round(total_duration / len(segments), 2) if segments else 0
-        } 
\ No newline at end of file
+        return statistics.to_dict()
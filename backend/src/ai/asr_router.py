@@ -0,0 +1,121 @@
+"""
+Language-aware routing of transcription jobs to faster ASR checkpoints
+"""
+
+import os
+import json
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .model_manager import ModelManager
+
+logger = logging.getLogger(__name__)
+
+# Language detection only looks at the first Whisper window
+DETECTION_SECONDS = 30
+
+# English-only distilled checkpoint, several times faster than large-v3 on English speech
+# (a Hugging Face repo id, since faster-whisper 1.0.1 has no distil-large-v3 alias)
+DEFAULT_ROUTES = {'en': 'Systran/faster-distil-whisper-large-v3'}
+
+class ASRModelRouter:
+    """
+    Picks the ASR model for a job from its language
+    
+    The language comes from the job configuration, or is detected from the
+    first 30 seconds of audio with a small multilingual model. Languages found
+    in the routing table (ASR_MODEL_ROUTES, a JSON object of language code to
+    faster-whisper model size or Hugging Face repo id) are sent to their checkpoint; everything else keeps the default
+    multilingual model.
+    """
+    
+    def __init__(
+        self,
+        routes: Dict[str, str] = None,
+        detection_model_size: str = None,
+        min_language_probability: float = None
+    ):
+        self.model_manager = ModelManager()
+        
+        if routes is None:
+            routes_json = os.getenv('ASR_MODEL_ROUTES')
+            routes = json.loads(routes_json) if routes_json else DEFAULT_ROUTES
+        self.routes = routes
+        
+        self.detection_model_size = detection_model_size or os.getenv('ASR_LANGUAGE_DETECTION_MODEL', 'tiny')
+        self.min_language_probability = (
+            min_language_probability if min_language_probability is not None
+            else float(os.getenv('ASR_ROUTING_MIN_LANGUAGE_PROBABILITY', '0.8'))
+        )
+    
+    def detect_language(self, audio: np.ndarray, sample_rate: int = 16000) -> Tuple[str, float]:
+        """
+        Detect the spoken language from the start of the audio
+        
+        Args:
+            audio: Mono float32 samples
+            sample_rate: Sample rate of the audio
+        
+        Returns:
+            Tuple of (language code, probability)
+        """
+        
+        model = self.model_manager.get_asr_model(self.detection_model_size)['model']
+        
+        # transcribe() detects the language eagerly; the segments generator is never consumed
+        _, info = model.transcribe(audio[:DETECTION_SECONDS * sample_rate], vad_filter=True)
+        return info.language, info.language_probability
+    
+    def route(
+        self,
+        default_model_size: str,
+        language: str = None,
+        audio: Optional[np.ndarray] = None,
+        sample_rate: int = 16000
+    ) -> Dict[str, Any]:
+        """
+        Choose the model for a job
+        
+        Args:
+            default_model_size: Model used when no route applies
+            language: Configured language code (detected from audio if None)
+            audio: Decoded audio used for language detection
+            sample_rate: Sample rate of the audio
+        
+        Returns:
+            Dictionary with model_size, language, language_source and routed
+        """
+        
+        decision = {
+            'model_size': default_model_size,
+            'language': language,
+            'language_source': 'config' if language else None,
+            'routed': False
+        }
+        
+        if not self.routes:
+            return decision
+        
+        if language is None and audio is not None:
+            try:
+                detected, probability = self.detect_language(audio, sample_rate)
+            except Exception as e:
+                logger.warning(f"Language detection for model routing failed: {str(e)}")
+                return decision
+            
+            logger.info(f"Detected language {detected} (p={probability:.2f}) for model routing")
+            
+            # Only trust a confident detection; otherwise the multilingual model detects again itself
+            if probability < self.min_language_probability:
+                return decision
+            
+            decision.update({'language': detected, 'language_source': 'detected'})
+        
+        routed_model = self.routes.get(decision['language'])
+        if routed_model and routed_model != default_model_size:
+            decision.update({'model_size': routed_model, 'routed': True})
+            logger.info(f"Routing {decision['language']} audio to ASR model {routed_model}")
+        
+        return decision
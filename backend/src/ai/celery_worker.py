@@ -113,6 +113,11 @@ def worker_shutdown_handler(sender=None, **kwargs):
         from .model_manager import ModelManager
         model_manager = ModelManager()
         model_manager.unload_all_models()
+        
+        # Model replicas of chunked transcription live in their own processes
+        from .parallel_transcription import shutdown_replica_pools
+        shutdown_replica_pools()
+        
         logger.info("Models unloaded successfully")
         
     except Exception as e:
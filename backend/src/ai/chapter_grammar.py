@@ -0,0 +1,528 @@
+"""
+Grammar-constrained decoding, early stopping and streaming parsing of the chapter JSON the LLM is asked to produce
+"""
+
+import re
+import json
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Grammar instructions: literal text, optional whitespace, a number, a string, or a branch point
+LITERAL, WHITESPACE, NUMBER, STRING, NEXT_CHAPTER = range(5)
+
+# {"chapters": [{"start_time": <number>, "title": <string>, "confidence": <number>}, ...]}
+CHAPTER_START = 7
+PROGRAM = (
+    (LITERAL, '{'), (WHITESPACE, None), (LITERAL, '"chapters"'), (WHITESPACE, None),
+    (LITERAL, ':'), (WHITESPACE, None), (LITERAL, '['),
+    # CHAPTER_START
+    (WHITESPACE, None), (LITERAL, '{'), (WHITESPACE, None),
+    (LITERAL, '"start_time"'), (WHITESPACE, None), (LITERAL, ':'), (WHITESPACE, None), (NUMBER, None),
+    (WHITESPACE, None), (LITERAL, ','), (WHITESPACE, None),
+    (LITERAL, '"title"'), (WHITESPACE, None), (LITERAL, ':'), (WHITESPACE, None), (STRING, None),
+    (WHITESPACE, None), (LITERAL, ','), (WHITESPACE, None),
+    (LITERAL, '"confidence"'), (WHITESPACE, None), (LITERAL, ':'), (WHITESPACE, None), (NUMBER, None),
+    (WHITESPACE, None), (LITERAL, '}'), (WHITESPACE, None),
+    (NEXT_CHAPTER, None),
+    (WHITESPACE, None), (LITERAL, '}')
+)
+DONE = len(PROGRAM)
+
+WHITESPACE_CHARS = ' \t\n\r'
+ESCAPE_CHARS = '"\\/bfnrt'
+
+# Bounds that keep a constrained generation finite
+MAX_WHITESPACE_RUN = 16
+MAX_NUMBER_LENGTH = 10
+MAX_TITLE_LENGTH = 100
+
+# Unsigned JSON numbers, and the prefixes that can still grow into one
+NUMBER_PATTERN = re.compile(r'(0|[1-9][0-9]*)(\.[0-9]+)?')
+NUMBER_PREFIX_PATTERN = re.compile(r'(0|[1-9][0-9]*)(\.[0-9]*)?')
+
+# A state is (instruction index, progress inside it, chapters opened so far); the progress is
+# the offset into a literal, the length of a whitespace run, the number text read so far, or
+# the title length plus one for the opening quote (negated while an escape sequence is open)
+State = Tuple[int, Any, int]
+
+def chapter_json_schema(max_chapters: int = 15) -> Dict[str, Any]:
+    """
+    JSON Schema of the chapter document, for servers that constrain output themselves
+    
+    Args:
+        max_chapters: Maximum number of chapters in the document
+    
+    Returns:
+        Schema equivalent to the grammar below
+    """
+    
+    return {
+        'type': 'object',
+        'properties': {
+            'chapters': {
+                'type': 'array',
+                'minItems': 1,
+                'maxItems': max(1, max_chapters),
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'start_time': {'type': 'number', 'minimum': 0},
+                        'title': {'type': 'string', 'maxLength': MAX_TITLE_LENGTH},
+                        'confidence': {'type': 'number', 'minimum': 0, 'maximum': 1}
+                    },
+                    'required': ['start_time', 'title', 'confidence'],
+                    'additionalProperties': False
+                }
+            }
+        },
+        'required': ['chapters'],
+        'additionalProperties': False
+    }
+
+class ChapterJSONGrammar:
+    """
+    Character-level recognizer for the chapter JSON schema
+    
+    States are immutable tuples, so a state can be advanced speculatively by
+    every candidate token and the results cached.
+    """
+    
+    def __init__(self, max_chapters: int = 15):
+        self.max_chapters = max(1, max_chapters)
+        self.initial_state: State = (0, 0, 0)
+    
+    def advance(self, state: State, text: str) -> Optional[State]:
+        """
+        Feed text to the recognizer
+        
+        Args:
+            state: Current state
+            text: Characters to consume
+        
+        Returns:
+            The new state, or None if the text cannot continue a valid document
+        """
+        
+        for char in text:
+            state = self._step(state, char)
+            if state is None:
+                return None
+        return state
+    
+    def is_complete(self, state: State) -> bool:
+        """Whether the document is finished"""
+        return state[0] == DONE
+    
+    def closing_text(self, state: State) -> str:
+        """Shortest text that completes the document from this state"""
+        
+        closing = []
+        while state[0] != DONE:
+            char = self._closing_char(state)
+            if char is None:
+                # Optional whitespace or a finished number: move on without emitting anything
+                state = (state[0] + 1, 0, state[2])
+                continue
+            closing.append(char)
+            state = self._step(state, char)
+        return ''.join(closing)
+    
+    def _closing_char(self, state: State) -> Optional[str]:
+        """Next character of the shortest completion (None to skip the instruction)"""
+        
+        pc, progress, chapters = state
+        kind, literal = PROGRAM[pc]
+        
+        if kind == LITERAL:
+            return literal[progress]
+        if kind == NUMBER:
+            return None if NUMBER_PATTERN.fullmatch(progress or '') else '0'
+        if kind == STRING:
+            if progress == 0:
+                return '"'
+            return 'n' if progress < 0 else '"'
+        if kind == NEXT_CHAPTER:
+            return ']'
+        return None
+    
+    def _step(self, state: State, char: str) -> Optional[State]:
+        """Consume one character"""
+        
+        pc, progress, chapters = state
+        
+        while True:
+            if pc == DONE:
+                return None
+            
+            kind, literal = PROGRAM[pc]
+            
+            if kind == LITERAL:
+                if char != literal[progress]:
+                    return None
+                if pc == CHAPTER_START + 1:
+                    chapters += 1
+                if progress + 1 < len(literal):
+                    return pc, progress + 1, chapters
+                return pc + 1, 0, chapters
+            
+            if kind == WHITESPACE:
+                if char in WHITESPACE_CHARS:
+                    return (pc, progress + 1, chapters) if progress < MAX_WHITESPACE_RUN else None
+                pc, progress = pc + 1, 0
+                continue
+            
+            if kind == NUMBER:
+                # A trailing '.' needs room for one more digit
+                number = (progress or '') + char
+                if len(number) + number.endswith('.') <= MAX_NUMBER_LENGTH and NUMBER_PREFIX_PATTERN.fullmatch(number):
+                    return pc, number, chapters
+                if not NUMBER_PATTERN.fullmatch(progress or ''):
+                    return None
+                pc, progress = pc + 1, 0
+                continue
+            
+            if kind == STRING:
+                if progress == 0:
+                    return (pc, 1, chapters) if char == '"' else None
+                if progress < 0:
+                    return (pc, -progress + 1, chapters) if char in ESCAPE_CHARS else None
+                if char == '"':
+                    return pc + 1, 0, chapters
+                if progress > MAX_TITLE_LENGTH or ord(char) < 0x20:
+                    return None
+                if char == '\\':
+                    return pc, -progress, chapters
+                return pc, progress + 1, chapters
+            
+            # NEXT_CHAPTER: another chapter or the end of the list
+            if char == ',' and chapters < self.max_chapters:
+                return CHAPTER_START, 0, chapters
+            if char == ']':
+                return pc + 1, 0, chapters
+            return None
+
+class ChapterJSONLogitsProcessor:
+    """
+    Logits processor that only admits tokens continuing a valid chapter document
+    
+    Checking the whole vocabulary every step is too slow in Python, so the
+    highest scoring tokens are checked first and the search only widens when
+    none of them fits. Once the remaining token budget is just enough to close
+    the document, only tokens of the shortest completion are allowed, so every
+    generation ends in parseable JSON.
+    
+    In assisted generation the processor also scores the draft model's
+    proposals and the target model's verification of them, so calls may go
+    back to an earlier length; the states along each row are kept so a
+    rewind costs no grammar steps.
+    """
+    
+    def __init__(
+        self,
+        token_texts: List[str],
+        eos_token_id: int,
+        max_new_tokens: int,
+        max_chapters: int = 15,
+        top_k: int = 32
+    ):
+        self.token_texts = token_texts
+        self.eos_token_id = eos_token_id
+        self.max_new_tokens = max_new_tokens
+        self.grammar = ChapterJSONGrammar(max_chapters)
+        self.top_k = top_k
+        
+        self._prompt_length: Optional[int] = None
+        self._tokens: List[List[int]] = []
+        self._paths: List[List[Optional[State]]] = []
+        self._transitions: Dict[Tuple[State, int], Optional[State]] = {}
+        self._closings: Dict[State, str] = {}
+    
+    @staticmethod
+    def token_texts_for(tokenizer) -> List[str]:
+        """
+        Decode every token of a vocabulary on its own
+        
+        Args:
+            tokenizer: Hugging Face tokenizer
+        
+        Returns:
+            Token texts indexed by id, with special and added tokens mapped to None
+        """
+        
+        excluded = set(tokenizer.all_special_ids) | set(getattr(tokenizer, 'added_tokens_decoder', {}))
+        return [
+            None if token_id in excluded else tokenizer.decode([token_id])
+            for token_id in range(len(tokenizer))
+        ]
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1]
+            self._tokens = [[] for _ in range(input_ids.shape[0])]
+            self._paths = [[self.grammar.initial_state] for _ in range(input_ids.shape[0])]
+        
+        generated = input_ids.shape[1] - self._prompt_length
+        remaining = self.max_new_tokens - generated
+        
+        mask = torch.full_like(scores, float('-inf'))
+        for row in range(input_ids.shape[0]):
+            state = self._state_after(row, input_ids[row, self._prompt_length:])
+            for token_id in self._allowed_tokens(state, scores[row], remaining):
+                mask[row, token_id] = 0.0
+        
+        return scores + mask
+    
+    def _state_after(self, row: int, generated_ids: torch.LongTensor) -> Optional[State]:
+        """State of a row after its generated tokens, advancing only past tokens not seen before"""
+        
+        tokens, path = self._tokens[row], self._paths[row]
+        generated = generated_ids.shape[0]
+        
+        if generated > len(tokens):
+            common = len(tokens)
+        else:
+            # Shorter or equal: a rewind, possibly onto a token that replaced a rejected draft
+            ids = generated_ids.tolist()
+            common = 0
+            if tokens[:generated] == ids:
+                common = generated
+            else:
+                while tokens[common] == ids[common]:
+                    common += 1
+        
+        del tokens[common:]
+        del path[common + 1:]
+        for token_id in generated_ids[common:].tolist():
+            tokens.append(token_id)
+            path.append(self._advance(path[-1], token_id))
+        return path[-1]
+    
+    def _advance(self, state: Optional[State], token_id: int) -> Optional[State]:
+        """State after a token, with finished (or broken) rows staying put"""
+        
+        if state is None or self.grammar.is_complete(state):
+            return state
+        
+        key = (state, token_id)
+        if key not in self._transitions:
+            text = self.token_texts[token_id] if token_id < len(self.token_texts) else None
+            self._transitions[key] = self.grammar.advance(state, text) if text else None
+        return self._transitions[key]
+    
+    def _allowed_tokens(self, state: Optional[State], scores: torch.FloatTensor, remaining: int) -> List[int]:
+        """Token ids a row may sample next"""
+        
+        if state is None or self.grammar.is_complete(state):
+            return [self.eos_token_id]
+        
+        # Leave room for the shortest completion plus the end-of-sequence token
+        closing = self._closing_text(state)
+        if remaining <= len(closing) + 1:
+            return self._closing_tokens(closing, scores)
+        
+        def fits(token_id: int) -> bool:
+            next_state = self._advance(state, token_id)
+            return next_state is not None and len(self._closing_text(next_state)) + 1 < remaining
+        
+        order = torch.argsort(scores, descending=True).tolist()
+        width = self.top_k
+        start = 0
+        while start < len(order):
+            allowed = [token_id for token_id in order[start:start + width] if fits(token_id)]
+            if allowed:
+                return allowed
+            start += width
+            width *= 8
+        
+        return self._closing_tokens(closing, scores)
+    
+    def _closing_text(self, state: State) -> str:
+        """Shortest completion of a state, cached"""
+        
+        if state not in self._closings:
+            self._closings[state] = self.grammar.closing_text(state)
+        return self._closings[state]
+    
+    def _closing_tokens(self, closing: str, scores: torch.FloatTensor) -> List[int]:
+        """Best-scoring token that is a prefix of the shortest completion"""
+        
+        candidates = [
+            token_id for token_id, text in enumerate(self.token_texts)
+            if text and closing.startswith(text)
+        ]
+        if not candidates:
+            return [self.eos_token_id]
+        return [max(candidates, key=lambda token_id: scores[token_id].item())]
+
+class JSONObjectStoppingCriteria:
+    """
+    Stopping criterion that ends a row as soon as its top-level JSON object closes
+    
+    Brace depth is tracked over the decoded token stream, ignoring braces
+    inside strings. Text before the first '{' is skipped, so a short preamble
+    does not stop generation. Every token added since the previous call is
+    read, since assisted generation appends several per step.
+    """
+    
+    def __init__(self, token_texts: List[str], per_row: bool = True, prompt_length: int = None):
+        self.token_texts = token_texts
+        self.per_row = per_row
+        
+        # Generated tokens up to and including the closing brace, per finished row
+        self.closed_lengths: Dict[int, int] = {}
+        
+        # Without a known prompt length, the first call is assumed to carry one generated token
+        self._prompt_length: Optional[int] = prompt_length
+        self._generated = 0
+        self._rows: Dict[int, Tuple[int, bool, bool, bool]] = {}
+    
+    @staticmethod
+    def supports_per_row() -> bool:
+        """Whether the installed transformers stops rows individually (4.39+) instead of the whole batch"""
+        
+        import transformers
+        
+        major, minor = (int(part) for part in transformers.__version__.split('.')[:2])
+        return (major, minor) >= (4, 39)
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs):
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1] - 1
+        
+        length = input_ids.shape[1] - self._prompt_length
+        for generated in range(self._generated + 1, length + 1):
+            for row, token_id in enumerate(input_ids[:, self._prompt_length + generated - 1].tolist()):
+                self.feed_token(row, token_id, generated)
+        self._generated = length
+        
+        done = [row in self.closed_lengths for row in range(input_ids.shape[0])]
+        if self.per_row:
+            return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+        return all(done)
+    
+    def feed_token(self, row: int, token_id: int, generated: int) -> bool:
+        """
+        Advance one row by a generated token, for runtimes that report tokens one at a time
+        
+        Args:
+            row: Row of the batch the token belongs to
+            token_id: Generated token
+            generated: Tokens the row has generated so far, including this one
+        
+        Returns:
+            Whether the row's object has closed
+        """
+        
+        if row in self.closed_lengths:
+            return True
+        
+        text = self.token_texts[token_id] if token_id < len(self.token_texts) else None
+        if text and self._feed(row, text):
+            self.closed_lengths[row] = generated
+            return True
+        return False
+    
+    def _feed(self, row: int, text: str) -> bool:
+        """Advance one row over decoded text and report whether its object closed"""
+        
+        depth, in_string, escaped, started = self._rows.get(row, (0, False, False, False))
+        
+        for char in text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"' and started:
+                in_string = True
+            elif char == '{':
+                depth += 1
+                started = True
+            elif char == '}' and started:
+                depth -= 1
+                if depth == 0:
+                    return True
+        
+        self._rows[row] = (depth, in_string, escaped, started)
+        return False
+
+class ChapterStreamParser:
+    """
+    Incremental parser that picks chapter objects out of a response as it is generated
+    
+    Text is fed in arbitrary pieces. Every object directly inside an array of
+    the top-level object (the chapters) is decoded as soon as its closing
+    brace arrives. Objects that are not valid JSON are skipped; the complete
+    response is still parsed and validated as a whole afterwards.
+    """
+    
+    def __init__(self):
+        self.chapters: List[Dict[str, Any]] = []
+        
+        self._containers: List[str] = []  # Open '{' and '[' of the response
+        self._in_string = False
+        self._escaped = False
+        self._closed = False
+        self._current: Optional[List[str]] = None  # Characters of the chapter object being read
+    
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Feed the next piece of the response
+        
+        Args:
+            text: Newly generated text
+        
+        Returns:
+            Chapter objects completed by this piece, in order
+        """
+        
+        completed = []
+        
+        for char in text:
+            if self._closed:
+                break
+            
+            if self._current is not None:
+                self._current.append(char)
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._containers:
+                self._in_string = True
+            elif char == '{' or (char == '[' and self._containers):
+                # Text before the first '{' is preamble
+                if char == '{' and self._containers == ['{', '[']:
+                    self._current = [char]
+                self._containers.append(char)
+            elif char in '}]' and self._containers:
+                self._containers.pop()
+                if self._current is not None and len(self._containers) == 2:
+                    chapter = self._decode(''.join(self._current))
+                    self._current = None
+                    if chapter is not None:
+                        self.chapters.append(chapter)
+                        completed.append(chapter)
+                elif not self._containers:
+                    self._closed = True
+        
+        return completed
+    
+    def _decode(self, text: str) -> Optional[Dict[str, Any]]:
+        """Decode one chapter object, or None if it is malformed"""
+        
+        try:
+            chapter = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return chapter if isinstance(chapter, dict) else None
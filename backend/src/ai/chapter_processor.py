@@ -3,12 +3,17 @@ Main chapter processor that orchestrates the complete AI workflow
 """
 
 import os
+import bisect
 import logging
 from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime
 
 from .asr_processor import ASRProcessor
 from .llm_processor import LLMProcessor
+from .transcript import Transcript
+from .transcript_compaction import TranscriptCompactor
+from .topic_segmenter import TopicSegmenter
+from .speech_index import SpeechIndex
 from .model_manager import ModelManager
 from ..models import Video, Chapter, ProcessingJob, db
 
@@ -25,13 +30,30 @@ class ChapterProcessor:
         self.model_manager = ModelManager()
         self.asr_processor = ASRProcessor(model_size=asr_model_size)
         self.llm_processor = LLMProcessor(model_name=llm_model_name)
+        self.transcript_compactor = TranscriptCompactor()
+        self.topic_segmenter = TopicSegmenter()
         
         # Processing configuration
         self.config = {
             'min_chapter_length': 30.0,  # seconds
             'max_chapters': 15,
             'transcription_language': None,  # auto-detect
-            'initial_prompt': None
+            'initial_prompt': None,
+            'audio_decode_mode': None,  # 'pipe' or 'file', defaults to ASR_AUDIO_DECODE_MODE
+            'audio_decode_slices': None,  # parallel FFmpeg processes for 'pipe' decoding, defaults to ASR_AUDIO_DECODE_SLICES
+            'transcription_mode': None,  # 'sequential', 'chunked', 'batched' or 'two_pass', defaults to ASR_TRANSCRIPTION_MODE
+            'asr_chunk_seconds': None,  # chunked mode span length, defaults to ASR_CHUNK_SECONDS
+            'asr_workers': None,  # chunked mode model replicas, defaults to ASR_PARALLEL_WORKERS
+            'asr_checkpoint_interval': None,  # seconds between resumable checkpoints, defaults to ASR_CHECKPOINT_INTERVAL_SECONDS
+            'asr_draft_model': None,  # two_pass mode draft model size, defaults to ASR_DRAFT_MODEL
+            'asr_redecode_threshold': None,  # two_pass mode mean word probability to re-decode below, defaults to ASR_REDECODE_THRESHOLD
+            'asr_model_routing': None,  # route to a language-specific ASR model, defaults to ASR_MODEL_ROUTING_ENABLED
+            'chaptering_mode': None,  # 'auto', 'single' or 'windowed' LLM chaptering, defaults to LLM_CHAPTERING_MODE
+            'vote_samples': None,  # LLM samples drawn in one call and fused by voting (1 for retries), defaults to LLM_VOTE_SAMPLES
+            'transcript_compaction': None,  # merge segments into paragraphs before prompting, defaults to TRANSCRIPT_COMPACTION_ENABLED
+            'chaptering_engine': None,  # 'llm' (generative) or 'topic' (embedding segmentation), defaults to CHAPTERING_ENGINE
+            'topic_titles': None,  # 'keywords' or 'llm' titles for topic engine chapters, defaults to TOPIC_TITLE_MODE
+            'chapter_boundaries': None  # externally supplied chapter start times (seconds); only titles are generated
         }
     
     def process_video(
@@ -47,7 +69,8 @@ class ChapterProcessor:
         Args:
             video_id: ID of the video to process
             job_id: ID of the processing job
-            progress_callback: Function to call with progress updates
+            progress_callback: Function to call with progress updates; during chapter generation
+                it may also receive a chapters keyword with the chapters generated so far
             config_overrides: Configuration overrides
             
         Returns:
@@ -86,6 +109,7 @@ class ChapterProcessor:
                 progress_callback,
                 job
             )
+            speech_index = self.asr_processor.speech_index
             
             # Step 2: Chapter Generation
             if progress_callback:
@@ -103,7 +127,8 @@ class ChapterProcessor:
                 video,
                 processing_config,
                 progress_callback,
-                job
+                job,
+                speech_index
             )
             
             # Step 3: Save chapters to database
@@ -162,7 +187,7 @@ class ChapterProcessor:
         config: Dict[str, Any],
         progress_callback: Callable = None,
         job: ProcessingJob = None
-    ) -> List[Dict[str, Any]]:
+    ) -> Transcript:
         """Transcribe video audio to text"""
         
         try:
@@ -178,13 +203,28 @@ class ChapterProcessor:
                         metadata={'step': 'transcription', 'substep': message}
                     )
             
+            # Reuse the speech index stored with the job by an earlier attempt
+            stored_index = (job.metadata or {}).get('speech_index') if job else None
+            speech_index = SpeechIndex.from_dict(stored_index) if stored_index else None
+            
             # Perform transcription
             transcript_segments = self.asr_processor.transcribe_video(
                 video_path=video.file_path,
                 language=config.get('transcription_language'),
                 initial_prompt=config.get('initial_prompt'),
                 progress_callback=transcription_progress,
-                keep_audio=False
+                keep_audio=False,
+                audio_decode_mode=config.get('audio_decode_mode'),
+                transcription_mode=config.get('transcription_mode'),
+                chunk_seconds=config.get('asr_chunk_seconds'),
+                num_workers=config.get('asr_workers'),
+                checkpoint_key=job.id if job else None,
+                checkpoint_interval=config.get('asr_checkpoint_interval'),
+                speech_index=speech_index,
+                draft_model_size=config.get('asr_draft_model'),
+                redecode_threshold=config.get('asr_redecode_threshold'),
+                model_routing=config.get('asr_model_routing'),
+                audio_decode_slices=config.get('audio_decode_slices')
             )
             
             # Get transcript statistics
@@ -197,7 +237,12 @@ class ChapterProcessor:
                     progress=50.0,
                     metadata={
                         'step': 'transcription_complete',
-                        'transcript_stats': transcript_stats
+                        'transcript_stats': transcript_stats,
+                        **self.asr_processor.run_metadata,
+                        'model_used': {
+                            **((job.metadata or {}).get('model_used') or {}),
+                            'asr': self.asr_processor.model_used
+                        }
                     }
                 )
             
@@ -209,25 +254,25 @@ class ChapterProcessor:
     
     def _generate_chapters(
         self,
-        transcript_segments: List[Dict[str, Any]],
+        transcript_segments: Transcript,
         video: Video,
         config: Dict[str, Any],
         progress_callback: Callable = None,
-        job: ProcessingJob = None
+        job: ProcessingJob = None,
+        speech_index: SpeechIndex = None
     ) -> List[Dict[str, Any]]:
-        """Generate chapters from transcript using LLM"""
+        """Generate chapters from transcript using the LLM or the topic segmentation engine"""
         
         try:
-            # Format transcript for LLM input
-            formatted_transcript = self.asr_processor.format_transcript_for_chaptering(
-                transcript_segments
-            )
-            
             # Create progress wrapper for chapter generation (50-85% range)
-            def chapter_progress(progress, message):
+            def chapter_progress(progress, message, chapters=None):
                 adjusted_progress = 50 + (progress / 100) * 35  # Map to 50-85%
                 if progress_callback:
-                    progress_callback(adjusted_progress, f"Chapter Generation: {message}")
+                    if chapters is None:
+                        progress_callback(adjusted_progress, f"Chapter Generation: {message}")
+                    else:
+                        # Chapters streamed before the response is complete
+                        progress_callback(adjusted_progress, f"Chapter Generation: {message}", chapters=chapters)
                 
                 if job:
                     job.update_progress(
@@ -235,15 +280,80 @@ class ChapterProcessor:
                         metadata={'step': 'chapter_generation', 'substep': message}
                     )
             
-            # Generate chapters
-            chapters = self.llm_processor.generate_chapters(
-                transcript=formatted_transcript,
-                video_duration=video.duration,
-                segment_count=len(transcript_segments),
-                max_chapters=config.get('max_chapters', 15),
-                min_chapter_length=config.get('min_chapter_length', 30.0),
-                progress_callback=chapter_progress
-            )
+            engine = config.get('chaptering_engine') or os.getenv('CHAPTERING_ENGINE', 'llm')
+            compaction_report = None
+            
+            # The transcript ends where the speech does if the video duration was never probed
+            video_duration = video.duration or transcript_segments.duration
+            
+            if config.get('chapter_boundaries'):
+                # Boundaries are known, so the LLM only titles each chapter from its own slice
+                starts = self._normalize_boundaries(config['chapter_boundaries'], video_duration)
+                chapters = self.llm_processor.generate_titles(
+                    boundaries=starts,
+                    transcript_slices=self._transcript_slices(transcript_segments, starts),
+                    video_duration=video_duration,
+                    progress_callback=chapter_progress
+                )
+                engine_metadata = {'chaptering_engine': 'boundaries', **self.llm_processor.run_metadata}
+            
+            elif engine == 'topic':
+                # Boundaries from embedding similarity, titles from keywords; no generative model
+                chapters = self.topic_segmenter.generate_chapters(
+                    segments=transcript_segments,
+                    video_duration=video_duration,
+                    max_chapters=config.get('max_chapters', 15),
+                    min_chapter_length=config.get('min_chapter_length', 30.0),
+                    progress_callback=chapter_progress,
+                    speech_index=speech_index
+                )
+                engine_metadata = dict(self.topic_segmenter.run_metadata)
+                
+                topic_titles = config.get('topic_titles') or os.getenv('TOPIC_TITLE_MODE', 'keywords')
+                if topic_titles == 'llm':
+                    starts = [chapter['start_time'] for chapter in chapters]
+                    titled = self.llm_processor.generate_titles(
+                        boundaries=starts,
+                        transcript_slices=self._transcript_slices(transcript_segments, starts),
+                        video_duration=video_duration,
+                        fallback_titles=[chapter['title'] for chapter in chapters]
+                    )
+                    chapters = [{**chapter, 'title': item['title']} for chapter, item in zip(chapters, titled)]
+                    engine_metadata.update(self.llm_processor.run_metadata)
+                engine_metadata['topic_titles'] = topic_titles
+            else:
+                # Format transcript for LLM input
+                compaction = config.get('transcript_compaction')
+                if compaction is None:
+                    compaction = os.getenv('TRANSCRIPT_COMPACTION_ENABLED', 'true').lower() == 'true'
+                
+                if compaction:
+                    formatted_transcript, compaction_report = self.transcript_compactor.compact(
+                        transcript_segments,
+                        count_tokens=self.llm_processor.count_tokens,
+                        token_budget=self.llm_processor.transcript_token_budget(
+                            video_duration, len(transcript_segments)
+                        ),
+                        language=config.get('transcription_language') or self.asr_processor.detected_language
+                    )
+                else:
+                    formatted_transcript = self.asr_processor.format_transcript_for_chaptering(
+                        transcript_segments
+                    )
+                
+                # Generate chapters
+                chapters = self.llm_processor.generate_chapters(
+                    transcript=formatted_transcript,
+                    video_duration=video_duration,
+                    segment_count=len(transcript_segments),
+                    max_chapters=config.get('max_chapters', 15),
+                    min_chapter_length=config.get('min_chapter_length', 30.0),
+                    progress_callback=chapter_progress,
+                    speech_index=speech_index,
+                    chaptering_mode=config.get('chaptering_mode'),
+                    vote_samples=config.get('vote_samples')
+                )
+                engine_metadata = {'chaptering_engine': 'llm', **self.llm_processor.run_metadata}
             
             # Get generation statistics
             generation_stats = self.llm_processor.get_generation_statistics(chapters)
@@ -255,7 +365,9 @@ class ChapterProcessor:
                     progress=85.0,
                     metadata={
                         'step': 'chapter_generation_complete',
-                        'generation_stats': generation_stats
+                        'generation_stats': generation_stats,
+                        'transcript_compaction': compaction_report,
+                        **engine_metadata
                     }
                 )
             
@@ -265,6 +377,26 @@ class ChapterProcessor:
             logger.error(f"Chapter generation failed: {str(e)}")
             raise
     
+    def _normalize_boundaries(self, boundaries: List[float], video_duration: Optional[float]) -> List[float]:
+        """Sorted, distinct chapter start times inside the video (unbounded if its duration is unknown), starting at 0"""
+        
+        starts = sorted({
+            float(start) for start in boundaries
+            if 0 <= float(start) and (not video_duration or float(start) < video_duration)
+        })
+        if not starts or starts[0] > 0:
+            starts.insert(0, 0.0)
+        return starts
+    
+    def _transcript_slices(self, transcript_segments: Transcript, starts: List[float]) -> List[str]:
+        """Transcript text of each chapter, assigning every segment by its start time"""
+        
+        texts: List[List[str]] = [[] for _ in starts]
+        for index, start in enumerate(transcript_segments.segment_starts.tolist()):
+            chapter = max(bisect.bisect_right(starts, start) - 1, 0)
+            texts[chapter].append(transcript_segments.segment_text(index).strip())
+        return [' '.join(text for text in chapter_texts if text) for chapter_texts in texts]
+    
     def _save_chapters(
         self,
         chapters: List[Dict[str, Any]],
@@ -393,6 +525,59 @@ class ChapterProcessor:
             if not isinstance(new_config['max_chapters'], int) or new_config['max_chapters'] <= 0:
                 raise ValueError("max_chapters must be a positive integer")
         
+        if new_config.get('transcription_mode') not in (None, 'sequential', 'chunked', 'batched', 'two_pass'):
+            raise ValueError("transcription_mode must be 'sequential', 'chunked', 'batched' or 'two_pass'")
+        
+        if new_config.get('asr_chunk_seconds') is not None:
+            if not isinstance(new_config['asr_chunk_seconds'], (int, float)) or new_config['asr_chunk_seconds'] <= 0:
+                raise ValueError("asr_chunk_seconds must be a positive number")
+        
+        if new_config.get('audio_decode_slices') is not None:
+            if not isinstance(new_config['audio_decode_slices'], int) or new_config['audio_decode_slices'] <= 0:
+                raise ValueError("audio_decode_slices must be a positive integer")
+        
+        if new_config.get('asr_workers') is not None:
+            if not isinstance(new_config['asr_workers'], int) or new_config['asr_workers'] <= 0:
+                raise ValueError("asr_workers must be a positive integer")
+        
+        if new_config.get('asr_checkpoint_interval') is not None:
+            if not isinstance(new_config['asr_checkpoint_interval'], (int, float)) or new_config['asr_checkpoint_interval'] < 0:
+                raise ValueError("asr_checkpoint_interval must be a non-negative number")
+        
+        if new_config.get('asr_redecode_threshold') is not None:
+            threshold = new_config['asr_redecode_threshold']
+            if not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+                raise ValueError("asr_redecode_threshold must be a number between 0 and 1")
+        
+        if new_config.get('asr_model_routing') is not None:
+            if not isinstance(new_config['asr_model_routing'], bool):
+                raise ValueError("asr_model_routing must be a boolean")
+        
+        if new_config.get('chaptering_mode') not in (None, 'auto', 'single', 'windowed'):
+            raise ValueError("chaptering_mode must be 'auto', 'single' or 'windowed'")
+        
+        if new_config.get('vote_samples') is not None:
+            if not isinstance(new_config['vote_samples'], int) or new_config['vote_samples'] <= 0:
+                raise ValueError("vote_samples must be a positive integer")
+        
+        if new_config.get('transcript_compaction') is not None:
+            if not isinstance(new_config['transcript_compaction'], bool):
+                raise ValueError("transcript_compaction must be a boolean")
+        
+        if new_config.get('chaptering_engine') not in (None, 'llm', 'topic'):
+            raise ValueError("chaptering_engine must be 'llm' or 'topic'")
+        
+        if new_config.get('topic_titles') not in (None, 'keywords', 'llm'):
+            raise ValueError("topic_titles must be 'keywords' or 'llm'")
+        
+        if new_config.get('chapter_boundaries') is not None:
+            boundaries = new_config['chapter_boundaries']
+            if not isinstance(boundaries, list) or not all(
+                isinstance(start, (int, float)) and not isinstance(start, bool) and start >= 0
+                for start in boundaries
+            ):
+                raise ValueError("chapter_boundaries must be a list of non-negative numbers")
+        
         # Update configuration
         self.config.update(new_config)
         logger.info(f"Configuration updated: {new_config}")
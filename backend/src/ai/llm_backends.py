@@ -0,0 +1,970 @@
+"""
+Inference backends that run chapter prompts for the LLM processor
+"""
+
+import os
+import copy
+import contextlib
+import json
+import math
+import time
+import logging
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import BoundedSemaphore, Lock, get_ident
+from typing import List, Dict, Any, Optional, Callable, Hashable, Tuple
+
+import torch
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .model_manager import ModelManager
+from .chapter_grammar import ChapterJSONLogitsProcessor, JSONObjectStoppingCriteria, chapter_json_schema
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token, for servers that cannot tokenize
+CHARS_PER_TOKEN = 4
+
+# Sampling settings shared by every backend
+TEMPERATURE = 0.3  # Lower temperature for more consistent output
+TOP_P = 0.9
+
+class LLMBackend:
+    """
+    Runs chat prompts for the LLM processor
+    
+    generate() takes a batch of user prompts that share a system prompt and
+    returns one dictionary per prompt with 'text' (the first sample),
+    'samples' (num_samples texts), 'llm_tokens_generated',
+    'llm_prefill_tokens_saved' and 'batch_size'. Generations assisted by a
+    draft model add the SpeculationMeter report.
+    """
+    
+    # Whether generate() enforces json_max_chapters while decoding
+    supports_constrained_decoding = True
+    
+    # Small model proposing tokens for the main model to verify, if any
+    draft_model_name = None
+    
+    def load(self) -> Dict[str, Any]:
+        """Make the model ready and return a description of it"""
+        raise NotImplementedError
+    
+    def generate(
+        self,
+        user_prompts: List[str],
+        system_prompt: str,
+        max_new_tokens: int,
+        json_max_chapters: int = None,
+        num_samples: int = 1,
+        stream_callback: Callable[[int, str], None] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate responses for a batch of user prompts
+        
+        Args:
+            user_prompts: User turns, one per response
+            system_prompt: System turn shared by every prompt
+            max_new_tokens: Maximum tokens per response
+            json_max_chapters: Constrain responses to a chapter JSON document with at most
+                this many chapters (None for unconstrained)
+            num_samples: Responses sampled per prompt
+            stream_callback: Called with (prompt index, new text) while the responses are
+                generated, possibly from another thread; single-sample generations only
+        
+        Returns:
+            One result dictionary per prompt
+        """
+        raise NotImplementedError
+    
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in a text under the model's tokenizer"""
+        raise NotImplementedError
+    
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut a text down to its first max_tokens tokens"""
+        raise NotImplementedError
+    
+    @property
+    def batch_key(self) -> Hashable:
+        """Identifies the model, so prompts for different models never share a batch"""
+        raise NotImplementedError
+
+class ResponseStreamer:
+    """
+    Decodes generated tokens row by row and reports the new text of each row
+    
+    Implements the put()/end() streamer interface of transformers'
+    generate(), and push() for runtimes that report tokens one at a time.
+    """
+    
+    def __init__(self, tokenizer, stream_callback: Callable[[int, str], None]):
+        self.tokenizer = tokenizer
+        self.stream_callback = stream_callback
+        
+        self._prompt_seen = False
+        self._tokens: Dict[int, List[int]] = {}
+        self._sent: Dict[int, int] = {}
+    
+    def put(self, value: torch.Tensor):
+        """Receive the next token of every row (the first call carries the prompts)"""
+        
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        
+        # Assisted generation puts the tokens accepted in one step as a (1, n) tensor
+        rows = value.tolist() if value.dim() > 1 else [[token_id] for token_id in value.tolist()]
+        for row, token_ids in enumerate(rows):
+            for token_id in token_ids:
+                self.push(row, token_id)
+    
+    def end(self):
+        """Generation finished; every complete character has already been reported"""
+    
+    def push(self, row: int, token_id: int):
+        """Append a generated token to a row and report the text it completes"""
+        
+        tokens = self._tokens.setdefault(row, [])
+        tokens.append(token_id)
+        
+        # Rows are decoded whole, since a token's text can depend on its neighbours
+        text = self.tokenizer.decode(tokens, skip_special_tokens=True)
+        
+        # A character split across tokens decodes as U+FFFD until its last byte arrives
+        if text.endswith('\ufffd'):
+            return
+        
+        sent = self._sent.get(row, 0)
+        if len(text) > sent:
+            self._sent[row] = len(text)
+            self.stream_callback(row, text[sent:])
+
+class SpeculationMeter:
+    """
+    Counts and times the forward passes of the main and draft model during one assisted generate()
+    
+    Each pass of the main model verifies the draft's proposals and adds the
+    accepted ones plus one token of its own, so the accepted proposals are
+    the generated tokens minus the main model's passes. The time the main
+    model alone would have taken is estimated as its first pass (the prompt)
+    plus a one-token pass per further token. The cost of a one-token pass is
+    fitted from the verification passes and the tokens each one checked: on
+    GPU they cost about the same whatever the count, on CPU they do not.
+    """
+    
+    def __init__(self, model, draft_model, synchronize: bool = False):
+        self.models = {'main': model, 'draft': draft_model}
+        self.synchronize = synchronize
+        
+        # (input tokens, seconds) of every forward pass
+        self.passes: Dict[str, List[Tuple[int, float]]] = {'main': [], 'draft': []}
+        self._started: Dict[str, Tuple[int, float]] = {}
+        self._handles = []
+        self._thread = None
+    
+    def __enter__(self) -> 'SpeculationMeter':
+        self._thread = get_ident()
+        for name, model in self.models.items():
+            self._handles.append(model.register_forward_pre_hook(partial(self._before, name), with_kwargs=True))
+            self._handles.append(model.register_forward_hook(partial(self._after, name)))
+        return self
+    
+    def __exit__(self, *exc_info):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+    
+    def report(self, tokens_generated: int) -> Dict[str, Any]:
+        """
+        Draft acceptance and timing of the generation
+        
+        Args:
+            tokens_generated: Tokens the main model appended to the prompt
+        
+        Returns:
+            Dictionary with llm_draft_tokens_proposed, llm_draft_tokens_accepted,
+            llm_speculative_seconds and llm_speculative_baseline_seconds
+        """
+        
+        main, draft = self.passes['main'], self.passes['draft']
+        if not main:
+            return {}
+        
+        return {
+            'llm_draft_tokens_proposed': len(draft),
+            'llm_draft_tokens_accepted': max(0, tokens_generated - len(main)),
+            'llm_speculative_seconds': sum(seconds for _, seconds in main + draft),
+            'llm_speculative_baseline_seconds': main[0][1] + max(0, tokens_generated - 1) * self._decode_step(main[1:])
+        }
+    
+    def _decode_step(self, passes: List[Tuple[int, float]]) -> float:
+        """Estimated seconds of a one-token pass of the main model, from its verification passes"""
+        
+        if not passes:
+            return 0.0
+        
+        try:
+            slope, intercept = statistics.linear_regression(
+                [tokens for tokens, _ in passes], [seconds for _, seconds in passes]
+            )
+            if slope + intercept > 0:
+                return slope + intercept
+        except statistics.StatisticsError:
+            pass  # Every pass checked the same number of tokens
+        
+        return statistics.median(seconds / tokens for tokens, seconds in passes)
+    
+    def _before(self, name: str, module, args, kwargs):
+        """Forward pre-hook: start timing a pass made by the generating thread"""
+        
+        if get_ident() == self._thread:
+            input_ids = kwargs.get('input_ids', args[0] if args else None)
+            self._sync()
+            self._started[name] = (input_ids.shape[-1] if input_ids is not None else 1, time.perf_counter())
+    
+    def _after(self, name: str, module, args, output):
+        """Forward hook: record the input tokens and duration of a pass"""
+        
+        if get_ident() == self._thread and name in self._started:
+            self._sync()
+            tokens, started = self._started.pop(name)
+            self.passes[name].append((tokens, time.perf_counter() - started))
+    
+    def _sync(self):
+        """Wait for queued GPU work, so a pass is timed by when it finishes rather than when it is queued"""
+        
+        if self.synchronize:
+            torch.cuda.synchronize()
+
+class TransformersBackend(LLMBackend):
+    """In-process Hugging Face model loaded through ModelManager"""
+    
+    def __init__(self, model_name: str, max_input_tokens: int, draft_model_name: str = None):
+        self.model_manager = ModelManager()
+        self.model_name = model_name
+        self.max_input_tokens = max_input_tokens
+        self._model_info = None
+        
+        # Speculative decoding: a small model with the same tokenizer proposes tokens that this
+        # model verifies; generate() uses it for single-prompt, single-sample calls
+        self.draft_model_name = draft_model_name
+        self._draft_info = None
+        
+        # Reuse the KV cache of the shared system prompt across generations of the loaded model
+        self.prefix_cache_enabled = os.getenv('LLM_PREFIX_CACHE_ENABLED', 'true').lower() == 'true'
+    
+    def load(self) -> Dict[str, Any]:
+        """Get or load the LLM model, and the draft model if one is configured"""
+        if self._model_info is None:
+            self._model_info = self.model_manager.get_llm_model(self.model_name)
+        if self.draft_model_name and self._draft_info is None:
+            self._draft_info = self._load_draft_model(self._model_info)
+        return self._model_info
+    
+    @property
+    def batch_key(self) -> Hashable:
+        return ('transformers', self.model_name, self.max_input_tokens)
+    
+    def generate(
+        self,
+        user_prompts: List[str],
+        system_prompt: str,
+        max_new_tokens: int,
+        json_max_chapters: int = None,
+        num_samples: int = 1,
+        stream_callback: Callable[[int, str], None] = None
+    ) -> List[Dict[str, Any]]:
+        """Run one left-padded generate() call and return texts and token counts per prompt"""
+        
+        model_info = self.load()
+        model = model_info['model']
+        tokenizer = model_info['tokenizer']
+        device = model_info['device']
+        
+        prompts = [self._render_prompt(tokenizer, user_prompt, system_prompt) for user_prompt in user_prompts]
+        
+        # Decoder-only models continue from the last position, so padding goes on the left
+        tokenizer.padding_side = 'left'
+        inputs = tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_input_tokens
+        ).to(device)
+        
+        # Instruction-tuned models often keep talking after the JSON, so stop once it closes
+        from transformers import StoppingCriteriaList
+        
+        input_length = inputs['input_ids'].shape[1]
+        stopping_criteria = JSONObjectStoppingCriteria(
+            self._get_token_texts(tokenizer),
+            per_row=JSONObjectStoppingCriteria.supports_per_row(),
+            prompt_length=input_length
+        )
+        generate_kwargs = {'stopping_criteria': StoppingCriteriaList([stopping_criteria])}
+        
+        if json_max_chapters is not None:
+            from transformers import LogitsProcessorList
+            
+            generate_kwargs['logits_processor'] = LogitsProcessorList([
+                ChapterJSONLogitsProcessor(
+                    self._get_token_texts(tokenizer),
+                    eos_token_id=tokenizer.eos_token_id,
+                    max_new_tokens=max_new_tokens,
+                    max_chapters=json_max_chapters
+                )
+            ])
+        
+        # Assisted generation only runs one sequence at a time; batches decode without the draft
+        use_draft = self._draft_info is not None and len(prompts) == 1 and num_samples == 1
+        
+        # Left padding shifts the system prompt by a different amount in each row, so the
+        # cached prefix only lines up with single-prompt batches. transformers hands every
+        # generate() argument, past_key_values included, to the draft model as well, which
+        # cannot use the main model's cache, so drafted calls prefill in full.
+        prefill_tokens_saved = 0
+        prefix_cache = None
+        if len(prompts) == 1 and not use_draft:
+            prefix_cache = self._get_prefix_cache(model, tokenizer, device, system_prompt)
+        if prefix_cache is not None:
+            prefix_ids = prefix_cache['input_ids']
+            prefix_length = prefix_ids.shape[1]
+            input_ids = inputs['input_ids']
+            if input_ids.shape[1] > prefix_length and torch.equal(input_ids[:, :prefix_length], prefix_ids):
+                # generate() extends the cache in place, so every call starts from a copy
+                generate_kwargs['past_key_values'] = copy.deepcopy(prefix_cache['past_key_values'])
+                
+                # The call that built the cache already paid for the prefix once
+                if prefix_cache['uses']:
+                    prefill_tokens_saved = prefix_length
+                prefix_cache['uses'] += 1
+        
+        if num_samples > 1:
+            prefill_tokens_saved += self._expand_for_samples(model, inputs, generate_kwargs, num_samples)
+        elif stream_callback is not None:
+            generate_kwargs['streamer'] = ResponseStreamer(tokenizer, stream_callback)
+        
+        meter = None
+        if use_draft:
+            generate_kwargs['assistant_model'] = self._draft_info['model']
+            meter = SpeculationMeter(model, self._draft_info['model'], synchronize=device == 'cuda')
+        
+        with torch.no_grad(), meter or contextlib.nullcontext():
+            outputs = model.generate(
+                **inputs,
+                **generate_kwargs,
+                max_new_tokens=max_new_tokens,
+                temperature=TEMPERATURE,
+                top_p=TOP_P,
+                do_sample=True,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id
+            )
+        
+        speculation = meter.report(outputs.shape[1] - input_length) if meter is not None else {}
+        
+        texts = []
+        tokens_generated = []
+        for row, output in enumerate(outputs):
+            generated = output[input_length:]
+            
+            # Rows that closed early may have been carried along until the whole batch stopped
+            if row in stopping_criteria.closed_lengths:
+                generated = generated[:stopping_criteria.closed_lengths[row]]
+            
+            texts.append(tokenizer.decode(generated, skip_special_tokens=True))
+            tokens_generated.append(int((generated != tokenizer.pad_token_id).sum()))
+        
+        # The samples of a prompt are consecutive rows
+        results = []
+        for index in range(len(prompts)):
+            rows = slice(index * num_samples, (index + 1) * num_samples)
+            results.append({
+                'text': texts[rows][0],
+                'samples': texts[rows],
+                'llm_tokens_generated': sum(tokens_generated[rows]),
+                'llm_prefill_tokens_saved': prefill_tokens_saved if index == 0 else 0,
+                'batch_size': len(prompts),
+                **speculation
+            })
+        
+        return results
+    
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens the LLM tokenizer produces for a text"""
+        
+        tokenizer = self.load()['tokenizer']
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut a text down to its first max_tokens LLM tokens"""
+        
+        tokenizer = self.load()['tokenizer']
+        token_ids = tokenizer.encode(text, add_special_tokens=False)
+        if len(token_ids) <= max_tokens:
+            return text
+        return tokenizer.decode(token_ids[:max_tokens]).rstrip() + " ..."
+    
+    def _load_draft_model(self, model_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Load the draft model and check that it can assist the main model
+        
+        A draft that fails to load or uses another vocabulary is dropped with a
+        warning, and generation continues without it.
+        
+        Args:
+            model_info: Loaded main model
+        
+        Returns:
+            Draft model info, or None if it cannot be used
+        """
+        
+        try:
+            draft_info = self.model_manager.get_draft_llm_model(self.draft_model_name)
+        except Exception as e:
+            logger.warning(f"Draft model unavailable, generating without it: {str(e)}")
+            self.draft_model_name = None
+            return None
+        
+        # Proposals are token ids the main model scores directly, so both must share a vocabulary
+        if (
+            draft_info['model'].config.vocab_size != model_info['model'].config.vocab_size
+            or draft_info['tokenizer'].get_vocab() != model_info['tokenizer'].get_vocab()
+        ):
+            logger.warning(
+                f"Draft model {self.draft_model_name} does not share the tokenizer of {self.model_name}, "
+                f"generating without it"
+            )
+            self.draft_model_name = None
+            return None
+        
+        logger.info(f"Speculative decoding with draft model {self.draft_model_name}")
+        return draft_info
+    
+    def _expand_for_samples(self, model, inputs, generate_kwargs: Dict[str, Any], num_samples: int) -> int:
+        """
+        Repeat every prompt row num_samples times so one call draws all samples
+        
+        A single prompt is prefilled once and its KV cache copied to every
+        sample row, so the samples only pay for their own decoding.
+        
+        Args:
+            model: Loaded causal LM
+            inputs: Tokenized prompts, updated in place
+            generate_kwargs: generate() arguments, past_key_values is set or replaced
+            num_samples: Samples per prompt
+        
+        Returns:
+            Prefill tokens saved by sharing the prompt cache
+        """
+        
+        input_ids = inputs['input_ids']
+        saved = 0
+        
+        if input_ids.shape[0] == 1:
+            try:
+                from transformers import DynamicCache
+                
+                cache = generate_kwargs.get('past_key_values') or DynamicCache()
+                cached_length = cache.get_seq_length()
+                
+                # generate() feeds the last prompt token itself; the decoder alone skips the
+                # vocabulary-sized logits of every prompt position
+                if input_ids.shape[1] - 1 > cached_length:
+                    with torch.no_grad():
+                        model.get_decoder()(
+                            input_ids=input_ids[:, cached_length:-1], past_key_values=cache, use_cache=True
+                        )
+                
+                if hasattr(cache, 'batch_repeat_interleave'):
+                    cache.batch_repeat_interleave(num_samples)
+                else:
+                    # Older DynamicCache keeps one key and one value tensor per layer
+                    cache.key_cache = [key.repeat_interleave(num_samples, dim=0) for key in cache.key_cache]
+                    cache.value_cache = [value.repeat_interleave(num_samples, dim=0) for value in cache.value_cache]
+                
+                generate_kwargs['past_key_values'] = cache
+                saved = (num_samples - 1) * (input_ids.shape[1] - 1)
+            except Exception as e:
+                logger.warning(f"Shared prefill unavailable, samples are prefilled separately: {str(e)}")
+                generate_kwargs.pop('past_key_values', None)
+        
+        for key in ('input_ids', 'attention_mask'):
+            inputs[key] = inputs[key].repeat_interleave(num_samples, dim=0)
+        
+        return saved
+    
+    def _get_token_texts(self, tokenizer) -> List[str]:
+        """Decoded text of every token, computed once per loaded model"""
+        
+        model_info = self.load()
+        if 'token_texts' not in model_info:
+            model_info['token_texts'] = ChapterJSONLogitsProcessor.token_texts_for(tokenizer)
+        return model_info['token_texts']
+    
+    def _render_prompt(self, tokenizer, user_prompt: str, system_prompt: str) -> str:
+        """Apply the chat template to the system prompt and one user prompt"""
+        
+        return tokenizer.apply_chat_template(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            tokenize=False,
+            add_generation_prompt=True
+        )
+    
+    def _get_prefix_cache(self, model, tokenizer, device: str, system_prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the KV cache of the token prefix every prompt with this system prompt starts with
+        
+        Caches are computed once per loaded model and system prompt and kept in
+        its model info, so they are dropped together with the model. A cache is
+        rebuilt when the rendered prefix changes (e.g. a chat template that
+        embeds today's date).
+        
+        Args:
+            model: Loaded causal LM
+            tokenizer: Its tokenizer
+            device: Device the model runs on
+            system_prompt: System turn of the prompt
+        
+        Returns:
+            Dictionary with input_ids and past_key_values, or None if disabled or unavailable
+        """
+        
+        if not self.prefix_cache_enabled:
+            return None
+        
+        prefix_caches = self.load().setdefault('prefix_caches', {})
+        
+        prefix_ids = torch.tensor([self._shared_prefix_ids(tokenizer, system_prompt)], dtype=torch.long).to(device)
+        prefix_length = prefix_ids.shape[1]
+        
+        cached = prefix_caches.get(system_prompt)
+        if cached is not None and torch.equal(cached['input_ids'], prefix_ids):
+            return cached
+        
+        if prefix_length == 0:
+            return None
+        
+        try:
+            from transformers import DynamicCache
+            
+            past_key_values = DynamicCache()
+            with torch.no_grad():
+                model(input_ids=prefix_ids, past_key_values=past_key_values, use_cache=True)
+        except Exception as e:
+            logger.warning(f"System prompt KV cache unavailable: {str(e)}")
+            self.prefix_cache_enabled = False
+            return None
+        
+        prefix_caches[system_prompt] = {'input_ids': prefix_ids, 'past_key_values': past_key_values, 'uses': 0}
+        logger.info(f"Cached KV state of the {prefix_length}-token system prompt prefix")
+        return prefix_caches[system_prompt]
+    
+    def _shared_prefix_ids(self, tokenizer, system_prompt: str) -> List[int]:
+        """Token ids every rendered prompt with this system prompt starts with"""
+        
+        # The shared prefix is whatever two prompts with different user turns have in common
+        first, second = (
+            tokenizer(self._render_prompt(tokenizer, user_prompt, system_prompt))['input_ids']
+            for user_prompt in ('a', 'b')
+        )
+        
+        length = 0
+        while length < min(len(first), len(second)) and first[length] == second[length]:
+            length += 1
+        return first[:length]
+
+class CTranslate2Backend(TransformersBackend):
+    """
+    Int8 CTranslate2 build of the model, for CPU-only workers
+    
+    On CPU the transformers backend runs the model in float32, about 32 GB
+    for an 8B model. CTranslate2 keeps the weights quantized
+    (LLM_CT2_COMPUTE_TYPE) and runs them with its own CPU kernels, in about a
+    quarter of the memory. Prompts, tokenizer and sampling settings are those
+    of the transformers backend. The rendered system prompt is passed as the
+    runtime's static prompt, whose model state it caches across calls. The
+    runtime exposes no logits hook, so responses are not grammar-constrained;
+    they are parsed and retried like unconstrained output.
+    """
+    
+    supports_constrained_decoding = False
+    
+    def load(self) -> Dict[str, Any]:
+        """Get or load the quantized LLM model"""
+        if self._model_info is None:
+            self._model_info = self.model_manager.get_quantized_llm_model(self.model_name)
+        return self._model_info
+    
+    @property
+    def batch_key(self) -> Hashable:
+        return ('ctranslate2', self.model_name, self.max_input_tokens)
+    
+    def generate(
+        self,
+        user_prompts: List[str],
+        system_prompt: str,
+        max_new_tokens: int,
+        json_max_chapters: int = None,
+        num_samples: int = 1,
+        stream_callback: Callable[[int, str], None] = None
+    ) -> List[Dict[str, Any]]:
+        """Run one generate_batch() call and return texts and token counts per prompt"""
+        
+        model_info = self.load()
+        generator = model_info['model']
+        tokenizer = model_info['tokenizer']
+        
+        prompt_ids = [
+            tokenizer(self._render_prompt(tokenizer, user_prompt, system_prompt))['input_ids'][:self.max_input_tokens]
+            for user_prompt in user_prompts
+        ]
+        
+        static_prompt = self._shared_prefix_ids(tokenizer, system_prompt) if self.prefix_cache_enabled else []
+        if any(len(ids) <= len(static_prompt) or ids[:len(static_prompt)] != static_prompt for ids in prompt_ids):
+            static_prompt = []
+        
+        # The static prompt is prefilled once per batch, and not at all once the runtime has cached it
+        prefill_tokens_saved = 0
+        if static_prompt:
+            cached_prompts = model_info.setdefault('static_prompts', set())
+            calls_saved = len(prompt_ids) if tuple(static_prompt) in cached_prompts else len(prompt_ids) - 1
+            prefill_tokens_saved = len(static_prompt) * calls_saved
+            cached_prompts.add(tuple(static_prompt))
+        
+        # Instruction-tuned models often keep talking after the JSON, so stop once it closes
+        stopping_criteria = JSONObjectStoppingCriteria(self._get_token_texts(tokenizer))
+        generated: Dict[int, List[int]] = {}
+        streamer = ResponseStreamer(tokenizer, stream_callback) if stream_callback and num_samples == 1 else None
+        
+        def on_token(step) -> bool:
+            # The samples of a prompt are consecutive rows; a prompt stops when all of them have closed
+            row = step.batch_id * num_samples + step.hypothesis_id
+            if row not in stopping_criteria.closed_lengths:
+                tokens = generated.setdefault(row, [])
+                tokens.append(step.token_id)
+                stopping_criteria.feed_token(row, step.token_id, len(tokens))
+                if streamer is not None:
+                    streamer.push(row, step.token_id)
+            return all(
+                step.batch_id * num_samples + sample in stopping_criteria.closed_lengths
+                for sample in range(num_samples)
+            )
+        
+        generator.generate_batch(
+            [tokenizer.convert_ids_to_tokens(ids[len(static_prompt):]) for ids in prompt_ids],
+            static_prompt=tokenizer.convert_ids_to_tokens(static_prompt) if static_prompt else None,
+            max_length=max_new_tokens,
+            end_token=tokenizer.eos_token,
+            sampling_topk=0,
+            sampling_topp=TOP_P,
+            sampling_temperature=TEMPERATURE,
+            num_hypotheses=num_samples,
+            include_prompt_in_result=False,
+            callback=on_token
+        )
+        
+        # Texts come from the callback, which sees each sample's tokens in order up to its closing brace
+        results = []
+        for index in range(len(prompt_ids)):
+            rows = [generated.get(index * num_samples + sample, []) for sample in range(num_samples)]
+            texts = [tokenizer.decode(tokens, skip_special_tokens=True) for tokens in rows]
+            results.append({
+                'text': texts[0],
+                'samples': texts,
+                'llm_tokens_generated': sum(len(tokens) for tokens in rows),
+                'llm_prefill_tokens_saved': prefill_tokens_saved if index == 0 else 0,
+                'batch_size': len(prompt_ids)
+            })
+        
+        return results
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Client for an OpenAI-compatible completion server on the same node
+    
+    One server (llama.cpp server, vLLM, or benchmarks/llm_stub_server.py)
+    holds the model for every worker process, instead of each Celery worker
+    loading its own copy. All processors in a process share one keep-alive
+    connection pool per server and at most LLM_SERVER_MAX_CONCURRENCY
+    requests in flight, so the server's own batching sees concurrent prompts
+    without being flooded. Chapter responses are constrained through the
+    server's JSON schema support.
+    """
+    
+    _sessions: Dict[str, Tuple[requests.Session, BoundedSemaphore]] = {}
+    _sessions_lock = Lock()
+    
+    def __init__(self, model_name: str, base_url: str = None, max_concurrency: int = None):
+        self.base_url = (base_url or os.getenv('LLM_SERVER_URL', 'http://127.0.0.1:8080')).rstrip('/')
+        self.model_name = os.getenv('LLM_SERVER_MODEL') or model_name
+        self.api_key = os.getenv('LLM_SERVER_API_KEY')
+        self.max_concurrency = max_concurrency or int(os.getenv('LLM_SERVER_MAX_CONCURRENCY', '8'))
+        
+        # Connecting to a local server is instant, reading waits for a whole generation
+        self.timeout = (
+            float(os.getenv('LLM_SERVER_CONNECT_TIMEOUT', '5')),
+            float(os.getenv('LLM_SERVER_READ_TIMEOUT', '300'))
+        )
+        
+        self._tokenize_available = True
+    
+    def load(self) -> Dict[str, Any]:
+        """The server holds the model; only describe it"""
+        return {'model_name': self.model_name, 'base_url': self.base_url}
+    
+    @property
+    def batch_key(self) -> Hashable:
+        return ('openai', self.base_url, self.model_name)
+    
+    def generate(
+        self,
+        user_prompts: List[str],
+        system_prompt: str,
+        max_new_tokens: int,
+        json_max_chapters: int = None,
+        num_samples: int = 1,
+        stream_callback: Callable[[int, str], None] = None
+    ) -> List[Dict[str, Any]]:
+        """Send every prompt as its own request, concurrently, and let the server batch them"""
+        
+        complete = partial(
+            self._complete,
+            system_prompt=system_prompt,
+            max_new_tokens=max_new_tokens,
+            json_max_chapters=json_max_chapters,
+            num_samples=num_samples
+        )
+        
+        # Each prompt's stream reports under its own index
+        on_texts = [
+            partial(stream_callback, index) if stream_callback and num_samples == 1 else None
+            for index in range(len(user_prompts))
+        ]
+        
+        if len(user_prompts) == 1:
+            results = [complete(user_prompts[0], on_text=on_texts[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(user_prompts), self.max_concurrency)) as executor:
+                results = list(executor.map(
+                    lambda user_prompt, on_text: complete(user_prompt, on_text=on_text), user_prompts, on_texts
+                ))
+        
+        for result in results:
+            result['batch_size'] = len(user_prompts)
+        return results
+    
+    def count_tokens(self, text: str) -> int:
+        """Token count from the server's /tokenize endpoint, estimated if it has none"""
+        
+        if self._tokenize_available:
+            try:
+                return len(self._tokenize(text))
+            except (requests.RequestException, KeyError, ValueError) as e:
+                logger.warning(f"LLM server cannot tokenize, estimating token counts: {str(e)}")
+                self._tokenize_available = False
+        
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut a text down to its first max_tokens tokens through /tokenize and /detokenize"""
+        
+        if self._tokenize_available:
+            try:
+                tokens = self._tokenize(text)
+                if len(tokens) <= max_tokens:
+                    return text
+                data = self._post('/detokenize', {'model': self.model_name, 'tokens': tokens[:max_tokens]})
+                return (data.get('content') or data['prompt']).rstrip() + " ..."
+            except (requests.RequestException, KeyError, ValueError) as e:
+                logger.warning(f"LLM server cannot tokenize, estimating token counts: {str(e)}")
+                self._tokenize_available = False
+        
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= max_chars else text[:max_chars].rstrip() + " ..."
+    
+    def _complete(
+        self,
+        user_prompt: str,
+        system_prompt: str,
+        max_new_tokens: int,
+        json_max_chapters: Optional[int],
+        num_samples: int,
+        on_text: Callable[[str], None] = None
+    ) -> Dict[str, Any]:
+        """Request num_samples chat completions of one prompt, streaming a single one to on_text"""
+        
+        payload = {
+            'model': self.model_name,
+            'messages': [
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': user_prompt}
+            ],
+            'max_tokens': max_new_tokens,
+            'temperature': TEMPERATURE,
+            'top_p': TOP_P
+        }
+        
+        if json_max_chapters is not None:
+            payload['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {'name': 'chapters', 'schema': chapter_json_schema(json_max_chapters)}
+            }
+        
+        texts = []
+        tokens_generated = 0
+        prefill_tokens_saved = 0
+        
+        # Servers that ignore n (llama.cpp) return one choice per request, so ask again for the rest
+        while len(texts) < num_samples:
+            if on_text is not None:
+                data = self._post_streaming('/v1/chat/completions', payload, on_text)
+            else:
+                data = self._post('/v1/chat/completions', {**payload, 'n': num_samples - len(texts)})
+            if not data.get('choices'):
+                raise ValueError("LLM server returned no choices")
+            
+            texts.extend(choice['message'].get('content') or '' for choice in data['choices'])
+            
+            usage = data.get('usage') or {}
+            tokens_generated += usage.get('completion_tokens', 0)
+            
+            # Prompt tokens served from the server's prefix cache (vLLM/OpenAI usage, llama.cpp timings)
+            prefill_tokens_saved += (
+                (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+                or (data.get('timings') or {}).get('cache_n')
+                or 0
+            )
+        
+        return {
+            'text': texts[0],
+            'samples': texts[:num_samples],
+            'llm_tokens_generated': tokens_generated,
+            'llm_prefill_tokens_saved': prefill_tokens_saved
+        }
+    
+    def _tokenize(self, text: str) -> List[Any]:
+        """Tokens of a text (request fields of both llama.cpp and vLLM are sent)"""
+        
+        data = self._post('/tokenize', {
+            'model': self.model_name,
+            'content': text,
+            'prompt': text,
+            'add_special': False,
+            'add_special_tokens': False
+        })
+        return data['tokens']
+    
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST JSON to the server within the process-wide concurrency limit"""
+        
+        session, semaphore = self._get_session()
+        headers = {'Authorization': f"Bearer {self.api_key}"} if self.api_key else None
+        
+        with semaphore:
+            response = session.post(f"{self.base_url}{path}", json=payload, headers=headers, timeout=self.timeout)
+        
+        response.raise_for_status()
+        return response.json()
+    
+    def _post_streaming(self, path: str, payload: Dict[str, Any], on_text: Callable[[str], None]) -> Dict[str, Any]:
+        """
+        POST a streaming chat completion and report the text of every server-sent event
+        
+        Returns:
+            The events combined into the shape of a non-streaming response
+        """
+        
+        session, semaphore = self._get_session()
+        headers = {'Authorization': f"Bearer {self.api_key}"} if self.api_key else None
+        payload = {**payload, 'stream': True, 'stream_options': {'include_usage': True}}
+        
+        texts = []
+        data: Dict[str, Any] = {}
+        
+        with semaphore:
+            with session.post(
+                f"{self.base_url}{path}", json=payload, headers=headers, timeout=self.timeout, stream=True
+            ) as response:
+                response.raise_for_status()
+                
+                for line in response.iter_lines():
+                    if not line.startswith(b'data:'):
+                        continue
+                    event = line[len(b'data:'):].strip()
+                    if event == b'[DONE]':
+                        break
+                    
+                    event = json.loads(event)
+                    for choice in event.get('choices') or []:
+                        text = (choice.get('delta') or {}).get('content')
+                        if text:
+                            texts.append(text)
+                            on_text(text)
+                    
+                    # Usage and timings arrive with the last events
+                    for key in ('usage', 'timings'):
+                        if event.get(key):
+                            data[key] = event[key]
+        
+        # Servers that report no usage send roughly one token per event
+        data.setdefault('usage', {'completion_tokens': len(texts)})
+        data['choices'] = [{'message': {'role': 'assistant', 'content': ''.join(texts)}}]
+        return data
+    
+    def _get_session(self) -> Tuple[requests.Session, BoundedSemaphore]:
+        """Keep-alive session and concurrency semaphore shared by every client of this server"""
+        
+        with self._sessions_lock:
+            if self.base_url not in self._sessions:
+                session = requests.Session()
+                
+                # Only connection failures are retried; a POST that reached the server is not repeated
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.max_concurrency,
+                    max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.2)
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                
+                self._sessions[self.base_url] = (session, BoundedSemaphore(self.max_concurrency))
+                logger.info(
+                    f"LLM server client for {self.base_url} initialized "
+                    f"(max_concurrency={self.max_concurrency}, timeout={self.timeout})"
+                )
+            return self._sessions[self.base_url]
+
+def create_backend(name: str, model_name: str, max_input_tokens: int, draft_model_name: str = None) -> LLMBackend:
+    """
+    Create an LLM backend by name
+    
+    Args:
+        name: 'transformers' (in-process model), 'ctranslate2' (in-process int8 model for CPU)
+            or 'openai' (OpenAI-compatible server)
+        model_name: Model to load, or to request from the server
+        max_input_tokens: Prompt token limit of the in-process model
+        draft_model_name: Draft model for speculative decoding (transformers backend only)
+    
+    Returns:
+        LLM backend instance
+    """
+    
+    if draft_model_name and name != 'transformers':
+        logger.warning(f"Draft model {draft_model_name} is ignored by the {name} backend")
+    
+    if name == 'transformers':
+        return TransformersBackend(model_name, max_input_tokens, draft_model_name)
+    if name == 'ctranslate2':
+        return CTranslate2Backend(model_name, max_input_tokens)
+    if name == 'openai':
+        return OpenAICompatibleBackend(model_name)
+    raise ValueError(f"Unknown LLM backend: {name} (expected 'transformers', 'ctranslate2' or 'openai')")
@@ -0,0 +1,168 @@
+"""
+Cross-job batched LLM generation queue
+"""
+
+import os
+import time
+import queue
+import logging
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import partial
+from threading import Lock, Thread
+from typing import List, Dict, Any, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class GenerationRequest:
+    """One chapter prompt waiting to be generated"""
+    
+    user_prompt: str
+    batch_key: Hashable
+    generate: Callable[[List[str]], List[Dict[str, Any]]]
+    stream: Optional[Callable[[str], None]] = None
+    future: Future = field(default_factory=Future)
+
+class LLMBatchScheduler:
+    """
+    Singleton queue that batches chapter prompts across concurrent jobs
+    
+    Callers submit single prompts; a background thread collects up to
+    LLM_BATCH_SIZE of them (waiting at most LLM_BATCH_MAX_WAIT_MS for the
+    batch to fill) and runs them as one left-padded generate() call. Only
+    requests with the same batch key (model, prompt settings and token budget)
+    share a batch, and the batch is run by the generate callable of its first
+    request, so any model that takes a list of prompts works, including stubs.
+    Batching across jobs requires tasks to share a process, e.g. a Celery
+    worker started with the threads pool.
+    """
+    
+    _instance = None
+    _lock = Lock()
+    
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(LLMBatchScheduler, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        
+        self.batch_size = int(os.getenv('LLM_BATCH_SIZE', '8'))
+        self.max_wait_ms = float(os.getenv('LLM_BATCH_MAX_WAIT_MS', '50'))
+        self._queue: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self._thread = None
+        self._thread_lock = Lock()
+        self._initialized = True
+        
+        logger.info(
+            f"LLMBatchScheduler initialized (batch_size={self.batch_size}, "
+            f"max_wait_ms={self.max_wait_ms})"
+        )
+    
+    def configure(self, batch_size: int = None, max_wait_ms: float = None):
+        """Adjust the latency/throughput trade-off at runtime"""
+        
+        if batch_size is not None:
+            if batch_size <= 0:
+                raise ValueError("batch_size must be a positive integer")
+            self.batch_size = batch_size
+        
+        if max_wait_ms is not None:
+            if max_wait_ms < 0:
+                raise ValueError("max_wait_ms must not be negative")
+            self.max_wait_ms = max_wait_ms
+    
+    def submit(self, request: GenerationRequest) -> Future:
+        """Queue a prompt for generation and return a future for its result"""
+        
+        self._ensure_running()
+        self._queue.put(request)
+        return request.future
+    
+    def generate(
+        self,
+        user_prompts: List[str],
+        batch_key: Hashable,
+        generate: Callable[[List[str]], List[Dict[str, Any]]],
+        streams: List[Optional[Callable[[str], None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate responses for one caller's prompts through the shared queue
+        
+        Args:
+            user_prompts: Prompts to generate
+            batch_key: Requests with equal keys may share a generate() call
+            generate: Runs a list of prompts and returns one result per prompt
+            streams: Per prompt, a function called from the batching thread with the new
+                text of its response as it is generated (None entries are not streamed)
+        
+        Returns:
+            Results in prompt order
+        """
+        
+        streams = streams or [None] * len(user_prompts)
+        futures = [
+            self.submit(GenerationRequest(
+                user_prompt=user_prompt, batch_key=batch_key, generate=generate, stream=stream
+            ))
+            for user_prompt, stream in zip(user_prompts, streams)
+        ]
+        return [future.result() for future in futures]
+    
+    def _route_stream(self, requests: List[GenerationRequest], index: int, text: str):
+        """Hand streamed text of a batch row to the request it belongs to"""
+        
+        if requests[index].stream is not None:
+            requests[index].stream(text)
+    
+    def _ensure_running(self):
+        """Start the batching thread on first use"""
+        
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name='llm-batch-scheduler', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        """Collect prompts into batches and generate them until the process exits"""
+        
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            groups: Dict[Hashable, List[GenerationRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.batch_key, []).append(request)
+            
+            for requests in groups.values():
+                try:
+                    prompts = [request.user_prompt for request in requests]
+                    if any(request.stream for request in requests):
+                        outputs = requests[0].generate(prompts, stream_callback=partial(self._route_stream, requests))
+                    else:
+                        outputs = requests[0].generate(prompts)
+                    for request, output in zip(requests, outputs):
+                        request.future.set_result(output)
+                except Exception as e:
+                    logger.error(f"Batched LLM generation failed: {str(e)}")
+                    for request in requests:
+                        if not request.future.done():
+                            request.future.set_exception(e)
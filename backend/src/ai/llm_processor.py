@@ -2,33 +2,114 @@
 LLM processor for generating video chapters using Llama model
 """
 
+import os
 import re
 import json
+import math
+import time
+import queue
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-import torch
+import statistics
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import List, Dict, Any, Optional, Callable, Tuple
 
-from .model_manager import ModelManager
+from .speech_index import SpeechIndex
+from .chapter_grammar import ChapterStreamParser
+from .llm_backends import LLMBackend, create_backend
+from .llm_batch_scheduler import LLMBatchScheduler
 
 logger = logging.getLogger(__name__)
 
+# Matches the [HH:MM:SS] prefix of a formatted transcript line
+LINE_TIMESTAMP_PATTERN = re.compile(r'^\[(\d{1,2}:\d{2}:\d{2})\]')
+
+# Token budget of a chapter JSON response: the wrapper plus one entry per chapter
+RESPONSE_BASE_TOKENS = 32
+RESPONSE_TOKENS_PER_CHAPTER = 48
+
+# Token budget of a title-only response ({"title": "..."})
+TITLE_RESPONSE_TOKENS = 32
+
+# How often a job thread waiting on a streamed generation checks whether it has finished
+STREAM_POLL_SECONDS = 0.05
+
+# Per-generation counts of assisted (speculative) decoding, summed over a run
+SPECULATION_KEYS = (
+    'llm_draft_tokens_proposed',
+    'llm_draft_tokens_accepted',
+    'llm_speculative_seconds',
+    'llm_speculative_baseline_seconds'
+)
+
 class LLMProcessor:
     """Handles chapter generation using Llama LLM"""
     
     def __init__(self, model_name: str = "meta-llama/Llama-3.1-8B-Instruct"):
-        self.model_manager = ModelManager()
         self.model_name = model_name
-        self._model_info = None
+        
+        # Where generation runs: 'transformers' (model loaded in this process), 'ctranslate2'
+        # (int8 model loaded in this process, for CPU-only workers) or 'openai'
+        # (OpenAI-compatible server on the node, shared by all workers)
+        self.backend_name = os.getenv('LLM_BACKEND', 'transformers')
+        self._backend = None
+        
+        # Largest move (seconds) of a chapter start onto the nearest pause in speech
+        self.boundary_snap_seconds = float(os.getenv('CHAPTER_BOUNDARY_SNAP_SECONDS', '5'))
+        
+        # Context budget: prompts longer than max_input_tokens are chaptered in overlapping windows
+        # ('auto'), or always/never with 'windowed'/'single'
+        self.chaptering_mode = os.getenv('LLM_CHAPTERING_MODE', 'auto')
+        self.max_input_tokens = int(os.getenv('LLM_MAX_INPUT_TOKENS', '4096'))
+        self.window_overlap_tokens = int(os.getenv('LLM_WINDOW_OVERLAP_TOKENS', '256'))
+        self.window_batch_size = int(os.getenv('LLM_WINDOW_BATCH_SIZE', '4'))
+        
+        # Upper bound on generated tokens; responses are budgeted from max_chapters below it
+        self.max_new_tokens = int(os.getenv('LLM_MAX_NEW_TOKENS', '1024'))
+        
+        # Mask tokens that cannot continue the chapter JSON, so every response parses
+        self.constrained_decoding = os.getenv('LLM_CONSTRAINED_DECODING', 'true').lower() == 'true'
+        
+        # Send prompts through the worker-wide queue that batches them across concurrent jobs
+        self.batch_queue_enabled = os.getenv('LLM_BATCH_QUEUE_ENABLED', 'false').lower() == 'true'
+        
+        # Self-consistency: draw this many samples in one call and vote on their boundaries
+        # (1 keeps sequential retries); boundaries within the tolerance count as the same vote
+        self.vote_samples = int(os.getenv('LLM_VOTE_SAMPLES', '1'))
+        self.vote_tolerance_seconds = float(os.getenv('LLM_VOTE_TOLERANCE_SECONDS', '15'))
+        
+        # Speculative decoding: small model with the main model's tokenizer that proposes tokens
+        # for it to verify (e.g. meta-llama/Llama-3.2-1B-Instruct); transformers backend only.
+        # Batched prompts and samples decode without it
+        self.draft_model_name = os.getenv('LLM_DRAFT_MODEL') or None
+        
+        # Report each chapter through progress_callback as soon as the model has written it
+        self.stream_chapters = os.getenv('LLM_STREAM_CHAPTERS', 'true').lower() == 'true'
+        
+        # Transcript tokens each chapter contributes to its prompt in a title-only pass
+        self.title_slice_tokens = int(os.getenv('LLM_TITLE_SLICE_TOKENS', '512'))
+        
+        # Metrics describing the last generate_chapters() run (merged into job metadata)
+        self.run_metadata: Dict[str, Any] = {}
         
         # Chapter generation prompts
         self.system_prompt = self._get_system_prompt()
         self.chapter_prompt_template = self._get_chapter_prompt_template()
+        self.window_prompt_template = self._get_window_prompt_template()
+        self.title_system_prompt = self._get_title_system_prompt()
+        self.title_prompt_template = self._get_title_prompt_template()
+        
+        # Transcript lines repeat across windows and retries, so their token counts are cached
+        self._count_tokens = lru_cache(maxsize=65536)(self._count_tokens_uncached)
     
-    def _get_model(self) -> Dict[str, Any]:
-        """Get or load the LLM model"""
-        if self._model_info is None:
-            self._model_info = self.model_manager.get_llm_model(self.model_name)
-        return self._model_info
+    def _get_backend(self) -> LLMBackend:
+        """Get or create the inference backend"""
+        if self._backend is None:
+            self._backend = create_backend(
+                self.backend_name, self.model_name, self.max_input_tokens, self.draft_model_name
+            )
+        return self._backend
     
     def _get_system_prompt(self) -> str:
         """Get the system prompt for chapter generation"""
@@ -66,6 +147,46 @@ Transcript:
 
 Please create meaningful chapters for this video. Consider content flow, topic changes, and natural breaks. Respond with JSON format only."""
     
+    def _get_window_prompt_template(self) -> str:
+        """Get the prompt template for chaptering one window of a long transcript"""
+        return """Analyze the following excerpt of a longer video transcript and propose chapter divisions within it. The transcript includes timestamps in [HH:MM:SS] format.
+
+Video Information:
+- Duration: {duration} seconds ({duration_formatted})
+- Excerpt: part {window_number} of {window_count}, covering {window_start} to {window_end}
+
+Transcript excerpt:
+{transcript}
+
+Only propose chapters that start inside this excerpt, at most {max_chapters}. Consider content flow, topic changes, and natural breaks. Respond with JSON format only."""
+    
+    def _get_title_system_prompt(self) -> str:
+        """Get the system prompt for title-only generation"""
+        return """You are an expert video content analyzer specializing in writing chapter titles for videos. Your task is to read the transcript of one chapter and give it a descriptive title.
+
+Guidelines:
+1. Summarize the main topic of the chapter in 2-8 words
+2. Use clear, descriptive wording without timestamps or chapter numbers
+3. Respond ONLY with valid JSON format
+
+Output format:
+{
+  "title": "Chapter Title"
+}"""
+    
+    def _get_title_prompt_template(self) -> str:
+        """Get the prompt template for titling one chapter"""
+        return """Write a title for the following chapter of a video.
+
+Chapter Information:
+- Chapter {chapter_number} of {chapter_count}, covering {chapter_start} to {chapter_end}
+- Video duration: {duration_formatted}
+
+Chapter transcript:
+{transcript}
+
+Respond with JSON format only."""
+    
     def generate_chapters(
         self,
         transcript: str,
@@ -73,31 +194,56 @@ Please create meaningful chapters for this video. Consider content flow, topic c
         segment_count: int,
         max_chapters: int = 15,
         min_chapter_length: float = 30.0,
-        progress_callback: callable = None
+        progress_callback: callable = None,
+        speech_index: SpeechIndex = None,
+        chaptering_mode: str = None,
+        vote_samples: int = None
     ) -> List[Dict[str, Any]]:
         """
         Generate chapters from transcript using LLM
         
+        Transcripts whose prompt does not fit in max_input_tokens are split into
+        overlapping windows that are chaptered independently (map) and merged
+        into one chapter list (reduce), instead of being truncated.
+        
         Args:
             transcript: Formatted transcript with timestamps
             video_duration: Total video duration in seconds
             segment_count: Number of transcript segments
             max_chapters: Maximum number of chapters to generate
             min_chapter_length: Minimum chapter length in seconds
-            progress_callback: Function to call with progress updates
+            progress_callback: Function to call with progress updates; in single mode it is
+                also called with a chapters keyword holding the chapters generated so far
+                whenever the model finishes writing one
+            speech_index: Speech index of the video audio, used to place boundaries in pauses
+            chaptering_mode: 'auto', 'single' or 'windowed' (defaults to LLM_CHAPTERING_MODE)
+            vote_samples: Samples drawn in one call and fused by voting, 1 for sequential
+                retries (defaults to LLM_VOTE_SAMPLES); single mode only
             
         Returns:
             List of chapter dictionaries with start_time, title, and confidence
         """
         
+        self.run_metadata = {
+            'llm_backend': self.backend_name,
+            'llm_constrained_decoding': self.constrained_decoding and self._get_backend().supports_constrained_decoding,
+            'llm_generation_attempts': 0,
+            'llm_generation_retries': 0,
+            'llm_parse_failures': 0,
+            'llm_prefill_tokens_saved': 0,
+            'llm_tokens_generated': 0,
+            'llm_batch_queue': self.batch_queue_enabled
+        }
+        started = time.perf_counter()
+        
         try:
             if progress_callback:
                 progress_callback(10, "Loading language model")
             
-            model_info = self._get_model()
-            model = model_info['model']
-            tokenizer = model_info['tokenizer']
-            device = model_info['device']
+            self._get_backend().load()
+            
+            # Known after loading, since a draft that cannot assist the model is dropped
+            self.run_metadata['llm_draft_model'] = self._get_backend().draft_model_name
             
             if progress_callback:
                 progress_callback(30, "Preparing chapter generation prompt")
@@ -113,20 +259,39 @@ Please create meaningful chapters for this video. Consider content flow, topic c
                 transcript=transcript
             )
             
+            mode = chaptering_mode or self.chaptering_mode
+            prompt_tokens = self._count_tokens(user_prompt)
+            if mode == 'auto':
+                mode = 'windowed' if prompt_tokens > self.max_input_tokens else 'single'
+            
+            self.run_metadata.update({'chaptering_mode': mode, 'llm_prompt_tokens': prompt_tokens})
+            
             if progress_callback:
                 progress_callback(50, "Generating chapters with AI model")
             
             # Generate chapters
-            chapters = self._generate_with_retry(
-                model, tokenizer, device, user_prompt, max_chapters, min_chapter_length
-            )
+            if mode == 'windowed':
+                chapters = self._generate_windowed(
+                    transcript, video_duration, max_chapters, min_chapter_length, progress_callback
+                )
+            elif (vote_samples or self.vote_samples) > 1:
+                chapters = self._generate_with_voting(
+                    user_prompt, max_chapters, min_chapter_length, vote_samples or self.vote_samples
+                )
+            else:
+                on_chapters = None
+                if progress_callback and self.stream_chapters:
+                    on_chapters = partial(self._report_partial_chapters, progress_callback, video_duration, started)
+                chapters = self._generate_with_retry(
+                    user_prompt, max_chapters, min_chapter_length, on_chapters=on_chapters
+                )
             
             if progress_callback:
                 progress_callback(80, "Processing generated chapters")
             
             # Validate and process chapters
             validated_chapters = self._validate_and_process_chapters(
-                chapters, video_duration, min_chapter_length
+                chapters, video_duration, min_chapter_length, speech_index
             )
             
             if progress_callback:
@@ -139,63 +304,151 @@ Please create meaningful chapters for this video. Consider content flow, topic c
             logger.error(f"Chapter generation failed: {str(e)}")
             raise
     
+    def generate_titles(
+        self,
+        boundaries: List[float],
+        transcript_slices: List[str],
+        video_duration: float,
+        progress_callback: callable = None,
+        fallback_titles: List[str] = None,
+        max_retries: int = 2
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate titles for chapters whose boundaries come from elsewhere
+        
+        Boundaries from a cheaper source (manual chapters, scene changes, topic
+        segmentation) only need titles, so each chapter gets a short prompt with
+        its own transcript slice and all of them are generated in one batched
+        call instead of one long generation over the whole transcript.
+        
+        Args:
+            boundaries: Chapter start times in seconds, in ascending order
+            transcript_slices: Transcript text of each chapter
+            video_duration: Total video duration in seconds
+            progress_callback: Function to call with progress updates
+            fallback_titles: Titles kept for chapters that get none (defaults to "Chapter N")
+            max_retries: Batched rounds for chapters whose response did not parse
+            
+        Returns:
+            List of chapter dictionaries with start_time, title, and confidence
+        """
+        
+        if len(boundaries) != len(transcript_slices):
+            raise ValueError("boundaries and transcript_slices must have the same length")
+        
+        self.run_metadata = {
+            'chaptering_mode': 'titles',
+            'llm_backend': self.backend_name,
+            'llm_constrained_decoding': False,
+            'llm_generation_attempts': 0,
+            'llm_generation_retries': 0,
+            'llm_parse_failures': 0,
+            'llm_prefill_tokens_saved': 0,
+            'llm_tokens_generated': 0,
+            'llm_batch_queue': self.batch_queue_enabled
+        }
+        
+        try:
+            if progress_callback:
+                progress_callback(10, "Loading language model")
+            
+            self._get_backend().load()
+            
+            # Known after loading, since a draft that cannot assist the model is dropped
+            self.run_metadata['llm_draft_model'] = self._get_backend().draft_model_name
+            
+            if progress_callback:
+                progress_callback(30, "Preparing chapter title prompts")
+            
+            prompts = {}
+            for i, (start, text) in enumerate(zip(boundaries, transcript_slices)):
+                if not text.strip():
+                    continue  # Nothing to title from; keeps its fallback title
+                
+                end = boundaries[i + 1] if i + 1 < len(boundaries) else video_duration
+                prompts[i] = self.title_prompt_template.format(
+                    chapter_number=i + 1,
+                    chapter_count=len(boundaries),
+                    chapter_start=self._format_duration(start),
+                    chapter_end=self._format_duration(end),
+                    duration_formatted=self._format_duration(video_duration),
+                    transcript=self._get_backend().truncate_to_tokens(text.strip(), self.title_slice_tokens)
+                )
+            
+            self.run_metadata['llm_prompt_tokens'] = sum(self._count_tokens(prompt) for prompt in prompts.values())
+            
+            if progress_callback:
+                progress_callback(50, f"Generating {len(prompts)} chapter titles")
+            
+            titles: Dict[int, str] = {}
+            pending = sorted(prompts)
+            for attempt in range(max_retries):
+                if not pending:
+                    break
+                
+                logger.info(f"Title generation attempt {attempt + 1}: {len(pending)} chapters")
+                self._record_attempts(len(pending), retry=attempt > 0)
+                
+                responses = self._generate_batch(
+                    [prompts[i] for i in pending],
+                    max_new_tokens=TITLE_RESPONSE_TOKENS,
+                    system_prompt=self.title_system_prompt
+                )
+                
+                for i, response in zip(pending, responses):
+                    title = self._parse_title_response(response)
+                    if title:
+                        titles[i] = title
+                    else:
+                        self.run_metadata['llm_parse_failures'] += 1
+                
+                pending = [i for i in pending if i not in titles]
+            
+            if pending:
+                logger.warning(f"{len(pending)} chapters got no title, keeping fallback titles")
+            
+            chapters = [
+                {
+                    'start_time': float(start),
+                    'title': titles.get(i) or (fallback_titles[i] if fallback_titles else f"Chapter {i + 1}"),
+                    'confidence': 1.0 if i in titles else 0.5
+                }
+                for i, start in enumerate(boundaries)
+            ]
+            
+            if progress_callback:
+                progress_callback(100, f"Generated {len(titles)} chapter titles")
+            
+            logger.info(f"Successfully generated {len(titles)} titles for {len(boundaries)} chapters")
+            return chapters
+            
+        except Exception as e:
+            logger.error(f"Title generation failed: {str(e)}")
+            raise
+    
     def _generate_with_retry(
         self,
-        model,
-        tokenizer,
-        device: str,
         user_prompt: str,
         max_chapters: int,
         min_chapter_length: float,
-        max_retries: int = 3
+        max_retries: int = 3,
+        on_chapters: Callable[[List[Dict[str, Any]]], None] = None
     ) -> List[Dict[str, Any]]:
-        """Generate chapters with retry logic for better results"""
+        """Generate chapters with retry logic for better results, streaming each attempt to on_chapters"""
         
         for attempt in range(max_retries):
             try:
                 logger.info(f"Chapter generation attempt {attempt + 1}")
+                self._record_attempts(1, retry=attempt > 0)
                 
-                # Create messages for chat format
-                messages = [
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-                
-                # Apply chat template
-                prompt = tokenizer.apply_chat_template(
-                    messages, 
-                    tokenize=False, 
-                    add_generation_prompt=True
-                )
-                
-                # Tokenize input
-                inputs = tokenizer(
-                    prompt,
-                    return_tensors="pt",
-                    truncation=True,
-                    max_length=4096  # Limit context length
-                ).to(device)
-                
-                # Generate response
-                with torch.no_grad():
-                    outputs = model.generate(
-                        **inputs,
-                        max_new_tokens=1024,
-                        temperature=0.3,  # Lower temperature for more consistent output
-                        top_p=0.9,
-                        do_sample=True,
-                        pad_token_id=tokenizer.eos_token_id,
-                        eos_token_id=tokenizer.eos_token_id
-                    )
-                
-                # Decode response
-                response = tokenizer.decode(
-                    outputs[0][inputs['input_ids'].shape[1]:], 
-                    skip_special_tokens=True
-                )
+                # Every attempt streams its own chapters from the first one again
+                streams = [self._chapter_stream(on_chapters)] if on_chapters else None
+                response = self._generate_batch([user_prompt], max_chapters=max_chapters, streams=streams)[0]
                 
                 # Parse JSON response
                 chapters = self._parse_chapter_response(response)
+                if not chapters:
+                    self.run_metadata['llm_parse_failures'] += 1
                 
                 if chapters:
                     logger.info(f"Successfully parsed {len(chapters)} chapters on attempt {attempt + 1}")
@@ -212,6 +465,516 @@ Please create meaningful chapters for this video. Consider content flow, topic c
         logger.warning("All generation attempts failed, creating fallback chapters")
         return self._create_fallback_chapters(max_chapters, min_chapter_length)
     
+    def _generate_with_voting(
+        self,
+        user_prompt: str,
+        max_chapters: int,
+        min_chapter_length: float,
+        num_samples: int,
+        max_retries: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Draw several responses in one generate() call and fuse their chapters by voting"""
+        
+        self.run_metadata['llm_vote_samples'] = num_samples
+        
+        for attempt in range(max_retries):
+            try:
+                logger.info(f"Self-consistency attempt {attempt + 1}: {num_samples} samples")
+                self._record_attempts(num_samples, retry=attempt > 0)
+                
+                responses = self._generate_batch(
+                    [user_prompt], max_chapters=max_chapters, num_samples=num_samples
+                )[0]
+                
+                samples = [self._parse_chapter_response(response) for response in responses]
+                samples = [chapters for chapters in samples if chapters]
+                self.run_metadata['llm_parse_failures'] += num_samples - len(samples)
+                
+                if samples:
+                    return self._fuse_samples(samples, max_chapters)
+                else:
+                    logger.warning(f"No sample parsed on self-consistency attempt {attempt + 1}")
+                    
+            except Exception as e:
+                logger.warning(f"Self-consistency attempt {attempt + 1} failed: {str(e)}")
+                if attempt == max_retries - 1:
+                    raise
+        
+        logger.warning("All self-consistency attempts failed, creating fallback chapters")
+        return self._create_fallback_chapters(max_chapters, min_chapter_length)
+    
+    def _fuse_samples(self, samples: List[List[Dict[str, Any]]], max_chapters: int) -> List[Dict[str, Any]]:
+        """
+        Fuse the chapter lists of several samples into one by majority vote
+        
+        Boundaries of all samples are clustered in time, joining boundaries less
+        than vote_tolerance_seconds apart. Each sample casts at most one vote per
+        cluster, and clusters backed by a majority of the samples become
+        chapters at the median of their boundaries, with the most frequent
+        title and the average confidence of the votes.
+        
+        Args:
+            samples: Parsed chapter lists, one per sample that parsed
+            max_chapters: Maximum number of chapters to keep
+        
+        Returns:
+            Fused list of chapter dictionaries
+        """
+        
+        votes = sorted(
+            ((sample, chapter) for sample, chapters in enumerate(samples) for chapter in chapters),
+            key=lambda vote: vote[1]['start_time']
+        )
+        
+        clusters: List[List[Tuple[int, Dict[str, Any]]]] = []
+        for vote in votes:
+            if clusters and vote[1]['start_time'] - clusters[-1][-1][1]['start_time'] <= self.vote_tolerance_seconds:
+                clusters[-1].append(vote)
+            else:
+                clusters.append([vote])
+        
+        quorum = len(samples) // 2 + 1
+        fused = []
+        for cluster in clusters:
+            # A sample proposing two boundaries close together only votes with its more confident one
+            ballots: Dict[int, Dict[str, Any]] = {}
+            for sample, chapter in cluster:
+                if sample not in ballots or chapter['confidence'] > ballots[sample]['confidence']:
+                    ballots[sample] = chapter
+            if len(ballots) < quorum:
+                continue
+            
+            members = list(ballots.values())
+            title_votes = Counter(member['title'] for member in members)
+            fused.append({
+                'start_time': float(statistics.median(member['start_time'] for member in members)),
+                'title': max(members, key=lambda member: (title_votes[member['title']], member['confidence']))['title'],
+                'confidence': round(statistics.mean(member['confidence'] for member in members), 3),
+                'support': len(ballots)
+            })
+        
+        if not fused:
+            # No boundary won a majority, so trust the single most confident sample
+            logger.warning("Samples agreed on no boundary, keeping the most confident sample")
+            best = max(samples, key=lambda chapters: statistics.mean(ch['confidence'] for ch in chapters))
+            fused = [{**chapter, 'support': 1} for chapter in best]
+        
+        if len(fused) > max_chapters:
+            fused = sorted(fused, key=lambda ch: (ch['support'], ch['confidence']), reverse=True)[:max_chapters]
+            fused.sort(key=lambda ch: ch['start_time'])
+        
+        self.run_metadata.update({
+            'llm_vote_valid_samples': len(samples),
+            'llm_vote_agreement': round(statistics.mean(ch['support'] for ch in fused) / len(samples), 3)
+        })
+        
+        logger.info(
+            f"Fused {len(votes)} boundaries from {len(samples)} samples into {len(fused)} chapters"
+        )
+        return [{key: value for key, value in chapter.items() if key != 'support'} for chapter in fused]
+    
+    def _generate_batch(
+        self,
+        user_prompts: List[str],
+        max_new_tokens: int = None,
+        max_chapters: int = None,
+        system_prompt: str = None,
+        num_samples: int = 1,
+        streams: List[Optional[Callable[[str], None]]] = None
+    ) -> List[Any]:
+        """
+        Generate responses for user prompts, directly or through the shared batch queue
+        
+        Returns one response per prompt, or a list of num_samples responses per
+        prompt when sampling several. streams optionally holds, per prompt, a
+        function that receives the response text as it is generated; it is
+        called on this thread.
+        """
+        
+        if max_new_tokens is None:
+            max_new_tokens = self._response_token_budget(max_chapters)
+        self.run_metadata['llm_max_new_tokens'] = max_new_tokens
+        
+        backend = self._get_backend()
+        system_prompt = system_prompt or self.system_prompt
+        json_max_chapters = max_chapters if self.constrained_decoding else None
+        
+        generate = partial(
+            backend.generate,
+            system_prompt=system_prompt,
+            max_new_tokens=max_new_tokens,
+            json_max_chapters=json_max_chapters,
+            num_samples=num_samples
+        )
+        
+        # Prompts only share a batch when they would be generated identically
+        batch_key = (backend.batch_key, system_prompt, max_new_tokens, json_max_chapters, num_samples)
+        
+        if streams and any(streams) and num_samples == 1:
+            results = self._run_streaming(user_prompts, batch_key, generate, streams)
+        elif self.batch_queue_enabled:
+            results = LLMBatchScheduler().generate(user_prompts, batch_key, generate)
+        else:
+            results = generate(user_prompts)
+        
+        for result in results:
+            for key in ('llm_tokens_generated', 'llm_prefill_tokens_saved'):
+                self.run_metadata[key] = self.run_metadata.get(key, 0) + result[key]
+            self.run_metadata['llm_max_batch_size'] = max(
+                self.run_metadata.get('llm_max_batch_size', 0), result['batch_size']
+            )
+            for key in SPECULATION_KEYS:
+                if key in result:
+                    self.run_metadata[key] = self.run_metadata.get(key, 0) + result[key]
+        
+        self._record_speculation()
+        
+        if num_samples > 1:
+            return [result['samples'] for result in results]
+        return [result['text'] for result in results]
+    
+    def _run_streaming(
+        self,
+        user_prompts: List[str],
+        batch_key: Tuple,
+        generate: Callable[..., List[Dict[str, Any]]],
+        streams: List[Optional[Callable[[str], None]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate on a helper thread and hand streamed text to the streams on this thread
+        
+        Runtimes and the batch queue report text from their own threads, while
+        the streams report progress through the job's database session, so the
+        text is passed over through a queue.
+        """
+        
+        events: "queue.Queue[Tuple[int, str]]" = queue.Queue()
+        
+        def put(index: int, text: str):
+            events.put((index, text))
+        
+        def run() -> List[Dict[str, Any]]:
+            if self.batch_queue_enabled:
+                forward = [partial(put, index) for index in range(len(user_prompts))]
+                return LLMBatchScheduler().generate(user_prompts, batch_key, generate, streams=forward)
+            return generate(user_prompts, stream_callback=put)
+        
+        def deliver(index: int, text: str):
+            if streams[index] is None:
+                return
+            try:
+                streams[index](text)
+            except Exception as e:
+                logger.warning(f"Streaming generated text failed: {str(e)}")
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm-stream') as executor:
+            future = executor.submit(run)
+            while not future.done():
+                try:
+                    deliver(*events.get(timeout=STREAM_POLL_SECONDS))
+                except queue.Empty:
+                    pass
+        
+        while not events.empty():
+            deliver(*events.get_nowait())
+        
+        return future.result()
+    
+    def _chapter_stream(self, on_chapters: Callable[[List[Dict[str, Any]]], None]) -> Callable[[str], None]:
+        """Stream consumer that parses a chapter response and reports its chapters so far as each one closes"""
+        
+        parser = ChapterStreamParser()
+        reported = 0
+        
+        def consume(text: str):
+            nonlocal reported
+            if not parser.feed(text):
+                return
+            
+            chapters = [chapter for chapter in map(self._chapter_from_json, parser.chapters) if chapter]
+            if len(chapters) > reported:
+                reported = len(chapters)
+                on_chapters(chapters)
+        
+        return consume
+    
+    def _report_partial_chapters(
+        self,
+        progress_callback: Callable,
+        video_duration: float,
+        started: float,
+        chapters: List[Dict[str, Any]]
+    ):
+        """Send the chapters streamed so far through progress_callback"""
+        
+        chapters = [chapter for chapter in chapters if chapter['start_time'] < video_duration]
+        if not chapters:
+            return
+        
+        self.run_metadata.setdefault('llm_first_chapter_seconds', round(time.perf_counter() - started, 3))
+        
+        # Chapters are written in time order, so the latest start shows how far the response has got
+        progress = 50 + 30 * min(1.0, chapters[-1]['start_time'] / video_duration) if video_duration else 50
+        progress_callback(progress, f"Generated chapter {len(chapters)}: {chapters[-1]['title']}", chapters=chapters)
+    
+    def _record_speculation(self):
+        """Derive the draft acceptance rate and estimated speedup from the totals of assisted generations"""
+        
+        proposed = self.run_metadata.get('llm_draft_tokens_proposed')
+        if proposed:
+            self.run_metadata['llm_speculative_acceptance_rate'] = round(
+                self.run_metadata['llm_draft_tokens_accepted'] / proposed, 3
+            )
+        
+        seconds = self.run_metadata.get('llm_speculative_seconds')
+        if seconds:
+            self.run_metadata['llm_speculative_speedup'] = round(
+                self.run_metadata['llm_speculative_baseline_seconds'] / seconds, 2
+            )
+    
+    def _response_token_budget(self, max_chapters: Optional[int]) -> int:
+        """max_new_tokens needed for a response with up to max_chapters chapters"""
+        
+        if max_chapters is None:
+            return self.max_new_tokens
+        return min(self.max_new_tokens, RESPONSE_BASE_TOKENS + RESPONSE_TOKENS_PER_CHAPTER * max_chapters)
+    
+    def _record_attempts(self, count: int, retry: bool):
+        """Count generations in the run metadata"""
+        
+        self.run_metadata['llm_generation_attempts'] += count
+        if retry:
+            self.run_metadata['llm_generation_retries'] += count
+    
+    def count_tokens(self, text: str) -> int:
+        """Number of LLM tokens in a text (cached per distinct text)"""
+        return self._count_tokens(text)
+    
+    def transcript_token_budget(self, video_duration: float, segment_count: int) -> int:
+        """
+        Tokens left for the transcript in a single chaptering prompt
+        
+        Args:
+            video_duration: Total video duration in seconds
+            segment_count: Number of transcript segments
+        
+        Returns:
+            max_input_tokens minus the tokens of the prompt around the transcript
+        """
+        
+        overhead = self._count_tokens(self.chapter_prompt_template.format(
+            duration=int(video_duration),
+            duration_formatted=self._format_duration(video_duration),
+            segment_count=segment_count,
+            transcript=''
+        ))
+        return max(0, self.max_input_tokens - overhead)
+    
+    def _count_tokens_uncached(self, text: str) -> int:
+        """Number of tokens the LLM tokenizer produces for a text"""
+        return self._get_backend().count_tokens(text)
+    
+    def _build_windows(self, transcript: str, video_duration: float) -> List[Dict[str, Any]]:
+        """
+        Split a formatted transcript into overlapping windows that fit the token budget
+        
+        Args:
+            transcript: Formatted transcript with one [HH:MM:SS] line per segment
+            video_duration: Total video duration in seconds
+        
+        Returns:
+            List of windows with transcript, start, end and tokens
+        """
+        
+        # Budget left for transcript lines once the window prompt itself is accounted for
+        overhead = self._count_tokens(self.window_prompt_template.format(
+            duration=int(video_duration),
+            duration_formatted=self._format_duration(video_duration),
+            window_number=0, window_count=0,
+            window_start='00:00:00', window_end='00:00:00',
+            max_chapters=0, transcript=''
+        ))
+        budget = self.max_input_tokens - overhead
+        if budget <= 0:
+            raise ValueError(
+                f"LLM_MAX_INPUT_TOKENS ({self.max_input_tokens}) leaves no room for transcript text"
+            )
+        overlap = min(self.window_overlap_tokens, budget // 4)
+        
+        lines = [line for line in transcript.split('\n') if line.strip()]
+        line_tokens = [self._count_tokens(line) + 1 for line in lines]  # +1 for the newline
+        
+        line_starts = []
+        last_start = 0.0
+        for line in lines:
+            match = LINE_TIMESTAMP_PATTERN.match(line)
+            if match:
+                last_start = self._parse_timestamp(match.group(1))
+            line_starts.append(last_start)
+        
+        windows = []
+        first = 0
+        while first < len(lines):
+            # Grow the window line by line (a single oversized line still gets its own window)
+            last = first
+            tokens = line_tokens[first]
+            while last + 1 < len(lines) and tokens + line_tokens[last + 1] <= budget:
+                last += 1
+                tokens += line_tokens[last]
+            
+            end = line_starts[last + 1] if last + 1 < len(lines) else video_duration
+            windows.append({
+                'transcript': '\n'.join(lines[first:last + 1]),
+                'start': line_starts[first],
+                'end': end,
+                'tokens': tokens
+            })
+            
+            if last + 1 >= len(lines):
+                break
+            
+            # Step back over the overlap so each boundary is seen with context on both sides
+            next_first = last + 1
+            overlap_tokens = 0
+            while next_first - 1 > first and overlap_tokens + line_tokens[next_first - 1] <= overlap:
+                next_first -= 1
+                overlap_tokens += line_tokens[next_first]
+            first = next_first
+        
+        return windows
+    
+    def _generate_windowed(
+        self,
+        transcript: str,
+        video_duration: float,
+        max_chapters: int,
+        min_chapter_length: float,
+        progress_callback: callable = None,
+        max_retries: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Chapter each transcript window (map) and merge the candidates (reduce)"""
+        
+        windows = self._build_windows(transcript, video_duration)
+        
+        # Spread the chapter budget over the windows, with headroom for the reduce step
+        chapters_per_window = max(2, math.ceil(2 * max_chapters / len(windows)))
+        
+        logger.info(
+            f"Chaptering transcript in {len(windows)} windows of up to {self.max_input_tokens} tokens "
+            f"(overlap {self.window_overlap_tokens})"
+        )
+        for number, window in enumerate(windows, 1):
+            logger.info(
+                f"Window {number}/{len(windows)}: {self._format_duration(window['start'])}-"
+                f"{self._format_duration(window['end'])}, {window['tokens']} transcript tokens"
+            )
+        
+        self.run_metadata.update({
+            'llm_windows': len(windows),
+            'llm_window_tokens': [window['tokens'] for window in windows]
+        })
+        
+        prompts = [
+            self.window_prompt_template.format(
+                duration=int(video_duration),
+                duration_formatted=self._format_duration(video_duration),
+                window_number=number,
+                window_count=len(windows),
+                window_start=self._format_duration(window['start']),
+                window_end=self._format_duration(window['end']),
+                max_chapters=chapters_per_window,
+                transcript=window['transcript']
+            )
+            for number, window in enumerate(windows, 1)
+        ]
+        
+        candidates: Dict[int, List[Dict[str, Any]]] = {}
+        pending = list(range(len(windows)))
+        
+        # Each round batches the windows that have not produced chapters yet
+        for attempt in range(max_retries):
+            if not pending:
+                break
+            
+            logger.info(f"Window chaptering attempt {attempt + 1}: {len(pending)} windows")
+            
+            # The shared queue forms its own batches, so hand it every pending window at once
+            batch_size = len(pending) if self.batch_queue_enabled else self.window_batch_size
+            for batch_start in range(0, len(pending), batch_size):
+                batch = pending[batch_start:batch_start + batch_size]
+                self._record_attempts(len(batch), retry=attempt > 0)
+                try:
+                    responses = self._generate_batch(
+                        [prompts[i] for i in batch], max_chapters=chapters_per_window
+                    )
+                except Exception as e:
+                    logger.warning(f"Window batch generation failed: {str(e)}")
+                    continue
+                
+                for i, response in zip(batch, responses):
+                    window = windows[i]
+                    chapters = [
+                        chapter for chapter in self._parse_chapter_response(response)
+                        if window['start'] <= chapter['start_time'] < window['end']
+                    ]
+                    if chapters:
+                        candidates[i] = chapters
+                    else:
+                        self.run_metadata['llm_parse_failures'] += 1
+                
+                if progress_callback:
+                    progress_callback(
+                        50 + 30 * len(candidates) / len(windows),
+                        f"Chaptered {len(candidates)}/{len(windows)} transcript windows"
+                    )
+            
+            pending = [i for i in pending if i not in candidates]
+        
+        if not candidates:
+            logger.warning("No window produced chapters, creating fallback chapters")
+            return self._create_fallback_chapters(max_chapters, min_chapter_length)
+        
+        if pending:
+            logger.warning(f"{len(pending)} transcript windows produced no chapters")
+        
+        return self._reduce_window_chapters(
+            [chapter for i in sorted(candidates) for chapter in candidates[i]],
+            video_duration,
+            max_chapters,
+            min_chapter_length
+        )
+    
+    def _reduce_window_chapters(
+        self,
+        candidates: List[Dict[str, Any]],
+        video_duration: float,
+        max_chapters: int,
+        min_chapter_length: float
+    ) -> List[Dict[str, Any]]:
+        """Merge per-window chapter candidates into one list, deterministically"""
+        
+        # Windows overlap, so neighbouring windows often propose the same boundary twice
+        merged: List[Dict[str, Any]] = []
+        for chapter in sorted(candidates, key=lambda c: (c['start_time'], -c['confidence'])):
+            if merged and chapter['start_time'] - merged[-1]['start_time'] < min_chapter_length:
+                if chapter['confidence'] > merged[-1]['confidence']:
+                    merged[-1] = chapter
+                continue
+            merged.append(chapter)
+        
+        # Over the cap, repeatedly drop the boundary whose removal yields the shortest, least
+        # certain merged chapter, so the remaining chapters stay spread over the whole video
+        while len(merged) > max(max_chapters, 1):
+            def removal_cost(i: int) -> Tuple[float, float]:
+                next_start = merged[i + 1]['start_time'] if i + 1 < len(merged) else video_duration
+                span = next_start - merged[i - 1]['start_time']
+                return span * merged[i]['confidence'], merged[i]['start_time']
+            
+            del merged[min(range(1, len(merged)), key=removal_cost)]
+        
+        logger.info(f"Reduced {len(candidates)} window candidates to {len(merged)} chapters")
+        return merged
+    
     def _parse_chapter_response(self, response: str) -> List[Dict[str, Any]]:
         """Parse LLM response to extract chapter information"""
         
@@ -223,15 +986,7 @@ Please create meaningful chapters for this video. Consider content flow, topic c
                 data = json.loads(json_str)
                 
                 if 'chapters' in data and isinstance(data['chapters'], list):
-                    chapters = []
-                    for chapter in data['chapters']:
-                        if self._is_valid_chapter(chapter):
-                            chapters.append({
-                                'start_time': float(chapter['start_time']),
-                                'title': str(chapter['title']).strip(),
-                                'confidence': float(chapter.get('confidence', 0.8))
-                            })
-                    return chapters
+                    return [chapter for chapter in map(self._chapter_from_json, data['chapters']) if chapter]
             
             # Fallback: try to parse line by line
             return self._parse_fallback_format(response)
@@ -243,6 +998,42 @@ Please create meaningful chapters for this video. Consider content flow, topic c
             logger.error(f"Chapter parsing failed: {str(e)}")
             return []
     
+    def _chapter_from_json(self, chapter: Any) -> Optional[Dict[str, Any]]:
+        """Normalize one chapter object of a JSON response, or None if it is invalid"""
+        
+        if not self._is_valid_chapter(chapter):
+            return None
+        return {
+            'start_time': float(chapter['start_time']),
+            'title': str(chapter['title']).strip(),
+            'confidence': float(chapter.get('confidence', 0.8))
+        }
+    
+    def _parse_title_response(self, response: str) -> Optional[str]:
+        """Parse a title-only LLM response, returning None if it holds no title"""
+        
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if json_match:
+            try:
+                data = json.loads(json_match.group())
+                if isinstance(data, dict) and isinstance(data.get('title'), str) and data['title'].strip():
+                    return data['title'].strip()[:255]
+            except json.JSONDecodeError as e:
+                logger.warning(f"Title JSON parsing failed: {str(e)}")
+        
+        # A response cut off inside the JSON still carries the title field
+        field_match = re.search(r'"title"\s*:\s*"([^"\n]+)', response)
+        if field_match and field_match.group(1).strip():
+            return field_match.group(1).strip()[:255]
+        
+        # Fallback: the first plain line, without a "Title:" label or quotes
+        for line in response.split('\n'):
+            title = re.sub(r'^title\s*:\s*', '', line.strip(), flags=re.IGNORECASE).strip(' "\'')
+            if title and not title.startswith(('{', '}')):
+                return title[:255]
+        
+        return None
+    
     def _parse_fallback_format(self, response: str) -> List[Dict[str, Any]]:
         """Fallback parser for non-JSON responses"""
         
@@ -309,13 +1100,22 @@ Please create meaningful chapters for this video. Consider content flow, topic c
         self,
         chapters: List[Dict[str, Any]],
         video_duration: float,
-        min_chapter_length: float
+        min_chapter_length: float,
+        speech_index: SpeechIndex = None
     ) -> List[Dict[str, Any]]:
         """Validate and process generated chapters"""
         
         if not chapters:
             return self._create_fallback_chapters(5, min_chapter_length)
         
+        # Start chapters in the nearest pause instead of mid-sentence
+        if speech_index is not None and self.boundary_snap_seconds > 0:
+            chapters = [
+                {**ch, 'start_time': speech_index.snap_to_silence(ch['start_time'], self.boundary_snap_seconds)}
+                if ch['start_time'] > 0 else ch
+                for ch in chapters
+            ]
+        
         # Sort chapters by start time
         chapters = sorted(chapters, key=lambda x: x['start_time'])
         
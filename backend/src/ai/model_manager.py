@@ -3,6 +3,7 @@ Model Manager for loading and managing AI models (LLM and ASR)
 """
 
 import os
+import shutil
 import torch
 import logging
 from typing import Optional, Dict, Any
@@ -28,7 +29,7 @@ class ModelManager:
     def __init__(self):
         if hasattr(self, '_initialized') and self._initialized:
             return
-            
+        
         self._models = {}
         self._device = self._get_device()
         self._model_cache_dir = Path(os.getenv('MODEL_CACHE_DIR', './models'))
@@ -115,16 +116,149 @@ class ModelManager:
             
             logger.info(f"LLM model loaded successfully on {self._device}")
             return self._models['llm']
-            
+        
         except Exception as e:
             logger.error(f"Failed to load LLM model: {str(e)}")
             raise
     
+    def get_draft_llm_model(self, model_name: str = "meta-llama/Llama-3.2-1B-Instruct") -> Dict[str, Any]:
+        """
+        Load and return the small draft LLM used for assisted generation and its tokenizer
+        
+        The draft proposes tokens that the main LLM verifies, so it must share the
+        main model's tokenizer. At about a tenth of the size it is kept unquantized
+        (float16 on GPU) next to the main model.
+        """
+        
+        if 'llm_draft' in self._models:
+            return self._models['llm_draft']
+        
+        try:
+            logger.info(f"Loading draft LLM model: {model_name}")
+            
+            # Import here to avoid loading dependencies unless needed
+            from transformers import AutoTokenizer, AutoModelForCausalLM
+            
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name,
+                cache_dir=self._model_cache_dir,
+                trust_remote_code=True
+            )
+            
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                cache_dir=self._model_cache_dir,
+                torch_dtype=torch.float16 if self._device in ["cuda", "mps"] else torch.float32,
+                trust_remote_code=True
+            )
+            model = model.to(self._device)
+            model.eval()
+            
+            self._models['llm_draft'] = {
+                'model': model,
+                'tokenizer': tokenizer,
+                'device': self._device,
+                'model_name': model_name
+            }
+            
+            logger.info(f"Draft LLM model loaded successfully on {self._device}")
+            return self._models['llm_draft']
+        
+        except Exception as e:
+            logger.error(f"Failed to load draft LLM model: {str(e)}")
+            raise
+    
+    def get_quantized_llm_model(self, model_name: str = "meta-llama/Llama-3.1-8B-Instruct") -> Dict[str, Any]:
+        """
+        Load and return an int8 CTranslate2 build of the LLM and its tokenizer
+        
+        LLM_CT2_MODEL_PATH points at a model converted ahead of time with
+        ct2-transformers-converter. Without it the Hugging Face model is
+        converted once into the model cache, which loads its float16 weights
+        (about 16 GB for an 8B model) for the duration of the conversion.
+        """
+        
+        if 'llm_ct2' in self._models:
+            return self._models['llm_ct2']
+        
+        # int8 weights with float32 activations on CPU, float16 activations on GPU
+        compute_type = os.getenv('LLM_CT2_COMPUTE_TYPE') or ('int8_float16' if self._device == 'cuda' else 'int8')
+        
+        try:
+            logger.info(f"Loading quantized LLM model: {model_name} ({compute_type})")
+            
+            # Import here to avoid loading dependencies unless needed
+            import ctranslate2
+            from transformers import AutoTokenizer
+            
+            model_path = os.getenv('LLM_CT2_MODEL_PATH') or self._convert_ct2_model(model_name, compute_type)
+            
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name,
+                cache_dir=self._model_cache_dir,
+                trust_remote_code=True
+            )
+            
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            
+            device = 'cuda' if self._device == 'cuda' else 'cpu'
+            model = ctranslate2.Generator(
+                str(model_path),
+                device=device,
+                compute_type=compute_type,
+                intra_threads=int(os.getenv('LLM_CT2_THREADS', '0'))  # 0 uses every core
+            )
+            
+            self._models['llm_ct2'] = {
+                'model': model,
+                'tokenizer': tokenizer,
+                'device': device,
+                'compute_type': compute_type,
+                'model_name': model_name
+            }
+            
+            logger.info(f"Quantized LLM model loaded successfully on {device}")
+            return self._models['llm_ct2']
+        
+        except Exception as e:
+            logger.error(f"Failed to load quantized LLM model: {str(e)}")
+            raise
+    
+    def _convert_ct2_model(self, model_name: str, quantization: str) -> Path:
+        """Convert a Hugging Face model to CTranslate2 in the model cache, unless already converted"""
+        
+        output_dir = self._model_cache_dir / 'ctranslate2' / f"{model_name.replace('/', '--')}-{quantization}"
+        if (output_dir / 'model.bin').exists():
+            return output_dir
+        
+        from ctranslate2.converters import TransformersConverter
+        
+        logger.info(f"Converting {model_name} to CTranslate2 ({quantization}), this runs once")
+        
+        # Workers starting together each convert into their own directory; the first rename wins
+        staging_dir = output_dir.with_name(f"{output_dir.name}.{os.getpid()}.tmp")
+        TransformersConverter(
+            model_name,
+            load_as_float16=True,
+            low_cpu_mem_usage=True,
+            trust_remote_code=True
+        ).convert(str(staging_dir), quantization=quantization, force=True)
+        
+        try:
+            staging_dir.rename(output_dir)
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        
+        return output_dir
+    
     def get_asr_model(self, model_size: str = "large-v3") -> Dict[str, Any]:
         """Load and return the ASR (Whisper) model"""
         
-        if 'asr' in self._models:
-            return self._models['asr']
+        model_key = self._asr_model_key(model_size)
+        
+        if model_key in self._models:
+            return self._models[model_key]
         
         try:
             logger.info(f"Loading ASR model: faster-whisper {model_size}")
@@ -148,7 +282,7 @@ class ModelManager:
                 download_root=str(self._model_cache_dir)
             )
             
-            self._models['asr'] = {
+            self._models[model_key] = {
                 'model': model,
                 'device': device,
                 'compute_type': compute_type,
@@ -156,26 +290,67 @@ class ModelManager:
             }
             
             logger.info(f"ASR model loaded successfully on {device}")
-            return self._models['asr']
-            
+            return self._models[model_key]
+        
         except Exception as e:
             logger.error(f"Failed to load ASR model: {str(e)}")
             raise
     
+    def get_embedding_model(self, model_name: str = None) -> Dict[str, Any]:
+        """Load and return the sentence-embedding model used for topic segmentation"""
+        
+        if 'embedding' in self._models:
+            return self._models['embedding']
+        
+        model_name = model_name or os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+        
+        try:
+            logger.info(f"Loading embedding model: {model_name}")
+            
+            # Import here to avoid loading dependencies unless needed
+            from sentence_transformers import SentenceTransformer
+            
+            model = SentenceTransformer(
+                model_name,
+                device=self._device,
+                cache_folder=str(self._model_cache_dir)
+            )
+            
+            self._models['embedding'] = {
+                'model': model,
+                'device': self._device,
+                'model_name': model_name
+            }
+            
+            logger.info(f"Embedding model loaded successfully on {self._device}")
+            return self._models['embedding']
+        
+        except Exception as e:
+            logger.error(f"Failed to load embedding model: {str(e)}")
+            raise
+    
+    def _asr_model_key(self, model_size: str) -> str:
+        """Get the cache key of an ASR model ('asr' for the configured ASR_MODEL size)"""
+        
+        if model_size == os.getenv('ASR_MODEL', 'large-v3'):
+            return 'asr'
+        return f'asr:{model_size}'
+    
     def unload_model(self, model_type: str):
         """Unload a specific model to free memory"""
         
         if model_type in self._models:
             logger.info(f"Unloading {model_type} model")
             
-            if model_type == 'llm' and 'model' in self._models[model_type]:
+            if model_type in ('llm', 'llm_draft', 'llm_ct2') and 'model' in self._models[model_type]:
                 # Clear CUDA cache if using GPU
                 if self._device == "cuda":
                     torch.cuda.empty_cache()
+                self._models[model_type].pop('prefix_caches', None)
                 del self._models[model_type]['model']
                 del self._models[model_type]['tokenizer']
             
-            elif model_type == 'asr' and 'model' in self._models[model_type]:
+            elif model_type.startswith('asr') and 'model' in self._models[model_type]:
                 del self._models[model_type]['model']
             
             del self._models[model_type]
@@ -0,0 +1,330 @@
+"""
+Parallel chunked transcription across a local process pool of CPU Whisper replicas
+
+The pool is started from the worker process and kept alive across jobs, so
+the replicas load once. Daemonic processes cannot start it: under Celery
+this mode needs a worker run with --pool threads or --pool solo, not the
+default prefork pool.
+"""
+
+import os
+import math
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from threading import Lock
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .asr_processor import SAMPLE_RATE, LANGUAGE_DETECTION_SECONDS, SPEECH_PAD_SECONDS, build_transcribe_kwargs
+from .transcript import Transcript, TranscriptBuilder
+from .speech_index import SpeechIndex
+
+logger = logging.getLogger(__name__)
+
+# Model replica owned by each pool process (created by _init_worker)
+_worker_model = None
+
+# Replica pools kept alive across jobs, keyed by (model_size, download_root, num_workers)
+_pools: Dict[Tuple[str, str, int], ProcessPoolExecutor] = {}
+_pools_lock = Lock()
+
+def can_start_processes() -> bool:
+    """Whether this process may start a pool (daemonic ones, like Celery prefork children, may not)"""
+    
+    if multiprocessing.current_process().daemon:
+        return False
+    
+    # Celery's prefork children are billiard processes, which the standard library does not see
+    try:
+        from billiard.process import current_process
+    except ImportError:
+        return True
+    return not current_process().daemon
+
+def get_replica_pool(model_size: str, download_root: str, num_workers: int) -> ProcessPoolExecutor:
+    """
+    Get or start the pool of model replicas for a configuration
+    
+    Args:
+        model_size: Whisper model size loaded by every replica
+        download_root: Model cache directory
+        num_workers: Number of replicas, which share the CPU cores evenly
+    
+    Returns:
+        Process pool whose workers each hold a loaded replica
+    """
+    
+    key = (model_size, download_root, num_workers)
+    with _pools_lock:
+        if key not in _pools:
+            cpu_threads = max(1, (os.cpu_count() or 1) // num_workers)
+            _pools[key] = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(model_size, download_root, cpu_threads)
+            )
+            logger.info(
+                f"Started {num_workers} {model_size} replicas ({cpu_threads} threads each) for chunked transcription"
+            )
+        return _pools[key]
+
+def discard_replica_pool(pool: ProcessPoolExecutor):
+    """Forget a broken pool, so the next job starts a fresh one"""
+    
+    with _pools_lock:
+        for key, cached in list(_pools.items()):
+            if cached is pool:
+                del _pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_replica_pools():
+    """Stop every replica pool (called when the worker shuts down)"""
+    
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _init_worker(model_size: str, download_root: str, cpu_threads: int):
+    """Load one CPU Whisper replica per pool process"""
+    
+    global _worker_model
+    
+    from faster_whisper import WhisperModel
+    
+    _worker_model = WhisperModel(
+        model_size,
+        device="cpu",
+        compute_type="int8",
+        cpu_threads=cpu_threads,
+        download_root=download_root
+    )
+
+def _detect_span_language(shm_name: str, total_samples: int, start_sample: int, end_sample: int) -> str:
+    """Detect the language of one span of the shared audio buffer inside a pool process"""
+    
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        audio = np.ndarray((total_samples,), dtype=np.float32, buffer=shm.buf)
+        span = audio[start_sample:end_sample]
+        
+        # transcribe() detects the language before returning; its segments are never decoded
+        segments_generator, info = _worker_model.transcribe(span, language=None)
+        
+        del segments_generator, span, audio
+        return info.language
+    finally:
+        shm.close()
+
+def _transcribe_span(
+    shm_name: str,
+    total_samples: int,
+    start_sample: int,
+    end_sample: int,
+    transcribe_kwargs: Dict[str, Any]
+) -> Tuple[Transcript, str]:
+    """Transcribe one span of the shared audio buffer inside a pool process"""
+    
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        builder = TranscriptBuilder()
+        
+        # A span without indexed speech has nothing to decode
+        if transcribe_kwargs.get('clip_timestamps') == []:
+            return builder.build(), transcribe_kwargs.get('language')
+        
+        audio = np.ndarray((total_samples,), dtype=np.float32, buffer=shm.buf)
+        span = audio[start_sample:end_sample]
+        offset = start_sample / SAMPLE_RATE
+        
+        segments_generator, info = _worker_model.transcribe(span, **transcribe_kwargs)
+        for segment in segments_generator:
+            builder.append_segment(segment, offset=offset)
+        
+        # Release every view on the shared buffer before closing it
+        del segments_generator, span, audio
+        return builder.build(), info.language
+    finally:
+        shm.close()
+
+class ParallelTranscriber:
+    """Splits audio at VAD silences and transcribes the spans concurrently"""
+    
+    def __init__(
+        self,
+        model_size: str,
+        download_root: str,
+        chunk_seconds: float = None,
+        num_workers: int = None
+    ):
+        self.model_size = model_size
+        self.download_root = download_root
+        self.chunk_seconds = chunk_seconds or float(os.getenv('ASR_CHUNK_SECONDS', '600'))
+        self.num_workers = num_workers or int(
+            os.getenv('ASR_PARALLEL_WORKERS', str(max(1, (os.cpu_count() or 1) // 4)))
+        )
+        
+        # Language of the last transcribe() call, detected once for all spans unless given
+        self.detected_language: Optional[str] = None
+    
+    def split_points(self, audio: np.ndarray, speech_index: SpeechIndex = None) -> List[int]:
+        """
+        Choose span boundaries (in samples) at silences close to equal-length targets
+        
+        Args:
+            audio: 16kHz mono float32 samples
+            speech_index: Precomputed speech index of the audio (computed if None)
+        
+        Returns:
+            Sorted sample indices including 0 and len(audio)
+        """
+        
+        total_samples = len(audio)
+        chunk_samples = int(self.chunk_seconds * SAMPLE_RATE)
+        num_chunks = max(1, math.ceil(total_samples / chunk_samples))
+        
+        if num_chunks == 1:
+            return [0, total_samples]
+        
+        if speech_index is None:
+            speech_index = SpeechIndex.from_audio(audio, sample_rate=SAMPLE_RATE)
+        
+        span_samples = total_samples / num_chunks
+        max_shift = span_samples / 2
+        points = [0]
+        
+        for k in range(1, num_chunks):
+            # Move each equal-length target to the middle of the nearest pause
+            target = k * span_samples / SAMPLE_RATE
+            cut = int(speech_index.snap_to_silence(target, max_shift / SAMPLE_RATE) * SAMPLE_RATE)
+            
+            if points[-1] < cut < total_samples:
+                points.append(cut)
+        
+        points.append(total_samples)
+        return points
+    
+    def transcribe(
+        self,
+        audio: np.ndarray,
+        language: str = None,
+        initial_prompt: str = None,
+        progress_callback: callable = None,
+        speech_index: SpeechIndex = None
+    ) -> Transcript:
+        """
+        Transcribe audio spans in parallel and stitch the results
+        
+        Args:
+            audio: 16kHz mono float32 samples
+            language: Language code (detected once from the first speech and used for every span if None)
+            initial_prompt: Initial prompt to guide transcription
+            progress_callback: Function to call with progress updates
+            speech_index: Precomputed speech index used to place span boundaries and
+                select the speech to decode (computed if None)
+        
+        Returns:
+            Transcript with absolute timestamps and sequential segment ids
+        """
+        
+        if speech_index is None:
+            speech_index = SpeechIndex.from_audio(audio, sample_rate=SAMPLE_RATE)
+        
+        points = self.split_points(audio, speech_index)
+        spans = list(zip(points[:-1], points[1:]))
+        
+        logger.info(
+            f"Transcribing {len(audio) / SAMPLE_RATE:.2f}s of audio in {len(spans)} spans "
+            f"with {self.num_workers} workers"
+        )
+        
+        executor = get_replica_pool(self.model_size, self.download_root, self.num_workers)
+        
+        shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+        try:
+            shared_audio = np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)
+            shared_audio[:] = audio
+            del shared_audio
+            
+            # Spans detecting their own language could come back in different languages
+            if language is None:
+                start = self._first_speech_sample(audio, speech_index)
+                end = min(len(audio), start + LANGUAGE_DETECTION_SECONDS * SAMPLE_RATE)
+                language = executor.submit(_detect_span_language, shm.name, len(audio), start, end).result()
+                logger.info(f"Detected language {language} for all spans")
+            self.detected_language = language
+            
+            results: List[Optional[Transcript]] = [None] * len(spans)
+            completed_spans = 0
+            completed_samples = 0
+            
+            futures = {
+                executor.submit(
+                    _transcribe_span, shm.name, len(audio), start, end,
+                    self._span_transcribe_kwargs(speech_index, start, end, language, initial_prompt)
+                ): index
+                for index, (start, end) in enumerate(spans)
+            }
+            
+            try:
+                for future in as_completed(futures):
+                    index = futures[future]
+                    results[index], _ = future.result()
+                    
+                    start, end = spans[index]
+                    completed_spans += 1
+                    completed_samples += end - start
+                    
+                    if progress_callback:
+                        progress = (completed_samples / len(audio)) * 100
+                        progress_callback(progress, f"Transcribed {completed_spans}/{len(spans)} audio spans")
+            finally:
+                # The shared buffer is unlinked below, so no span may still be reading it
+                for future in futures:
+                    future.cancel()
+                for future in futures:
+                    if not future.cancelled():
+                        future.exception()
+        except BrokenProcessPool:
+            discard_replica_pool(executor)
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+        
+        return self.stitch(results)
+    
+    def _span_transcribe_kwargs(
+        self,
+        speech_index: SpeechIndex,
+        start_sample: int,
+        end_sample: int,
+        language: str,
+        initial_prompt: str
+    ) -> Dict[str, Any]:
+        """Transcribe arguments decoding only the indexed speech of one span"""
+        
+        start = start_sample / SAMPLE_RATE
+        speech_clips = [
+            (clip_start - start, clip_end - start)
+            for clip_start, clip_end in speech_index.speech_clips(start, end_sample / SAMPLE_RATE, SPEECH_PAD_SECONDS)
+        ]
+        return build_transcribe_kwargs(language, initial_prompt, speech_clips)
+    
+    def _first_speech_sample(self, audio: np.ndarray, speech_index: SpeechIndex = None) -> int:
+        """Sample where the first speech region starts (0 without a speech index)"""
+        
+        if speech_index is None or not len(speech_index):
+            return 0
+        return min(len(audio), int(speech_index.speech_starts[0] * SAMPLE_RATE))
+    
+    def stitch(self, span_results: List[Transcript]) -> Transcript:
+        """Concatenate span results in time order and assign stable sequential ids"""
+        return Transcript.concatenate(span_results)
@@ -11,6 +11,7 @@ from celery.result import AsyncResult
 
 from .chapter_processor import ChapterProcessor
 from .model_manager import ModelManager
+from .transcription_checkpoint import TranscriptionCheckpointStore
 from ..models import Video, ProcessingJob, db
 from ..routes.websocket_events import notify_job_update, notify_stage_change
 
@@ -162,6 +163,9 @@ class ProcessingPipeline:
             job.mark_error('Job cancelled by user')
             job.save()
             
+            # A cancelled job will not resume its transcription
+            TranscriptionCheckpointStore().delete(job_id)
+            
             # Update video status
             video = Video.get_by_id(job.video_id)
             if video:
@@ -277,6 +281,7 @@ class ProcessingPipeline:
             ).all()
             
             # Delete old jobs
+            checkpoint_store = TranscriptionCheckpointStore()
             cleanup_count = 0
             for job in old_jobs:
                 # Revoke task if still exists
@@ -286,6 +291,7 @@ class ProcessingPipeline:
                     except Exception:
                         pass  # Task might not exist anymore
                 
+                checkpoint_store.delete(job.id)
                 job.delete()
                 cleanup_count += 1
             
@@ -329,24 +335,24 @@ def process_video_task(self, video_id: str, job_id: str, processing_options: Dic
         notify_stage_change(job, old_stage)
         
         # Create progress callback
-        def progress_callback(progress: float, message: str):
-            """Update job progress and notify clients"""
+        def progress_callback(progress: float, message: str, chapters: List[Dict[str, Any]] = None):
+            """Update job progress and notify clients, including chapters generated so far"""
             try:
                 job.update_progress(progress=progress, metadata={'message': message})
                 job.save()
                 
                 # Notify via WebSocket
-                notify_job_update(job)
+                notify_job_update(job, partial_chapters=chapters)
                 
                 # Update Celery task state
-                self.update_state(
-                    state='PROGRESS',
-                    meta={
-                        'progress': progress,
-                        'message': message,
-                        'job_id': job_id
-                    }
-                )
+                meta = {
+                    'progress': progress,
+                    'message': message,
+                    'job_id': job_id
+                }
+                if chapters is not None:
+                    meta['partial_chapters'] = chapters
+                self.update_state(state='PROGRESS', meta=meta)
                 
             except Exception as e:
                 logger.warning(f"Failed to update progress: {str(e)}")
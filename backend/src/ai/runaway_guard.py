@@ -0,0 +1,83 @@
+"""
+Detection of runaway Whisper decoding (looping phrases and highly repetitive text)
+"""
+
+import os
+import re
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+
+# Texts shorter than this compress poorly anyway, so their ratio says nothing; short
+# replies ("Yeah.", "Thank you.") also repeat in normal speech, so they never count as a loop
+MIN_COMPRESSION_TEXT_LENGTH = 40
+
+class RunawayGuard:
+    """
+    Watches a live segment stream for the two symptoms of a decoder stuck in a loop
+    
+    A phrase repeated in several consecutive segments is flagged as
+    repetition, and a single segment whose text compresses too well (the same
+    check faster-whisper applies per window) is flagged as a compression ratio
+    anomaly.
+    """
+    
+    def __init__(
+        self,
+        max_repeats: int = None,
+        compression_ratio_threshold: float = None
+    ):
+        self.max_repeats = max_repeats or int(os.getenv('ASR_RUNAWAY_MAX_REPEATS', '3'))
+        self.compression_ratio_threshold = compression_ratio_threshold or float(
+            os.getenv('ASR_RUNAWAY_COMPRESSION_RATIO', '2.4')
+        )
+        
+        # Text of the current run of identical segments and (index, start) of its members
+        self._run_text: Optional[str] = None
+        self._run: List[Tuple[int, float]] = []
+    
+    def reset(self):
+        """Forget the current run of segments (after decoding restarts elsewhere)"""
+        self._run_text = None
+        self._run = []
+    
+    def check(self, segment: Dict[str, Any], index: int) -> Optional[Tuple[str, int, float]]:
+        """
+        Check the next segment of the stream
+        
+        Args:
+            segment: Segment dict about to be appended to the transcript
+            index: Position the segment would take in the transcript
+        
+        Returns:
+            (reason, index of the first runaway segment, its start time), or None if the segment is fine
+        """
+        
+        text = segment['text']
+        normalized = re.sub(r'[^\w]+', ' ', text.lower()).strip()
+        
+        if len(text) >= MIN_COMPRESSION_TEXT_LENGTH:
+            if self.compression_ratio(text) > self.compression_ratio_threshold:
+                return 'compression_ratio', index, segment['start']
+        
+        if len(normalized) < MIN_COMPRESSION_TEXT_LENGTH:
+            self.reset()
+            return None
+        
+        if normalized != self._run_text:
+            self._run_text = normalized
+            self._run = []
+        self._run.append((index, segment['start']))
+        
+        if len(self._run) >= self.max_repeats:
+            # Keep the first occurrence and drop the copies that followed it
+            first_copy = self._run[1] if len(self._run) > 1 else self._run[0]
+            return 'repetition', first_copy[0], first_copy[1]
+        
+        return None
+    
+    @staticmethod
+    def compression_ratio(text: str) -> float:
+        """Ratio of raw to zlib-compressed UTF-8 size of a text"""
+        
+        text_bytes = text.encode('utf-8')
+        return len(text_bytes) / len(zlib.compress(text_bytes))
@@ -0,0 +1,216 @@
+"""
+Speech/silence interval index built from one VAD pass and shared across pipeline stages
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SpeechIndex:
+    """
+    Sorted, non-overlapping speech intervals of one audio track
+    
+    Silences are the gaps between speech intervals (plus any leading or
+    trailing gap). All queries are O(log n) binary searches over the interval
+    arrays, with a prefix sum of speech durations for range queries.
+    """
+    
+    def __init__(self, speech_starts: np.ndarray, speech_ends: np.ndarray, duration: float):
+        self.speech_starts = np.asarray(speech_starts, dtype=np.float64)
+        self.speech_ends = np.asarray(speech_ends, dtype=np.float64)
+        self.duration = float(duration)
+        
+        # Speech seconds before each interval, with the grand total appended
+        self._speech_before = np.concatenate(([0.0], np.cumsum(self.speech_ends - self.speech_starts)))
+        
+        # Silences are the gaps around and between speech intervals
+        gap_starts = np.concatenate(([0.0], self.speech_ends))
+        gap_ends = np.concatenate((self.speech_starts, [self.duration]))
+        keep = gap_ends > gap_starts
+        self.silence_starts = gap_starts[keep]
+        self.silence_ends = gap_ends[keep]
+    
+    def __len__(self) -> int:
+        return len(self.speech_starts)
+    
+    @classmethod
+    def from_audio(
+        cls,
+        audio: np.ndarray,
+        sample_rate: int = 16000,
+        min_silence_duration_ms: int = 500,
+        speech_pad_ms: int = 0
+    ) -> 'SpeechIndex':
+        """
+        Run voice activity detection over decoded audio
+        
+        Args:
+            audio: Mono float32 samples
+            sample_rate: Sample rate of the audio (the VAD model expects 16kHz)
+            min_silence_duration_ms: Shortest pause that separates two speech intervals
+            speech_pad_ms: Padding added around each speech interval
+        
+        Returns:
+            SpeechIndex of the audio
+        """
+        
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        
+        speech = get_speech_timestamps(
+            audio,
+            VadOptions(min_silence_duration_ms=min_silence_duration_ms, speech_pad_ms=speech_pad_ms)
+        )
+        
+        index = cls(
+            np.array([region['start'] for region in speech], dtype=np.float64) / sample_rate,
+            np.array([region['end'] for region in speech], dtype=np.float64) / sample_rate,
+            len(audio) / sample_rate
+        )
+        
+        logger.info(
+            f"Speech index built: {len(index)} speech regions, "
+            f"{index.total_speech_seconds:.1f}s speech in {index.duration:.1f}s audio"
+        )
+        return index
+    
+    @property
+    def total_speech_seconds(self) -> float:
+        """Seconds of speech in the whole audio"""
+        return float(self._speech_before[-1])
+    
+    def is_speech(self, t: float) -> bool:
+        """Whether time t falls inside a speech interval"""
+        
+        i = int(np.searchsorted(self.speech_starts, t, side='right')) - 1
+        return i >= 0 and t < self.speech_ends[i]
+    
+    def speech_seconds(self, start: float, end: float) -> float:
+        """Seconds of speech inside [start, end]"""
+        
+        if end <= start:
+            return 0.0
+        return self._speech_until(end) - self._speech_until(start)
+    
+    def next_speech_start(self, t: float) -> Optional[float]:
+        """Start of the first speech interval beginning after time t (None if there is none)"""
+        
+        i = int(np.searchsorted(self.speech_starts, t, side='right'))
+        return float(self.speech_starts[i]) if i < len(self.speech_starts) else None
+    
+    def nearest_silence(self, t: float) -> Optional[Tuple[float, float]]:
+        """
+        Find the silence closest to time t
+        
+        Args:
+            t: Time in seconds
+        
+        Returns:
+            (start, end) of the silence containing or nearest to t, or None if there is no silence
+        """
+        
+        if not len(self.silence_starts):
+            return None
+        
+        i = int(np.searchsorted(self.silence_starts, t, side='right'))
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(self.silence_starts)]
+        
+        def distance(j: int) -> float:
+            if self.silence_starts[j] <= t <= self.silence_ends[j]:
+                return 0.0
+            return min(abs(t - self.silence_starts[j]), abs(t - self.silence_ends[j]))
+        
+        best = min(candidates, key=distance)
+        return float(self.silence_starts[best]), float(self.silence_ends[best])
+    
+    def snap_to_silence(self, t: float, max_shift: float) -> float:
+        """
+        Move time t to the middle of the nearest pause if one is close enough
+        
+        Args:
+            t: Time in seconds
+            max_shift: Largest allowed move in seconds
+        
+        Returns:
+            Midpoint of the nearest silence, or t unchanged
+        """
+        
+        silence = self.nearest_silence(t)
+        if silence is None:
+            return t
+        
+        midpoint = (silence[0] + silence[1]) / 2
+        return midpoint if abs(midpoint - t) <= max_shift else t
+    
+    def speech_clips(
+        self,
+        start: float,
+        end: float,
+        padding: float = 0.4,
+        max_clip_seconds: float = 30.0
+    ) -> List[Tuple[float, float]]:
+        """
+        Merge the speech inside [start, end] into clips for clip-by-clip decoding
+        
+        Each clip costs at least one decoding window, so a speech interval joins
+        the previous clip while the clip still fits in max_clip_seconds or the
+        padded intervals touch. Longer pauses between clips are not decoded.
+        
+        Args:
+            start: Start of the range in seconds
+            end: End of the range in seconds
+            padding: Silence kept on both sides of each speech interval
+            max_clip_seconds: Length up to which pauses are kept inside a clip
+        
+        Returns:
+            (start, end) of each clip in seconds, in time order
+        """
+        
+        first = int(np.searchsorted(self.speech_ends, start, side='right'))
+        last = int(np.searchsorted(self.speech_starts, end, side='left'))
+        
+        clips: List[List[float]] = []
+        for i in range(first, last):
+            clip_start = max(start, float(self.speech_starts[i]) - padding)
+            clip_end = min(end, float(self.speech_ends[i]) + padding)
+            
+            if clips and (clip_start <= clips[-1][1] or clip_end - clips[-1][0] <= max_clip_seconds):
+                clips[-1][1] = clip_end
+            else:
+                clips.append([clip_start, clip_end])
+        
+        return [(clip_start, clip_end) for clip_start, clip_end in clips]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for storage in job metadata (millisecond precision)"""
+        
+        return {
+            'duration': round(self.duration, 3),
+            'speech': [
+                [round(float(start), 3), round(float(end), 3)]
+                for start, end in zip(self.speech_starts, self.speech_ends)
+            ]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SpeechIndex':
+        """Restore an index serialized by to_dict()"""
+        
+        speech: List[List[float]] = data.get('speech') or []
+        return cls(
+            np.array([start for start, _ in speech], dtype=np.float64),
+            np.array([end for _, end in speech], dtype=np.float64),
+            data['duration']
+        )
+    
+    def _speech_until(self, t: float) -> float:
+        """Seconds of speech inside [0, t]"""
+        
+        i = int(np.searchsorted(self.speech_starts, t, side='right'))
+        if i == 0:
+            return 0.0
+        
+        # Remove the part of the last started interval that lies after t
+        return float(self._speech_before[i] - max(0.0, self.speech_ends[i - 1] - t))
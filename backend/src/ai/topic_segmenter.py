@@ -0,0 +1,283 @@
+"""
+Embedding-based topic segmentation as a fast, non-generative chaptering engine
+"""
+
+import os
+import re
+import time
+import math
+import logging
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from .model_manager import ModelManager
+from .speech_index import SpeechIndex
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+# Words never used as title keywords
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each even few for from further get got had
+has have having he her here hers him his how i if in into is it its just know let like lot me more most
+my no nor not now of off on once one only or other our out over own really right said same say see she
+should so some something such than that the their them then there these they thing things think this
+those through to too under until up us very want was way we well were what when where which while who
+whom why will with would yeah yes you your going gonna okay oh
+""".split())
+
+KEYWORD_PATTERN = re.compile(r"[a-z][a-z'-]{2,}")
+
+# Valleys shallower than this fraction of the deepest one are embedding noise, not topic shifts
+MIN_RELATIVE_DEPTH = 0.2
+
+class TopicSegmenter:
+    """
+    Chapters a transcript from topic shifts in sentence embeddings
+    
+    The transcript is cut into fixed-length windows that are embedded with a
+    small local sentence-embedding model (EMBEDDING_MODEL). The similarity of
+    the blocks of windows on either side of every gap is computed in one
+    vectorized pass, and chapter boundaries are placed at the deepest
+    similarity valleys (TextTiling depth scores) that respect
+    min_chapter_length and max_chapters. Titles are extractive keywords, so no
+    generative model runs at all.
+    """
+    
+    def __init__(self, window_seconds: float = None, block_windows: int = None):
+        self.model_manager = ModelManager()
+        self.window_seconds = window_seconds or float(os.getenv('TOPIC_WINDOW_SECONDS', '30'))
+        self.block_windows = block_windows or int(os.getenv('TOPIC_BLOCK_WINDOWS', '3'))
+        
+        # Largest move (seconds) of a chapter start onto the nearest pause in speech
+        self.boundary_snap_seconds = float(os.getenv('CHAPTER_BOUNDARY_SNAP_SECONDS', '5'))
+        
+        # Metrics describing the last generate_chapters() run (merged into job metadata)
+        self.run_metadata: Dict[str, Any] = {}
+    
+    def generate_chapters(
+        self,
+        segments: Sequence[Mapping[str, Any]],
+        video_duration: float,
+        max_chapters: int = 15,
+        min_chapter_length: float = 30.0,
+        progress_callback: callable = None,
+        speech_index: SpeechIndex = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate chapters from topic shifts in the transcript
+        
+        Args:
+            segments: Transcript or list of transcript segment dicts
+            video_duration: Total video duration in seconds
+            max_chapters: Maximum number of chapters to generate
+            min_chapter_length: Minimum chapter length in seconds
+            progress_callback: Function to call with progress updates
+            speech_index: Speech index of the video audio, used to place boundaries in pauses
+        
+        Returns:
+            List of chapter dictionaries with start_time, title, and confidence
+        """
+        
+        self.run_metadata = {'chaptering_engine': 'topic'}
+        started = time.perf_counter()
+        
+        try:
+            if progress_callback:
+                progress_callback(10, "Loading embedding model")
+            
+            model_info = self.model_manager.get_embedding_model()
+            
+            window_starts, window_texts = self._windows(segments)
+            
+            if progress_callback:
+                progress_callback(30, f"Embedding {len(window_texts)} transcript windows")
+            
+            boundaries: List[Tuple[float, float]] = []
+            if len(window_texts) > 1:
+                embeddings = model_info['model'].encode(
+                    window_texts,
+                    batch_size=64,
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                )
+                
+                if progress_callback:
+                    progress_callback(70, "Detecting topic boundaries")
+                
+                similarities = self.gap_similarities(embeddings, self.block_windows)
+                depths = self.depth_scores(similarities)
+                boundaries = self._select_boundaries(
+                    window_starts, depths, video_duration, max_chapters, min_chapter_length, speech_index
+                )
+            
+            starts = [0.0] + [start for start, _ in boundaries]
+            chapter_texts = self._chapter_texts(window_starts, window_texts, starts)
+            titles = self.keyword_titles(chapter_texts)
+            
+            chapters = [{'start_time': 0.0, 'title': titles[0], 'confidence': 1.0}]
+            for (start, confidence), title in zip(boundaries, titles[1:]):
+                chapters.append({'start_time': start, 'title': title, 'confidence': confidence})
+            
+            self.run_metadata.update({
+                'embedding_model': model_info['model_name'],
+                'topic_windows': len(window_texts),
+                'topic_segmentation_seconds': round(time.perf_counter() - started, 3)
+            })
+            
+            if progress_callback:
+                progress_callback(100, f"Generated {len(chapters)} chapters")
+            
+            logger.info(f"Topic segmentation generated {len(chapters)} chapters from {len(window_texts)} windows")
+            return chapters
+        
+        except Exception as e:
+            logger.error(f"Topic segmentation failed: {str(e)}")
+            raise
+    
+    @staticmethod
+    def gap_similarities(embeddings: np.ndarray, block_windows: int = 1) -> np.ndarray:
+        """
+        Cosine similarity across every gap between consecutive windows
+        
+        Args:
+            embeddings: (n, d) window embeddings
+            block_windows: Windows summed on each side of a gap
+        
+        Returns:
+            (n - 1,) similarity of the blocks before and after each gap
+        """
+        
+        n = len(embeddings)
+        gaps = np.arange(1, n)
+        
+        # Block sums from a prefix sum, so all gaps are compared in one pass
+        prefix = np.concatenate((np.zeros((1, embeddings.shape[1])), np.cumsum(embeddings, axis=0)))
+        left = prefix[gaps] - prefix[np.maximum(gaps - block_windows, 0)]
+        right = prefix[np.minimum(gaps + block_windows, n)] - prefix[gaps]
+        
+        norms = np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1)
+        return np.einsum('ij,ij->i', left, right) / np.maximum(norms, 1e-12)
+    
+    @staticmethod
+    def depth_scores(similarities: np.ndarray) -> np.ndarray:
+        """TextTiling depth of each gap: how far it sits below the peaks climbed to on either side"""
+        
+        depths = np.zeros_like(similarities)
+        
+        for i in range(len(similarities)):
+            if (i > 0 and similarities[i - 1] < similarities[i]) or (
+                i + 1 < len(similarities) and similarities[i + 1] < similarities[i]
+            ):
+                continue  # Only valleys can be boundaries
+            
+            left = i
+            while left > 0 and similarities[left - 1] >= similarities[left]:
+                left -= 1
+            right = i
+            while right + 1 < len(similarities) and similarities[right + 1] >= similarities[right]:
+                right += 1
+            
+            depths[i] = (similarities[left] - similarities[i]) + (similarities[right] - similarities[i])
+        
+        return depths
+    
+    def _select_boundaries(
+        self,
+        window_starts: List[float],
+        depths: np.ndarray,
+        video_duration: float,
+        max_chapters: int,
+        min_chapter_length: float,
+        speech_index: SpeechIndex = None
+    ) -> List[Tuple[float, float]]:
+        """Pick the deepest valleys as (start_time, confidence), keeping chapters apart"""
+        
+        valleys = np.flatnonzero(depths > 0)
+        if not len(valleys):
+            return []
+        
+        # TextTiling cutoff: only valleys noticeably deeper than usual become boundaries
+        max_depth = depths[valleys].max()
+        cutoff = max(depths[valleys].mean() - depths[valleys].std() / 2, MIN_RELATIVE_DEPTH * max_depth)
+        
+        selected: List[Tuple[float, float]] = []
+        for gap in sorted(valleys, key=lambda g: -depths[g]):
+            if len(selected) >= max_chapters - 1 or depths[gap] < cutoff:
+                break
+            
+            start = window_starts[gap + 1]
+            if speech_index is not None:
+                start = speech_index.snap_to_silence(start, self.boundary_snap_seconds)
+            
+            if start < min_chapter_length or video_duration - start < min_chapter_length:
+                continue
+            if any(abs(start - other) < min_chapter_length for other, _ in selected):
+                continue
+            
+            selected.append((start, round(0.5 + 0.5 * float(depths[gap] / max_depth), 3)))
+        
+        return sorted(selected)
+    
+    def _windows(self, segments: Sequence[Mapping[str, Any]]) -> Tuple[List[float], List[str]]:
+        """Group segment texts into fixed-length windows, skipping windows without speech"""
+        
+        if isinstance(segments, Transcript):
+            starts = segments.segment_starts.tolist()
+            texts = [segments.segment_text(index) for index in range(len(segments))]
+        else:
+            starts = [segment['start'] for segment in segments]
+            texts = [segment['text'] for segment in segments]
+        
+        windows: Dict[int, List[str]] = {}
+        for start, text in zip(starts, texts):
+            if text.strip():
+                windows.setdefault(int(start // self.window_seconds), []).append(text.strip())
+        
+        indices = sorted(windows)
+        return [index * self.window_seconds for index in indices], [' '.join(windows[index]) for index in indices]
+    
+    def _chapter_texts(self, window_starts: List[float], window_texts: List[str], starts: List[float]) -> List[str]:
+        """Concatenate the windows that fall into each chapter"""
+        
+        chapter_texts = [[] for _ in starts]
+        for window_start, text in zip(window_starts, window_texts):
+            chapter = int(np.searchsorted(starts, window_start + self.window_seconds / 2, side='right')) - 1
+            chapter_texts[max(chapter, 0)].append(text)
+        return [' '.join(texts) for texts in chapter_texts]
+    
+    @staticmethod
+    def keyword_titles(chapter_texts: List[str], keywords: int = 3) -> List[str]:
+        """
+        Build extractive titles from the words most specific to each chapter
+        
+        Args:
+            chapter_texts: Transcript text of each chapter
+            keywords: Keywords per title
+        
+        Returns:
+            One title per chapter, e.g. "Budget, Tokens, Speech"
+        """
+        
+        counts = [
+            Counter(word for word in KEYWORD_PATTERN.findall(text.lower()) if word not in STOPWORDS)
+            for text in chapter_texts
+        ]
+        document_frequency = Counter(word for count in counts for word in count)
+        
+        titles = []
+        for number, count in enumerate(counts, 1):
+            # TF-IDF across the chapters of this video favours words that set a chapter apart
+            scored = sorted(
+                count,
+                key=lambda word: (-count[word] * math.log(1 + len(counts) / document_frequency[word]), word)
+            )
+            top = [word.capitalize() for word in scored[:keywords]]
+            titles.append(', '.join(top) if top else f"Chapter {number}")
+        
+        return titles
@@ -0,0 +1,501 @@
+"""
+Compact struct-of-arrays transcript representation with lazy dict views
+"""
+
+import io
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import List, Dict, Any, Iterable, Iterator, BinaryIO, Union
+
+import numpy as np
+
+SEGMENT_KEYS = ('id', 'start', 'end', 'text', 'words')
+WORD_KEYS = ('word', 'start', 'end', 'probability')
+
+# Separator for the serialized word vocabulary (never part of a Whisper word)
+VOCAB_SEPARATOR = '\x00'
+
+class WordView(Mapping):
+    """Read-only dict view of one word, resolved from the transcript arrays on access"""
+    
+    __slots__ = ('_transcript', '_index')
+    
+    def __init__(self, transcript: 'Transcript', index: int):
+        self._transcript = transcript
+        self._index = index
+    
+    def __getitem__(self, key: str) -> Any:
+        transcript = self._transcript
+        index = self._index
+        
+        if key == 'word':
+            return transcript.word_vocab[transcript.word_ids[index]]
+        if key == 'start':
+            return float(transcript.word_starts[index])
+        if key == 'end':
+            return float(transcript.word_ends[index])
+        if key == 'probability':
+            return float(transcript.word_probabilities[index])
+        
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(WORD_KEYS)
+    
+    def __len__(self) -> int:
+        return len(WORD_KEYS)
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+class WordsView(Sequence):
+    """Read-only list view of the words belonging to one segment"""
+    
+    __slots__ = ('_transcript', '_start', '_stop')
+    
+    def __init__(self, transcript: 'Transcript', start: int, stop: int):
+        self._transcript = transcript
+        self._start = start
+        self._stop = stop
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('word index out of range')
+        
+        return WordView(self._transcript, self._start + index)
+    
+    def __len__(self) -> int:
+        return self._stop - self._start
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, Sequence)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+class SegmentView(Mapping):
+    """Read-only dict view of one segment with the same keys as the list-of-dicts format"""
+    
+    __slots__ = ('_transcript', '_index')
+    
+    def __init__(self, transcript: 'Transcript', index: int):
+        self._transcript = transcript
+        self._index = index
+    
+    def __getitem__(self, key: str) -> Any:
+        transcript = self._transcript
+        index = self._index
+        
+        if key == 'id':
+            return int(transcript.segment_ids[index])
+        if key == 'start':
+            return float(transcript.segment_starts[index])
+        if key == 'end':
+            return float(transcript.segment_ends[index])
+        if key == 'text':
+            return transcript.text[transcript.text_offsets[index]:transcript.text_offsets[index + 1]]
+        if key == 'words':
+            return WordsView(
+                transcript,
+                int(transcript.word_offsets[index]),
+                int(transcript.word_offsets[index + 1])
+            )
+        
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(SEGMENT_KEYS)
+    
+    def __len__(self) -> int:
+        return len(SEGMENT_KEYS)
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+class Transcript(Sequence):
+    """
+    Struct-of-arrays transcript
+    
+    Segment and word timestamps live in NumPy arrays, segment texts in a single
+    string buffer addressed by offsets, and word strings are interned into a
+    vocabulary referenced by index. Indexing or iterating yields lazy dict
+    views, so callers written for the list-of-dicts format keep working.
+    """
+    
+    def __init__(
+        self,
+        segment_ids: np.ndarray,
+        segment_starts: np.ndarray,
+        segment_ends: np.ndarray,
+        text_offsets: np.ndarray,
+        text: str,
+        word_offsets: np.ndarray,
+        word_ids: np.ndarray,
+        word_starts: np.ndarray,
+        word_ends: np.ndarray,
+        word_probabilities: np.ndarray,
+        word_vocab: List[str]
+    ):
+        self.segment_ids = segment_ids
+        self.segment_starts = segment_starts
+        self.segment_ends = segment_ends
+        self.text_offsets = text_offsets
+        self.text = text
+        self.word_offsets = word_offsets
+        self.word_ids = word_ids
+        self.word_starts = word_starts
+        self.word_ends = word_ends
+        self.word_probabilities = word_probabilities
+        self.word_vocab = word_vocab
+    
+    def __len__(self) -> int:
+        return len(self.segment_ids)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('segment index out of range')
+        
+        return SegmentView(self, index)
+    
+    def __iter__(self) -> Iterator[SegmentView]:
+        for index in range(len(self)):
+            yield SegmentView(self, index)
+    
+    def __repr__(self) -> str:
+        return f'<Transcript {len(self)} segments, {self.total_words} words>'
+    
+    @property
+    def total_words(self) -> int:
+        """Number of words across all segments"""
+        return len(self.word_ids)
+    
+    @property
+    def total_characters(self) -> int:
+        """Number of characters across all segment texts"""
+        return int(self.text_offsets[-1])
+    
+    @property
+    def duration(self) -> float:
+        """End time of the last-ending segment"""
+        return float(self.segment_ends.max()) if len(self) else 0.0
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the arrays and text buffers"""
+        
+        arrays = (
+            self.segment_ids, self.segment_starts, self.segment_ends, self.text_offsets,
+            self.word_offsets, self.word_ids, self.word_starts, self.word_ends,
+            self.word_probabilities
+        )
+        return (
+            sum(a.nbytes for a in arrays) +
+            len(self.text.encode('utf-8')) +
+            sum(len(word) for word in self.word_vocab)
+        )
+    
+    def mean_word_probabilities(self) -> np.ndarray:
+        """Mean word probability of every segment (NaN for segments without words)"""
+        
+        counts = np.diff(self.word_offsets)
+        cumulative = np.concatenate(([0.0], np.cumsum(self.word_probabilities)))
+        sums = cumulative[self.word_offsets[1:]] - cumulative[self.word_offsets[:-1]]
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+    
+    def segment_text(self, index: int) -> str:
+        """Get the text of one segment without creating a view"""
+        return self.text[self.text_offsets[index]:self.text_offsets[index + 1]]
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Materialize the transcript in the list-of-dicts format"""
+        
+        return [
+            {
+                'id': segment['id'],
+                'start': segment['start'],
+                'end': segment['end'],
+                'text': segment['text'],
+                'words': [dict(word) for word in segment['words']]
+            }
+            for segment in self
+        ]
+    
+    @classmethod
+    def from_segments(cls, segments: Iterable[Mapping[str, Any]]) -> 'Transcript':
+        """Build a transcript from segment dicts"""
+        
+        builder = TranscriptBuilder()
+        for segment in segments:
+            builder.append(segment)
+        return builder.build()
+    
+    @classmethod
+    def concatenate(cls, parts: List['Transcript']) -> 'Transcript':
+        """
+        Join transcripts in order, renumbering segment ids sequentially from 1
+        
+        Args:
+            parts: Transcripts covering consecutive, non-overlapping time spans
+        
+        Returns:
+            Combined transcript
+        """
+        
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return TranscriptBuilder().build()
+        
+        vocab: Dict[str, int] = {}
+        word_ids = []
+        for part in parts:
+            remap = np.array(
+                [vocab.setdefault(word, len(vocab)) for word in part.word_vocab],
+                dtype=np.int32
+            )
+            word_ids.append(remap[part.word_ids] if len(part.word_ids) else part.word_ids)
+        
+        def joined_offsets(offsets: List[np.ndarray]) -> np.ndarray:
+            result = [np.zeros(1, dtype=np.int64)]
+            base = 0
+            for part_offsets in offsets:
+                result.append(part_offsets[1:] + base)
+                base += int(part_offsets[-1])
+            return np.concatenate(result)
+        
+        num_segments = sum(len(part) for part in parts)
+        
+        return cls(
+            segment_ids=np.arange(1, num_segments + 1, dtype=np.int32),
+            segment_starts=np.concatenate([part.segment_starts for part in parts]),
+            segment_ends=np.concatenate([part.segment_ends for part in parts]),
+            text_offsets=joined_offsets([part.text_offsets for part in parts]),
+            text=''.join(part.text for part in parts),
+            word_offsets=joined_offsets([part.word_offsets for part in parts]),
+            word_ids=np.concatenate(word_ids).astype(np.int32),
+            word_starts=np.concatenate([part.word_starts for part in parts]),
+            word_ends=np.concatenate([part.word_ends for part in parts]),
+            word_probabilities=np.concatenate([part.word_probabilities for part in parts]),
+            word_vocab=list(vocab)
+        )
+    
+    def save(self, file: Union[str, BinaryIO]):
+        """Serialize the transcript arrays to an .npz file or file object"""
+        
+        np.savez_compressed(
+            file,
+            segment_ids=self.segment_ids,
+            segment_starts=self.segment_starts,
+            segment_ends=self.segment_ends,
+            text_offsets=self.text_offsets,
+            text=np.frombuffer(self.text.encode('utf-8'), dtype=np.uint8),
+            word_offsets=self.word_offsets,
+            word_ids=self.word_ids,
+            word_starts=self.word_starts,
+            word_ends=self.word_ends,
+            word_probabilities=self.word_probabilities,
+            word_vocab=np.frombuffer(VOCAB_SEPARATOR.join(self.word_vocab).encode('utf-8'), dtype=np.uint8)
+        )
+    
+    @classmethod
+    def load(cls, file: Union[str, BinaryIO]) -> 'Transcript':
+        """Load a transcript written by save()"""
+        
+        with np.load(file, allow_pickle=False) as data:
+            vocab = data['word_vocab'].tobytes().decode('utf-8')
+            
+            return cls(
+                segment_ids=data['segment_ids'],
+                segment_starts=data['segment_starts'],
+                segment_ends=data['segment_ends'],
+                text_offsets=data['text_offsets'],
+                text=data['text'].tobytes().decode('utf-8'),
+                word_offsets=data['word_offsets'],
+                word_ids=data['word_ids'],
+                word_starts=data['word_starts'],
+                word_ends=data['word_ends'],
+                word_probabilities=data['word_probabilities'],
+                word_vocab=vocab.split(VOCAB_SEPARATOR) if vocab else []
+            )
+
+class TranscriptBuilder:
+    """Incrementally builds a Transcript without keeping per-segment dicts alive"""
+    
+    def __init__(self):
+        self._segment_ids = array('i')
+        self._segment_starts = array('d')
+        self._segment_ends = array('d')
+        self._text_offsets = array('q', [0])
+        self._text = io.StringIO()
+        self._word_offsets = array('q', [0])
+        self._word_ids = array('i')
+        self._word_starts = array('d')
+        self._word_ends = array('d')
+        self._word_probabilities = array('d')
+        self._vocab: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._segment_ids)
+    
+    def append(self, segment: Mapping[str, Any]):
+        """Append a segment in the dict format"""
+        
+        self._append_segment(
+            segment['id'],
+            segment['start'],
+            segment['end'],
+            segment['text'].strip(),
+            (
+                (word['word'], word['start'], word['end'], word['probability'])
+                for word in segment.get('words') or ()
+            )
+        )
+    
+    def append_segment(self, segment, offset: float = 0.0, segment_id: int = None):
+        """
+        Append a faster-whisper segment
+        
+        Args:
+            segment: faster-whisper Segment
+            offset: Seconds added to every timestamp (for audio that was sliced)
+            segment_id: Overrides the segment id assigned by faster-whisper
+        """
+        
+        self._append_segment(
+            segment.id if segment_id is None else segment_id,
+            segment.start + offset,
+            segment.end + offset,
+            segment.text.strip(),
+            (
+                (word.word, word.start + offset, word.end + offset, word.probability)
+                for word in getattr(segment, 'words', None) or ()
+            )
+        )
+    
+    def truncate(self, num_segments: int):
+        """Drop every segment after the first num_segments"""
+        
+        if num_segments >= len(self):
+            return
+        
+        del self._segment_ids[num_segments:]
+        del self._segment_starts[num_segments:]
+        del self._segment_ends[num_segments:]
+        
+        self._text.seek(self._text_offsets[num_segments])
+        self._text.truncate()
+        del self._text_offsets[num_segments + 1:]
+        
+        word_count = self._word_offsets[num_segments]
+        del self._word_ids[word_count:]
+        del self._word_starts[word_count:]
+        del self._word_ends[word_count:]
+        del self._word_probabilities[word_count:]
+        del self._word_offsets[num_segments + 1:]
+    
+    def _append_segment(self, segment_id, start, end, text, words):
+        """Append one segment's scalars, text and words to the column buffers"""
+        
+        self._segment_ids.append(segment_id)
+        self._segment_starts.append(start)
+        self._segment_ends.append(end)
+        self._text.write(text)
+        self._text_offsets.append(self._text_offsets[-1] + len(text))
+        
+        for word, word_start, word_end, probability in words:
+            self._word_ids.append(self._vocab.setdefault(word, len(self._vocab)))
+            self._word_starts.append(word_start)
+            self._word_ends.append(word_end)
+            self._word_probabilities.append(probability)
+        
+        self._word_offsets.append(len(self._word_ids))
+    
+    def build(self, copy: bool = False) -> Transcript:
+        """
+        Freeze the buffers into a Transcript
+        
+        Args:
+            copy: Copy the arrays instead of sharing them, so the builder can keep growing
+        
+        Returns:
+            Transcript over the segments appended so far
+        """
+        
+        column = np.array if copy else np.frombuffer
+        
+        return Transcript(
+            segment_ids=column(self._segment_ids, dtype=np.int32),
+            segment_starts=column(self._segment_starts, dtype=np.float64),
+            segment_ends=column(self._segment_ends, dtype=np.float64),
+            text_offsets=column(self._text_offsets, dtype=np.int64),
+            text=self._text.getvalue(),
+            word_offsets=column(self._word_offsets, dtype=np.int64),
+            word_ids=column(self._word_ids, dtype=np.int32),
+            word_starts=column(self._word_starts, dtype=np.float64),
+            word_ends=column(self._word_ends, dtype=np.float64),
+            word_probabilities=column(self._word_probabilities, dtype=np.float64),
+            word_vocab=list(self._vocab)
+        )
+
+class TranscriptStatistics:
+    """Transcript statistics accumulated in O(1) per segment"""
+    
+    __slots__ = ('total_segments', 'total_words', 'total_characters', 'max_end')
+    
+    def __init__(self):
+        self.total_segments = 0
+        self.total_words = 0
+        self.total_characters = 0
+        self.max_end = 0.0
+    
+    def update(self, segment: Mapping[str, Any]):
+        """Account for one more segment"""
+        
+        self.total_segments += 1
+        self.total_words += len(segment.get('words') or ())
+        self.total_characters += len(segment['text'])
+        self.max_end = max(self.max_end, segment['end'])
+    
+    @property
+    def speaking_rate_wpm(self) -> float:
+        """Words per minute over the transcript so far"""
+        return (self.total_words / self.max_end) * 60 if self.max_end > 0 else 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the statistics in the get_transcript_statistics() format"""
+        
+        if not self.total_segments:
+            return {}
+        
+        return {
+            'total_segments': self.total_segments,
+            'total_duration': self.max_end,
+            'total_words': self.total_words,
+            'total_characters': self.total_characters,
+            'speaking_rate_wpm': round(self.speaking_rate_wpm, 1),
+            'average_segment_length': round(self.max_end / self.total_segments, 2)
+        }
+    
+    @classmethod
+    def from_transcript(cls, transcript: Transcript) -> 'TranscriptStatistics':
+        """Compute the statistics of a complete Transcript from its columns"""
+        
+        statistics = cls()
+        statistics.total_segments = len(transcript)
+        statistics.total_words = transcript.total_words
+        statistics.total_characters = transcript.total_characters
+        statistics.max_end = transcript.duration
+        return statistics
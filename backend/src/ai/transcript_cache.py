@@ -0,0 +1,214 @@
+"""
+Content-addressed on-disk transcript cache with size-bounded LRU eviction
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+
+import numpy as np
+
+from .model_manager import ModelManager
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+ENTRY_SUFFIX = '.npz'
+
+class TranscriptCache:
+    """
+    Persistent transcript cache keyed by decoded audio content and ASR settings
+    
+    Entries are compressed Transcript archives named after their key. Recency is tracked
+    through file modification times (touched on every hit), and the least
+    recently used entries are evicted whenever the cache grows past its size
+    limit. Hit/miss counters live next to the entries so every process sharing
+    the cache directory sees the same numbers.
+    """
+    
+    def __init__(self, cache_dir: Union[str, Path] = None, max_bytes: int = None):
+        if cache_dir is None:
+            cache_dir = os.getenv('TRANSCRIPT_CACHE_DIR') or ModelManager().model_cache_dir / 'transcripts'
+        
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or int(float(os.getenv('TRANSCRIPT_CACHE_MAX_MB', '1024')) * 1024 * 1024)
+        self.enabled = os.getenv('TRANSCRIPT_CACHE_ENABLED', 'true').lower() == 'true'
+        
+        self._stats_path = self.cache_dir / 'stats.json'
+        self._lock_path = self.cache_dir / '.lock'
+    
+    def make_key(
+        self,
+        audio: Union[str, np.ndarray],
+        model_size: str,
+        language: str = None,
+        initial_prompt: str = None
+    ) -> str:
+        """
+        Build the cache key for a transcription request
+        
+        Args:
+            audio: Decoded samples, or path to an extracted audio file
+            model_size: ASR model size
+            language: Language code (None for auto-detect)
+            initial_prompt: Initial prompt passed to the model
+        
+        Returns:
+            Hex digest identifying the audio content and settings
+        """
+        
+        digest = hashlib.sha256()
+        
+        if isinstance(audio, np.ndarray):
+            digest.update(b'pcm_f32le:')
+            digest.update(memoryview(np.ascontiguousarray(audio)).cast('B'))
+        else:
+            digest.update(b'file:')
+            with open(audio, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        
+        digest.update(json.dumps([model_size, language, initial_prompt]).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[Transcript]:
+        """Return the cached transcript for a key, or None on a miss"""
+        
+        if not self.enabled:
+            return None
+        
+        path = self._entry_path(key)
+        segments = None
+        
+        try:
+            segments = Transcript.load(path)
+            # Refresh recency for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Discarding unreadable transcript cache entry {key}: {str(e)}")
+            self._remove(path)
+        
+        self._record('hits' if segments is not None else 'misses')
+        return segments
+    
+    def put(self, key: str, segments: Transcript):
+        """Store a transcript under a key and evict old entries if over the size limit"""
+        
+        if not self.enabled:
+            return
+        
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                segments.save(f)
+            os.replace(tmp_path, self._entry_path(key))
+            
+            self.evict()
+        
+        except Exception as e:
+            logger.warning(f"Failed to store transcript cache entry {key}: {str(e)}")
+            if tmp_path:
+                self._remove(Path(tmp_path))
+    
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits its size limit"""
+        
+        with self._locked():
+            entries = []
+            for path in self.cache_dir.glob(f'*{ENTRY_SUFFIX}'):
+                try:
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                except FileNotFoundError:
+                    continue
+            
+            total_bytes = sum(size for _, size, _ in entries)
+            evicted = 0
+            
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                if total_bytes <= self.max_bytes:
+                    break
+                self._remove(path)
+                total_bytes -= size
+                evicted += 1
+        
+        if evicted:
+            logger.info(f"Evicted {evicted} transcript cache entries")
+        
+        return evicted
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current cache size"""
+        
+        with self._locked():
+            counters = self._read_counters()
+        
+        entries = list(self.cache_dir.glob(f'*{ENTRY_SUFFIX}'))
+        lookups = counters['hits'] + counters['misses']
+        
+        return {
+            'enabled': self.enabled,
+            'cache_dir': str(self.cache_dir),
+            'hits': counters['hits'],
+            'misses': counters['misses'],
+            'hit_rate': round(counters['hits'] / lookups, 3) if lookups else 0,
+            'entries': len(entries),
+            'size_bytes': sum(path.stat().st_size for path in entries if path.exists()),
+            'max_bytes': self.max_bytes
+        }
+    
+    def _entry_path(self, key: str) -> Path:
+        """Get the file path of a cache entry"""
+        return self.cache_dir / f'{key}{ENTRY_SUFFIX}'
+    
+    def _remove(self, path: Path):
+        """Remove a cache entry, ignoring entries already gone"""
+        
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def _record(self, counter: str):
+        """Increment a persistent hit/miss counter"""
+        
+        try:
+            with self._locked():
+                counters = self._read_counters()
+                counters[counter] += 1
+                tmp_path = self._stats_path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(counters))
+                os.replace(tmp_path, self._stats_path)
+        except Exception as e:
+            logger.warning(f"Failed to update transcript cache counters: {str(e)}")
+    
+    def _read_counters(self) -> Dict[str, int]:
+        """Read the persistent hit/miss counters"""
+        
+        try:
+            counters = json.loads(self._stats_path.read_text())
+        except (FileNotFoundError, ValueError):
+            counters = {}
+        
+        return {'hits': counters.get('hits', 0), 'misses': counters.get('misses', 0)}
+    
+    @contextmanager
+    def _locked(self):
+        """Serialize counter updates and eviction across processes"""
+        
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
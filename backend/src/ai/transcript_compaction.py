@@ -0,0 +1,202 @@
+"""
+Token-budgeted compaction of transcripts into timestamped paragraphs for chaptering
+"""
+
+import os
+import re
+import logging
+from collections.abc import Mapping, Sequence
+from typing import List, Dict, Any, Callable, Iterator, Tuple
+
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+# Vocal fillers and backchannels that carry no topic information (English transcripts only)
+FILLER_PATTERN = re.compile(
+    r"(?<![\w'-])(?:u+[hm]+|e+r+m*|a+h+|h+m+|m+-?h*m+|uh-huh|mm-hmm)(?![\w'-])[,.]?",
+    re.IGNORECASE
+)
+
+# A word said three or more times in a row ("we, we, we"); doubled words are often
+# grammatical ("had had", "that that", "bye bye"), so a pair alone is kept
+REPEATED_WORD_PATTERN = re.compile(r"\b(\w+)(?:[,\s]+\1\b){2,}", re.IGNORECASE)
+
+# Doubled words that are a stutter rather than grammar ("the the", "I, I")
+STUTTER_PATTERN = re.compile(r"\b(i|a|an|the|and|but|we|of|to)(?:[,\s]+\1\b)+", re.IGNORECASE)
+
+# Pauses long enough to end a paragraph early once it is half the target length
+PARAGRAPH_GAP_SECONDS = 2.0
+
+# Paragraph length multipliers tried, in order, until the transcript fits the budget
+PARAGRAPH_SCALES = (1.0, 1.5, 2.0, 3.0, 4.0, 6.0)
+
+class TranscriptCompactor:
+    """
+    Turns one-line-per-segment transcripts into paragraphs of a target duration
+    
+    Whisper segments are a few seconds long, so a long video becomes thousands
+    of lines whose timestamps cost as many tokens as the speech. Adjacent
+    segments are merged into paragraphs that keep a timestamp only at their
+    start, and fillers and stutters are dropped. The paragraph length grows
+    from TRANSCRIPT_PARAGRAPH_SECONDS up to TRANSCRIPT_MAX_PARAGRAPH_SECONDS
+    only as far as needed to fit the token budget, so short videos keep
+    fine-grained timestamps. Output lines keep the "[HH:MM:SS] text" format.
+    """
+    
+    def __init__(self, paragraph_seconds: float = None, max_paragraph_seconds: float = None):
+        self.paragraph_seconds = paragraph_seconds or float(os.getenv('TRANSCRIPT_PARAGRAPH_SECONDS', '30'))
+        self.max_paragraph_seconds = max_paragraph_seconds or float(
+            os.getenv('TRANSCRIPT_MAX_PARAGRAPH_SECONDS', '180')
+        )
+    
+    def compact(
+        self,
+        segments: Sequence[Mapping[str, Any]],
+        count_tokens: Callable[[str], int],
+        token_budget: int = None,
+        language: str = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Compact a transcript for the chaptering prompt
+        
+        Args:
+            segments: Transcript or list of transcript segment dicts
+            count_tokens: Token count of a text under the LLM tokenizer (should be cached)
+            token_budget: Tokens available for the transcript (None to use the target length)
+            language: Transcript language; fillers are only removed from English
+        
+        Returns:
+            Tuple of (formatted transcript, compaction report)
+        """
+        
+        raw = [(start, end, text.strip()) for start, end, text in self._iter_segments(segments)]
+        raw = [segment for segment in raw if segment[2]]
+        
+        report = {
+            'segments': len(raw),
+            'lines_before': len(raw),
+            'tokens_before': sum(
+                count_tokens(f"[{self._format_timestamp(start)}] {text}") + 1 for start, _, text in raw
+            ),
+            'fillers_removed': 0
+        }
+        
+        cleaned = []
+        for start, end, text in raw:
+            if language in (None, 'en'):
+                text, removed = self._remove_disfluencies(text)
+                report['fillers_removed'] += removed
+            if text:
+                cleaned.append((start, end, text))
+        
+        # Per-segment token counts let paragraph sizes be compared without re-tokenizing
+        segment_tokens = [count_tokens(text) for _, _, text in cleaned]
+        timestamp_tokens = count_tokens("[00:00:00] ") + 1
+        
+        paragraph_seconds = self.paragraph_seconds
+        paragraphs = self._paragraphs(cleaned, paragraph_seconds)
+        fits_budget = token_budget is None or self._estimate(paragraphs, segment_tokens, timestamp_tokens) <= token_budget
+        
+        # Coarser paragraphs only while they are what makes the transcript fit; a transcript that
+        # cannot fit anyway is chaptered in windows, where finer timestamps are worth more
+        for scale in PARAGRAPH_SCALES[1:]:
+            if fits_budget or self.paragraph_seconds * scale > self.max_paragraph_seconds:
+                break
+            candidate = self._paragraphs(cleaned, self.paragraph_seconds * scale)
+            if self._estimate(candidate, segment_tokens, timestamp_tokens) <= token_budget:
+                paragraph_seconds = self.paragraph_seconds * scale
+                paragraphs = candidate
+                fits_budget = True
+        
+        lines = [
+            f"[{self._format_timestamp(cleaned[indices[0]][0])}] "
+            + ' '.join(cleaned[i][2] for i in indices)
+            for indices in paragraphs
+        ]
+        
+        report.update({
+            'lines_after': len(lines),
+            'tokens_after': sum(count_tokens(line) + 1 for line in lines),
+            'paragraph_seconds': paragraph_seconds,
+            'token_budget': token_budget,
+            'fits_budget': fits_budget
+        })
+        report['token_reduction'] = (
+            round(1 - report['tokens_after'] / report['tokens_before'], 3) if report['tokens_before'] else 0.0
+        )
+        
+        logger.info(
+            f"Transcript compacted from {report['tokens_before']} to {report['tokens_after']} tokens "
+            f"({report['lines_before']} segments into {report['lines_after']} paragraphs of "
+            f"~{paragraph_seconds:g}s, {report['fillers_removed']} fillers removed)"
+        )
+        
+        return "\n".join(lines), report
+    
+    def _estimate(self, paragraphs: List[List[int]], segment_tokens: List[int], timestamp_tokens: int) -> int:
+        """Token count of paragraphs from the per-segment counts (separators count as one token)"""
+        
+        return sum(
+            timestamp_tokens + sum(segment_tokens[i] + 1 for i in indices) - 1
+            for indices in paragraphs
+        )
+    
+    def _paragraphs(self, segments: List[Tuple[float, float, str]], paragraph_seconds: float) -> List[List[int]]:
+        """Group segment indices into paragraphs of about paragraph_seconds"""
+        
+        paragraphs: List[List[int]] = []
+        current: List[int] = []
+        
+        for index, (start, end, _) in enumerate(segments):
+            if current:
+                paragraph_start = segments[current[0]][0]
+                gap = start - segments[current[-1]][1]
+                if (
+                    start - paragraph_start >= paragraph_seconds
+                    or (gap >= PARAGRAPH_GAP_SECONDS and start - paragraph_start >= paragraph_seconds / 2)
+                ):
+                    paragraphs.append(current)
+                    current = []
+            current.append(index)
+        
+        if current:
+            paragraphs.append(current)
+        
+        return paragraphs
+    
+    def _remove_disfluencies(self, text: str) -> Tuple[str, int]:
+        """Drop fillers, stutters and runs of a repeated word, returning the text and the number of fillers removed"""
+        
+        text, removed = FILLER_PATTERN.subn('', text)
+        text = REPEATED_WORD_PATTERN.sub(r'\1', text)
+        text = STUTTER_PATTERN.sub(r'\1', text)
+        
+        # Tidy the gaps and stray punctuation the removals leave behind
+        text = re.sub(r'\s+([,.?!])', r'\1', text)
+        text = re.sub(r'^[,.\s]+', '', text)
+        text = re.sub(r'\s{2,}', ' ', text).strip()
+        return text, removed
+    
+    def _iter_segments(self, segments: Sequence[Mapping[str, Any]]) -> Iterator[Tuple[float, float, str]]:
+        """Yield (start, end, text) of each segment"""
+        
+        if isinstance(segments, Transcript):
+            # Read the columns directly instead of materializing segment views
+            starts = segments.segment_starts.tolist()
+            ends = segments.segment_ends.tolist()
+            for index, (start, end) in enumerate(zip(starts, ends)):
+                yield start, end, segments.segment_text(index)
+            return
+        
+        for segment in segments:
+            yield segment['start'], segment['end'], segment['text']
+    
+    def _format_timestamp(self, seconds: float) -> str:
+        """Format seconds as HH:MM:SS"""
+        
+        hours = int(seconds // 3600)
+        minutes = int((seconds % 3600) // 60)
+        secs = int(seconds % 60)
+        
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
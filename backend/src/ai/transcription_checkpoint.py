@@ -0,0 +1,154 @@
+"""
+Durable transcription checkpoints so interrupted jobs resume where they stopped
+"""
+
+import os
+import re
+import json
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Union
+
+from .model_manager import ModelManager
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+class TranscriptionCheckpointStore:
+    """
+    On-disk store of partially decoded transcripts keyed by job id
+    
+    Each checkpoint is a Transcript archive of the segments decoded so far plus
+    a small JSON manifest holding the audio offset to resume from and a
+    fingerprint of the audio and ASR settings. A checkpoint is only resumed
+    when the fingerprint matches, so a job whose video or settings changed
+    starts over instead of mixing transcripts.
+    """
+    
+    def __init__(self, checkpoint_dir: Union[str, Path] = None):
+        if checkpoint_dir is None:
+            checkpoint_dir = (
+                os.getenv('TRANSCRIPTION_CHECKPOINT_DIR')
+                or ModelManager().model_cache_dir / 'checkpoints'
+            )
+        
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    
+    def load(self, key: str, fingerprint: str) -> Optional[Tuple[Transcript, float]]:
+        """
+        Load the checkpoint for a job
+        
+        Args:
+            key: Checkpoint key (the processing job id)
+            fingerprint: Identifies the audio and ASR settings being transcribed
+        
+        Returns:
+            Tuple of (segments decoded so far, audio offset in seconds), or None
+        """
+        
+        manifest_path, segments_path = self._paths(key)
+        
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning(f"Discarding unreadable transcription checkpoint {key}: {str(e)}")
+            self.delete(key)
+            return None
+        
+        if manifest.get('fingerprint') != fingerprint:
+            logger.info(f"Transcription checkpoint {key} belongs to different audio or settings, ignoring it")
+            self.delete(key)
+            return None
+        
+        try:
+            segments = Transcript.load(segments_path)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable transcription checkpoint {key}: {str(e)}")
+            self.delete(key)
+            return None
+        
+        # The manifest is written last, so a mismatch means the save was interrupted
+        if len(segments) != manifest.get('segments'):
+            logger.warning(f"Discarding incomplete transcription checkpoint {key}")
+            self.delete(key)
+            return None
+        
+        return segments, float(manifest['offset'])
+    
+    def save(self, key: str, fingerprint: str, segments: Transcript, offset: float):
+        """
+        Durably store the segments decoded so far and the offset to resume from
+        
+        Args:
+            key: Checkpoint key (the processing job id)
+            fingerprint: Identifies the audio and ASR settings being transcribed
+            segments: Segments decoded so far
+            offset: Audio offset in seconds where decoding should resume
+        """
+        
+        manifest_path, segments_path = self._paths(key)
+        
+        try:
+            self._write_atomic(segments_path, segments.save)
+            
+            manifest = {
+                'fingerprint': fingerprint,
+                'offset': offset,
+                'segments': len(segments),
+                'updated_at': datetime.utcnow().isoformat()
+            }
+            self._write_atomic(manifest_path, lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+            
+            logger.info(f"Saved transcription checkpoint {key} at {offset:.2f}s ({len(segments)} segments)")
+        
+        except Exception as e:
+            # Checkpointing is best effort and must never fail the transcription
+            logger.warning(f"Failed to save transcription checkpoint {key}: {str(e)}")
+    
+    def delete(self, key: str):
+        """Remove the checkpoint for a job, ignoring checkpoints already gone"""
+        
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the number and size of stored checkpoints"""
+        
+        entries = list(self.checkpoint_dir.glob('*.npz'))
+        
+        return {
+            'checkpoint_dir': str(self.checkpoint_dir),
+            'checkpoints': len(entries),
+            'size_bytes': sum(path.stat().st_size for path in entries if path.exists())
+        }
+    
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        """Get the manifest and segment archive paths of a checkpoint"""
+        
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', str(key))
+        return self.checkpoint_dir / f'{name}.json', self.checkpoint_dir / f'{name}.npz'
+    
+    def _write_atomic(self, path: Path, write):
+        """Write a file through a temporary file so readers never see partial content"""
+        
+        fd, tmp_path = tempfile.mkstemp(dir=self.checkpoint_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
@@ -14,6 +14,8 @@ from ..ai.processing_pipeline import (
     cleanup_processing_jobs
 )
 from ..ai.model_manager import ModelManager
+from ..ai.transcript_cache import TranscriptCache
+from ..ai.transcription_checkpoint import TranscriptionCheckpointStore
 
 ai_bp = Blueprint('ai', __name__)
 
@@ -38,7 +40,21 @@ def start_processing():
             'min_chapter_length': data.get('minChapterLength', 30.0),
             'max_chapters': data.get('maxChapters', 15),
             'transcription_language': data.get('language'),
-            'initial_prompt': data.get('initialPrompt')
+            'initial_prompt': data.get('initialPrompt'),
+            'transcription_mode': data.get('transcriptionMode'),
+            'audio_decode_slices': data.get('audioDecodeSlices'),
+            'asr_chunk_seconds': data.get('asrChunkSeconds'),
+            'asr_workers': data.get('asrWorkers'),
+            'asr_checkpoint_interval': data.get('asrCheckpointInterval'),
+            'asr_draft_model': data.get('asrDraftModel'),
+            'asr_redecode_threshold': data.get('asrRedecodeThreshold'),
+            'asr_model_routing': data.get('asrModelRouting'),
+            'chaptering_mode': data.get('chapteringMode'),
+            'vote_samples': data.get('voteSamples'),
+            'transcript_compaction': data.get('transcriptCompaction'),
+            'chaptering_engine': data.get('chapteringEngine'),
+            'topic_titles': data.get('topicTitles'),
+            'chapter_boundaries': data.get('chapterBoundaries')
         }
         
         # Remove None values
@@ -157,7 +173,9 @@ def get_model_status():
             'device': model_manager.device,
             'models_loaded': list(model_manager._models.keys()) if hasattr(model_manager, '_models') else [],
             'memory_usage': model_manager.get_memory_usage(),
-            'model_cache_dir': str(model_manager.model_cache_dir)
+            'model_cache_dir': str(model_manager.model_cache_dir),
+            'transcript_cache': TranscriptCache().get_stats(),
+            'transcription_checkpoints': TranscriptionCheckpointStore().get_stats()
         }
         
         return success_response(status)
@@ -213,13 +231,18 @@ def unload_models():
         model_manager = ModelManager()
         unloaded_models = []
         
-        if unload_asr and model_manager.is_model_loaded('asr'):
-            model_manager.unload_model('asr')
-            unloaded_models.append('asr')
-        
-        if unload_llm and model_manager.is_model_loaded('llm'):
-            model_manager.unload_model('llm')
-            unloaded_models.append('llm')
+        if unload_asr:
+            # One entry per loaded ASR model size ('asr', 'asr:small', ...)
+            for model_type in model_manager.get_memory_usage()['models_loaded']:
+                if model_type.startswith('asr'):
+                    model_manager.unload_model(model_type)
+                    unloaded_models.append(model_type)
+        
+        if unload_llm:
+            for model_type in ('llm', 'llm_draft', 'llm_ct2', 'embedding'):
+                if model_manager.is_model_loaded(model_type):
+                    model_manager.unload_model(model_type)
+                    unloaded_models.append(model_type)
         
         return success_response({
             'unloaded_models': unloaded_models,
@@ -132,23 +132,26 @@ def register_websocket_events():
 
 # Helper functions for emitting updates
 
-def emit_job_progress(job_id, job_data, video_data=None):
+def emit_job_progress(job_id, job_data, video_data=None, partial_chapters=None):
     """Emit job progress update to subscribed clients"""
     
     room_name = f"job_{job_id}"
     
-    socketio.emit('job_progress', {
+    payload = {
         'job': job_data,
         'video': video_data
-    }, room=room_name)
+    }
+    
+    # Chapters generated so far (all of them, so a late subscriber catches up)
+    if partial_chapters is not None:
+        payload['partialChapters'] = partial_chapters
+    
+    socketio.emit('job_progress', payload, room=room_name)
     
     # Also emit to video room if video_data is available
     if video_data:
         video_room = f"video_{video_data['id']}"
-        socketio.emit('video_job_update', {
-            'job': job_data,
-            'video': video_data
-        }, room=video_room)
+        socketio.emit('video_job_update', payload, room=video_room)
     
     print(f"Emitted progress update for job {job_id}")
 
@@ -236,7 +239,7 @@ def broadcast_system_message(message, level='info'):
 
 # Integration functions for use in processing routes
 
-def notify_job_update(job):
+def notify_job_update(job, partial_chapters=None):
     """Notify clients of job update (called from processing routes)"""
     
     from ..models import Video, Chapter
@@ -256,7 +259,7 @@ def notify_job_update(job):
     
     else:
         # Job progress update
-        emit_job_progress(job.id, job.to_dict(), video_data)
+        emit_job_progress(job.id, job.to_dict(), video_data, partial_chapters)
 
 def notify_stage_change(job, old_stage):
     """Notify clients of stage change (called from processing routes)"""
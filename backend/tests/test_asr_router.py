@@ -0,0 +1,16 @@
+"""
+Tests for language-aware ASR model routing
+"""
+
+import pytest
+
+from src.ai.asr_router import DEFAULT_ROUTES
+
+@pytest.mark.parametrize('language, model', sorted(DEFAULT_ROUTES.items()))
+def test_default_routes_resolve_with_installed_faster_whisper(language, model):
+    utils = pytest.importorskip('faster_whisper.utils')
+    
+    # WhisperModel accepts a model size alias or a Hugging Face repo id ("owner/name")
+    assert model in utils.available_models() or model.count('/') == 1, (
+        f"Route for {language} points to unknown model {model}"
+    )
@@ -0,0 +1,44 @@
+"""
+Tests for in-memory audio decoding through FFmpeg pipes
+"""
+
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from src.ai.asr_processor import ASRProcessor, SAMPLE_RATE
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="FFmpeg is not installed")
+
+FIXTURE_SECONDS = 12
+
+@pytest.fixture
+def stereo_48k_audio(tmp_path):
+    """A 48kHz stereo WAV with different content on each channel"""
+    
+    path = str(tmp_path / 'stereo_48k.wav')
+    subprocess.run(
+        [
+            'ffmpeg', '-nostdin', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={FIXTURE_SECONDS}',
+            '-f', 'lavfi', '-i', f'anoisesrc=color=pink:sample_rate=48000:duration={FIXTURE_SECONDS}:seed=7',
+            '-filter_complex', '[0:a][1:a]amerge=inputs=2',
+            '-ar', '48000', '-ac', '2', '-y', path
+        ],
+        check=True
+    )
+    return path
+
+def test_sliced_decode_matches_single_decode(stereo_48k_audio):
+    processor = ASRProcessor()
+    
+    single = processor.decode_audio_to_array(stereo_48k_audio, num_slices=1)
+    sliced = processor._decode_audio_slices(stereo_48k_audio, float(FIXTURE_SECONDS), 3)
+    
+    assert len(single) == FIXTURE_SECONDS * SAMPLE_RATE
+    assert len(sliced) == len(single)
+    
+    # Slices start on the same samples and the resampler has settled at the seams
+    np.testing.assert_allclose(sliced, single, atol=1e-4)
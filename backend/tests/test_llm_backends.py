@@ -0,0 +1,70 @@
+"""
+Tests for the transformers LLM backend
+"""
+
+import pytest
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+
+from src.ai.llm_backends import TransformersBackend
+
+CHAT_TEMPLATE = (
+    "{% for message in messages %}<s> {{ message['role'] }} : {{ message['content'] }} </s> {% endfor %}"
+    "{% if add_generation_prompt %}<s> assistant : {% endif %}"
+)
+
+WORDS = [
+    '<pad>', '<s>', '</s>', '<unk>', 'system', 'user', 'assistant', ':',
+    'a', 'b', 'You', 'write', 'chapters', 'Chapter', 'this', 'transcript', 'video', '{', '}', '"', '[', ']', ','
+]
+
+def tiny_llama(tokenizer, seed: int):
+    """A randomly initialised two-layer Llama over the test vocabulary"""
+    
+    torch.manual_seed(seed)
+    config = transformers.LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id
+    )
+    return transformers.LlamaForCausalLM(config).eval()
+
+@pytest.fixture
+def draft_backend():
+    """Backend with a loaded main model, a draft model and the prefix cache enabled"""
+    
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    
+    word_tokenizer = Tokenizer(models.WordLevel({word: i for i, word in enumerate(WORDS)}, unk_token='<unk>'))
+    word_tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=word_tokenizer,
+        pad_token='<pad>',
+        bos_token='<s>',
+        eos_token='</s>',
+        unk_token='<unk>',
+        model_input_names=['input_ids', 'attention_mask']
+    )
+    tokenizer.chat_template = CHAT_TEMPLATE
+    
+    backend = TransformersBackend('tiny-main', max_input_tokens=256, draft_model_name='tiny-draft')
+    backend.prefix_cache_enabled = True
+    backend._model_info = {'model': tiny_llama(tokenizer, 0), 'tokenizer': tokenizer, 'device': 'cpu'}
+    backend._draft_info = {'model': tiny_llama(tokenizer, 1)}
+    return backend
+
+def test_generate_with_draft_model_and_prefix_cache(draft_backend):
+    # The first call builds the prefix cache, later calls would start from it
+    for _ in range(3):
+        result = draft_backend.generate(["Chapter this video transcript"], "You write chapters", max_new_tokens=6)[0]
+        
+        assert result['batch_size'] == 1
+        assert result['llm_tokens_generated'] <= 6
+        assert result['llm_draft_tokens_proposed'] > 0
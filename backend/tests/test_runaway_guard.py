@@ -0,0 +1,39 @@
+"""
+Tests for the runaway decoding guard
+"""
+
+from src.ai.runaway_guard import RunawayGuard
+
+LOOPING_TEXT = " Please like and subscribe to the channel for more videos."
+
+def feed(guard: RunawayGuard, texts):
+    """Check each text as the next segment and return the first non-None result"""
+    
+    for index, text in enumerate(texts):
+        result = guard.check({'start': float(index), 'end': index + 1.0, 'text': text}, index)
+        if result is not None:
+            return result
+    return None
+
+def test_interleaved_short_replies_are_not_a_loop():
+    guard = RunawayGuard(max_repeats=3)
+    replies = [" Yeah.", " Okay.", " Thank you."]
+    
+    assert feed(guard, [replies[i % 3] for i in range(24)]) is None
+
+def test_repeated_short_reply_is_not_a_loop():
+    guard = RunawayGuard(max_repeats=3)
+    
+    assert feed(guard, [" Thank you."] * 10) is None
+
+def test_consecutive_repeats_are_a_loop():
+    guard = RunawayGuard(max_repeats=3)
+    
+    # The first occurrence is kept, the copies from index 2 on are dropped
+    assert feed(guard, [" Welcome back, everyone.", LOOPING_TEXT, LOOPING_TEXT, LOOPING_TEXT]) == ('repetition', 2, 2.0)
+
+def test_interrupted_repeats_are_not_a_loop():
+    guard = RunawayGuard(max_repeats=3)
+    texts = [LOOPING_TEXT, LOOPING_TEXT, " And now for something completely different today.", LOOPING_TEXT]
+    
+    assert feed(guard, texts) is None
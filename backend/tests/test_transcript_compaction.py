@@ -0,0 +1,25 @@
+"""
+Tests for transcript compaction
+"""
+
+import pytest
+
+from src.ai.transcript_compaction import TranscriptCompactor
+
+@pytest.mark.parametrize('text', [
+    "She had had enough of it.",
+    "I knew that that was wrong.",
+    "Okay, bye bye.",
+    "It is what it is is the answer.",
+])
+def test_grammatical_doubled_words_are_kept(text):
+    assert TranscriptCompactor()._remove_disfluencies(text) == (text, 0)
+
+@pytest.mark.parametrize('text, expected', [
+    ("We, we, we tried again.", "We tried again."),
+    ("Go go go go!", "Go!"),
+    ("So the the plan is simple.", "So the plan is simple."),
+    ("I, I think so.", "I think so."),
+])
+def test_stutters_and_runs_are_collapsed(text, expected):
+    assert TranscriptCompactor()._remove_disfluencies(text)[0] == expected